@@ -1,15 +1,33 @@
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
 from machine import Pin, I2C
+import machine
 import network
+import binascii
 import time
-import math
 from mpu6050 import MPU6050
 from step_detector import StepDetector
-from simple_ws import SimpleWebSocketServer
+from runtime import PedometerRuntime
+from ws_server import WebSocketServer
+from mqtt_publisher import MqttPublisher, FORMAT_JSON
+import telemetry
 
 # ---------- Wi-Fi setup ----------
 SSID = "Wifi_4G"
 PASSWORD = "20044002"
 
+# ---------- MQTT uplink (optional) ----------
+# Broker address (None = WebSocket clients only). Samples are taken every
+# second and published in batches every MQTT_BATCH_MS on
+# devices/<DEVICE_ID>/telemetry (JSON) or devices/<DEVICE_ID>/batch (binary)
+MQTT_BROKER = None
+MQTT_PORT = 1883
+MQTT_BATCH_MS = 10000
+MQTT_FORMAT = FORMAT_JSON
+DEVICE_ID = "pico-" + binascii.hexlify(machine.unique_id()).decode()
+
 print("[INFO] Connecting to Wi-Fi...")
 wlan = network.WLAN(network.STA_IF)
 wlan.active(True)
@@ -27,12 +45,24 @@ if not wlan.isconnected():
 
 ip = wlan.ifconfig()[0]
 print(f"\n[INFO] Connected! IP: {ip}")
-print(f"[INFO] Connect to: ws://{ip}:80/ws")
 
-# ---------- Start WebSocket Server ----------
-ws_server = SimpleWebSocketServer(port=80)
-ws_server.start()
-time.sleep(2)
+# Wall-clock time for the MQTT batch timestamps
+try:
+    import ntptime
+    ntptime.settime()
+except Exception:
+    print("[WARN] NTP unavailable, MQTT timestamps use the board clock")
+print(f"[INFO] Connect to: ws://{ip}:80/ws (JSON) or ws://{ip}:80/ws?format=binary")
+
+# ---------- WebSocket Server (started with the asyncio tasks) ----------
+ws_server = WebSocketServer(port=80, max_clients=4)
+encoder = telemetry.TelemetryEncoder()
+
+mqtt = None
+if MQTT_BROKER is not None:
+    mqtt = MqttPublisher(DEVICE_ID, MQTT_BROKER, port=MQTT_PORT, batch_ms=MQTT_BATCH_MS,
+                         fmt=MQTT_FORMAT)
+    print(f"[INFO] MQTT: {MQTT_BROKER}:{MQTT_PORT}, topic {mqtt.topic}")
 
 # ---------- MPU6050 & StepDetector ----------
 print("[INFO] Initializing sensors...")
@@ -40,41 +70,49 @@ i2c = I2C(0, scl=Pin(1), sda=Pin(0))
 mpu = MPU6050(i2c)
 step_detector = StepDetector(step_length=0.7)
 
-# ---------- Main Loop ----------
-print("[INFO] Starting main loop...")
-counter = 0
-
-while True:
-    try:
-        # Read sensor
-        accel = mpu.get_accel_data()
-        magnitude = math.sqrt(accel['x']**2 + accel['y']**2 + accel['z']**2)
-
-        # Detect steps
-        if step_detector.update(magnitude):
-            print(f"[STEP] {step_detector.step_count} steps @ {step_detector.get_speed():.2f} m/s")
-
-        # Send to WebSocket clients every 0.5 seconds
-        counter += 1
-        if counter >= 10:
-            counter = 0
-            client_count = ws_server.get_client_count()
-            if client_count > 0:
-                message = '{"steps":%d,"speed":%.2f}' % (
-                    step_detector.step_count,
-                    step_detector.get_speed()
-                )
-                active = ws_server.broadcast(message)
-                if active != client_count:
-                    print(f"[WS] Active clients: {active}")
-
-        time.sleep(0.05)
-
-    except KeyboardInterrupt:
-        print("\n[INFO] Shutting down...")
-        break
-    except Exception as e:
-        print(f"[ERROR] {e}")
-        import sys
-        sys.print_exception(e)
-        time.sleep(1)
+# ---------- Tasks ----------
+def on_step(rt):
+    print(f"[STEP] {step_detector.step_count} steps @ {step_detector.get_speed():.2f} m/s")
+
+
+def sample_values():
+    # Integer telemetry values (binary frame layout), one MQTT sample per second
+    steps, speed, distance, calories, cadence, activity = runtime.metrics()
+    return telemetry.scaled(steps, speed, distance, calories, cadence, activity,
+                            runtime.temp, *runtime.last_raw)
+
+
+def publish(rt):
+    # Queue telemetry for WebSocket clients every 0.5 seconds (never blocks:
+    # each client has its own send queue, drained by its own task)
+    if not ws_server.get_client_count():
+        return
+    steps, speed, distance, calories, cadence, activity = rt.metrics()
+    ax, ay, az, gx, gy, gz = rt.last_raw
+    # Each format is encoded once, only if a client asked for it
+    if ws_server.clients(telemetry.FORMAT_BINARY):
+        values = telemetry.scaled(steps, speed, distance, calories, cadence, activity,
+                                  rt.temp, ax, ay, az, gx, gy, gz)
+        ws_server.broadcast(encoder.pack(values), telemetry.FORMAT_BINARY)
+    if ws_server.clients(telemetry.FORMAT_JSON):
+        ws_server.broadcast(telemetry.encode_json(steps, speed, distance, calories, cadence,
+                                                  activity, rt.temp, ax, ay, az, gx, gy, gz),
+                            telemetry.FORMAT_JSON)
+
+
+runtime = PedometerRuntime(mpu, step_detector, publish=publish, on_step=on_step,
+                           sample_ms=50, publish_ms=500)
+
+
+async def main():
+    await ws_server.start()
+    if mqtt is not None:
+        mqtt.start(sample_values)
+    await runtime.run()
+
+
+print("[INFO] Starting tasks...")
+try:
+    asyncio.run(main())
+except KeyboardInterrupt:
+    print("\n[INFO] Shutting down...")
@@ -0,0 +1,647 @@
+"""
+Pédomètre BLE - Service UART Nordic, service Running Speed and Cadence
+et service podomètre (une caractéristique par groupe de métriques)
+Notifications dimensionnées au MTU et files d'envoi par connexion,
+transferts en masse (historique) au rythme de la pile BLE
+"""
+
+import bluetooth
+import struct
+import time
+from array import array
+from micropython import const
+
+from send_queue import SendQueue, DROP_OLDEST
+import telemetry
+
+# ---------- Configuration BLE UART ----------
+_IRQ_CENTRAL_CONNECT = const(1)
+_IRQ_CENTRAL_DISCONNECT = const(2)
+_IRQ_GATTS_WRITE = const(3)
+_IRQ_MTU_EXCHANGED = const(21)
+
+# MTU ATT: 23 par défaut (20 octets utiles), 247 demandé (244 utiles)
+_DEFAULT_MTU = const(23)
+_PREFERRED_MTU = const(247)
+_ATT_HEADER = const(3)
+_RX_BUFFER_SIZE = const(64)
+
+# UUID du service UART Nordic (standard)
+_UART_UUID = bluetooth.UUID("6E400001-B5A3-F393-E0A9-E50E24DCCA9E")
+_UART_TX = (
+    bluetooth.UUID("6E400003-B5A3-F393-E0A9-E50E24DCCA9E"),
+    bluetooth.FLAG_READ | bluetooth.FLAG_NOTIFY,
+)
+_UART_RX = (
+    bluetooth.UUID("6E400002-B5A3-F393-E0A9-E50E24DCCA9E"),
+    bluetooth.FLAG_WRITE | bluetooth.FLAG_WRITE_NO_RESPONSE,
+)
+_UART_SERVICE = (
+    _UART_UUID,
+    (_UART_TX, _UART_RX),
+)
+
+# Running Speed and Cadence (service standard 0x1814): mesure notifiée,
+# fonctionnalités en lecture
+_RSC_UUID = bluetooth.UUID(0x1814)
+_RSC_MEASUREMENT = (bluetooth.UUID(0x2A53), bluetooth.FLAG_NOTIFY)
+_RSC_FEATURE = (bluetooth.UUID(0x2A54), bluetooth.FLAG_READ)
+_RSC_SERVICE = (
+    _RSC_UUID,
+    (_RSC_MEASUREMENT, _RSC_FEATURE),
+)
+
+# Service podomètre: une caractéristique par groupe de métriques
+# (telemetry.GROUP_*), valeurs binaires fixes en lecture / notification
+_PEDOMETER_UUID = bluetooth.UUID("A5F00001-6C2B-4B1E-8D7E-3C9B5E1F2A40")
+_PEDOMETER_STEPS = (
+    bluetooth.UUID("A5F00002-6C2B-4B1E-8D7E-3C9B5E1F2A40"),
+    bluetooth.FLAG_READ | bluetooth.FLAG_NOTIFY,
+)
+_PEDOMETER_ACTIVITY = (
+    bluetooth.UUID("A5F00003-6C2B-4B1E-8D7E-3C9B5E1F2A40"),
+    bluetooth.FLAG_READ | bluetooth.FLAG_NOTIFY,
+)
+_PEDOMETER_MOTION = (
+    bluetooth.UUID("A5F00004-6C2B-4B1E-8D7E-3C9B5E1F2A40"),
+    bluetooth.FLAG_READ | bluetooth.FLAG_NOTIFY,
+)
+_PEDOMETER_SERVICE = (
+    _PEDOMETER_UUID,
+    (_PEDOMETER_STEPS, _PEDOMETER_ACTIVITY, _PEDOMETER_MOTION),
+)
+
+# Configuration Advertising
+_ADV_APPEARANCE_GENERIC_COMPUTER = const(128)
+_ADV_APPEARANCE_RUNNING_WALKING_SENSOR = const(1088)
+_ADV_MAX_SIZE = const(31)
+_ADV_TYPE_FLAGS = const(0x01)
+_ADV_TYPE_NAME = const(0x09)
+_ADV_TYPE_UUID16_COMPLETE = const(0x3)
+_ADV_TYPE_UUID128_COMPLETE = const(0x7)
+_ADV_TYPE_APPEARANCE = const(0x19)
+
+# Abonnements d'une connexion: caractéristiques notifiées (bits 0..3, dans
+# l'ordre RSC Measurement puis telemetry.GROUP_*: écriture du CCCD ou
+# commande SUBSCRIBE) et flux de télémétrie UART (par défaut)
+SUB_RSC = const(0x01)
+SUB_STEPS = const(0x02)
+SUB_ACTIVITY = const(0x04)
+SUB_MOTION = const(0x08)
+SUB_TELEMETRY = const(0x10)
+SUB_ALL = const(0x1F)
+
+
+class _Connection:
+    """
+    État d'une connexion: MTU négocié, files d'envoi, transfert en masse,
+    abonnements, format de télémétrie et rythme de notification
+    """
+    
+    def __init__(self, handle, queue_depth, policy, characteristics, interval_ms):
+        self.handle = handle
+        self.mtu = _DEFAULT_MTU
+        self.queue = SendQueue(queue_depth, policy=policy)
+        # Réponses aux commandes (send_to), prioritaires sur la télémétrie
+        self.control = SendQueue(4, max_size=_RX_BUFFER_SIZE)
+        # Transfert en masse: [source, tampon, page en attente]
+        self.bulk = None
+        self.subscriptions = SUB_TELEMETRY
+        # Format de la télémétrie UART demandé par ce client (SET_FORMAT)
+        self.format = telemetry.FORMAT_JSON
+        # Version de chaque caractéristique déjà notifiée à ce client
+        self.versions = array('H', [0] * characteristics)
+        # Rythme: au plus une trame de télémétrie par interval_ms (idem
+        # pour les caractéristiques); une trame sautée part à l'échéance
+        self.interval_ms = interval_ms
+        self.sent_ms = None
+        self.notified_ms = None
+        self.missed = False
+        # Trames delta: référence = dernière trame complète acquittée
+        # par ce client (ACK_SNAPSHOT)
+        self.delta = telemetry.DeltaEncoder()
+    
+    def due(self, last, now):
+        return last is None or time.ticks_diff(now, last) >= self.interval_ms
+
+
+class BLEPedometer:
+    def __init__(self, name="PicoW-Steps", queue_depth=4, drop_policy=DROP_OLDEST,
+                 interval_ms=0):
+        """
+        Args:
+            interval_ms: rythme par défaut d'une nouvelle connexion (ms,
+                0: chaque trame publiée), modifiable par connexion
+        """
+        self._ble = bluetooth.BLE()
+        self._ble.active(True)
+        self._ble.irq(self._irq)
+        
+        # MTU proposé lors des échanges (le résultat est le min des deux côtés)
+        self._ble.config(mtu=_PREFERRED_MTU)
+        
+        # Enregistrer les services UART, RSC et podomètre
+        ((self._handle_tx, self._handle_rx),
+         (self._handle_rsc, handle_feature),
+         groups) = self._ble.gatts_register_services(
+            (_UART_SERVICE, _RSC_SERVICE, _PEDOMETER_SERVICE))
+        # Tampons de valeur (20 octets par défaut): TX à la taille d'un paquet
+        # au MTU maximal, RX assez grand pour les commandes
+        self._ble.gatts_set_buffer(self._handle_tx, _PREFERRED_MTU - _ATT_HEADER)
+        self._ble.gatts_set_buffer(self._handle_rx, _RX_BUFFER_SIZE)
+        self._ble.gatts_write(handle_feature, struct.pack('<H', telemetry.RSC_FEATURES))
+        # Caractéristiques notifiées, RSC Measurement puis groupes: valeur
+        # encodée une fois par tour et partagée par toutes les connexions,
+        # version incrémentée à chaque changement
+        # [handle, tampon, dernière valeur écrite, déjà écrite]
+        sizes = [struct.calcsize(telemetry.RSC_FMT)]
+        sizes += [struct.calcsize(fmt) for fmt in telemetry.GROUP_FMTS]
+        handles = (self._handle_rsc,) + tuple(groups)
+        self._values = [[handles[k], bytearray(sizes[k]), bytearray(sizes[k]), False]
+                        for k in range(len(handles))]
+        self._versions = array('H', [0] * len(handles))
+        # Descripteur CCCD (handle de valeur + 1) -> bit d'abonnement
+        self._cccd = {handles[k] + 1: 1 << k for k in range(len(handles))}
+        
+        # État par connexion (_Connection)
+        self._conns = {}
+        self._write_callback = None
+        self._connections_callback = None
+        self._queue_depth = queue_depth
+        self._drop_policy = drop_policy
+        self.interval_ms = interval_ms
+        # Connexions ouvertes depuis le démarrage (instantané complet de
+        # la télémétrie à chaque nouveau client)
+        self.connects = 0
+        # Premier client servi par pump() (tourniquet)
+        self._next = 0
+        # Compteurs des connexions fermées (les actives sont dans leur file)
+        self._closed_sent = 0
+        self._closed_dropped = 0
+        
+        # Advertising: flags, nom, service RSC (16 bits) et apparence;
+        # l'UUID 128 bits du service UART part dans la réponse au scan
+        # (31 octets au plus chacun). Le service podomètre se découvre
+        # après connexion.
+        self._payload = bytes(self._advertising_payload(
+            name=name, services=[_RSC_UUID],
+            appearance=_ADV_APPEARANCE_RUNNING_WALKING_SENSOR))
+        self._resp = bytes(self._advertising_payload(services=[_UART_UUID], flags=False))
+        if len(self._payload) > _ADV_MAX_SIZE or len(self._resp) > _ADV_MAX_SIZE:
+            raise ValueError("advertising > 31 octets (nom trop long)")
+        
+        # Intervalle d'advertising (allongé au repos par le gestionnaire d'énergie)
+        self._adv_interval_us = 500000
+        self._advertise()
+        
+        print(f"[BLE] Dispositif '{name}' initialisé")
+        print(f"[BLE] Payload: {len(self._payload)} octets, réponse au scan: {len(self._resp)} octets")
+        print("[BLE] Services:", _UART_UUID, _RSC_UUID, _PEDOMETER_UUID)
+        print("[BLE] En attente de connexion...")
+
+    def _irq(self, event, data):
+        # Gestion des événements BLE
+        if event == _IRQ_CENTRAL_CONNECT:
+            conn_handle, _, _ = data
+            print(f"[BLE] Client connecté: {conn_handle}")
+            self._conns[conn_handle] = _Connection(conn_handle, self._queue_depth,
+                                                   self._drop_policy, len(self._values),
+                                                   self.interval_ms)
+            self.connects += 1
+            if self._connections_callback:
+                self._connections_callback()
+            # Proposer un MTU plus grand (le central peut aussi l'initier)
+            try:
+                self._ble.gattc_exchange_mtu(conn_handle)
+            except Exception as e:
+                print(f"[BLE] Échange MTU impossible: {e}")
+            
+        elif event == _IRQ_CENTRAL_DISCONNECT:
+            conn_handle, _, _ = data
+            print(f"[BLE] Client déconnecté: {conn_handle}")
+            conn = self._conns.pop(conn_handle, None)
+            if conn is not None:
+                self._closed_sent += conn.queue.sent
+                self._closed_dropped += conn.queue.dropped
+            if self._connections_callback:
+                self._connections_callback()
+            # Recommencer l'advertising
+            self._advertise()
+            
+        elif event == _IRQ_MTU_EXCHANGED:
+            conn_handle, mtu = data
+            conn = self._conns.get(conn_handle)
+            if conn is not None:
+                conn.mtu = mtu
+            print(f"[BLE] MTU négocié: {mtu} (client {conn_handle})")
+            
+        elif event == _IRQ_GATTS_WRITE:
+            conn_handle, value_handle = data
+            value = self._ble.gatts_read(value_handle)
+            if value_handle == self._handle_rx and self._write_callback:
+                self._write_callback(value, conn_handle)
+            elif value_handle in self._cccd:
+                # Abonnement (CCCD: bit 0 notification, bit 1 indication)
+                conn = self._conns.get(conn_handle)
+                if conn is not None and value:
+                    bit = self._cccd[value_handle]
+                    if value[0] & 0x03:
+                        conn.subscriptions |= bit
+                    else:
+                        conn.subscriptions &= ~bit
+
+    def chunk_size(self, conn_handle):
+        """Octets utiles par notification pour cette connexion (MTU - 3)"""
+        conn = self._conns.get(conn_handle)
+        return (conn.mtu if conn is not None else _DEFAULT_MTU) - _ATT_HEADER
+
+    def subscribe(self, conn_handle, subscriptions):
+        """
+        Abonnements d'une connexion (bits SUB_*)
+        
+        Returns:
+            bool: False si la connexion n'existe pas
+        """
+        conn = self._conns.get(conn_handle)
+        if conn is None:
+            return False
+        conn.subscriptions = subscriptions & SUB_ALL
+        return True
+
+    def set_format(self, conn_handle, fmt):
+        """
+        Format de télémétrie d'une connexion (telemetry.FORMAT_*); au
+        format delta, repart d'une trame complète
+        
+        Returns:
+            bool: False si la connexion n'existe pas
+        """
+        conn = self._conns.get(conn_handle)
+        if conn is None:
+            return False
+        if fmt == telemetry.FORMAT_DELTA:
+            # Le client n'a encore acquitté aucune trame complète
+            conn.delta.reset()
+        conn.format = fmt
+        return True
+
+    def clients(self, fmt):
+        """Nombre de clients abonnés à la télémétrie au format fmt"""
+        n = 0
+        for conn in self._conns.values():
+            if conn.format == fmt and conn.subscriptions & SUB_TELEMETRY:
+                n += 1
+        return n
+
+    def set_interval(self, conn_handle, interval_ms):
+        """
+        Rythme de notification d'une connexion (ms, 0: chaque trame)
+        
+        Returns:
+            int: plus petit rythme des connexions (fastest_interval), None
+            si la connexion n'existe pas
+        """
+        conn = self._conns.get(conn_handle)
+        if conn is None:
+            return None
+        conn.interval_ms = interval_ms
+        return self.fastest_interval()
+
+    def fastest_interval(self):
+        """
+        Returns:
+            int: plus petit rythme des connexions ouvertes (période de
+            publication suffisante pour toutes), None sans connexion
+        """
+        if not self._conns:
+            return None
+        return min(c.interval_ms for c in self._conns.values())
+
+    def connection(self, conn_handle):
+        """
+        Returns:
+            dict: MTU, abonnements, format, rythme et file de la connexion
+            (None si fermée)
+        """
+        conn = self._conns.get(conn_handle)
+        if conn is None:
+            return None
+        return {'mtu': conn.mtu, 'subscriptions': conn.subscriptions,
+                'format': conn.format, 'interval_ms': conn.interval_ms, 'sent': conn.queue.sent,
+                'dropped': conn.queue.dropped, 'queued': len(conn.queue)}
+
+    def send(self, data, now=None, fmt=telemetry.FORMAT_JSON):
+        """
+        Mettre un message en file pour les clients abonnés à la télémétrie
+        au format fmt
+        
+        Ne touche pas à la radio: le message, encodé une seule fois, est
+        copié dans la file de chaque connexion à son échéance (interval_ms)
+        et envoyé par pump(). Une connexion pas encore à échéance saute la
+        trame (missed). Si une file est pleine, la politique de rejet
+        s'applique (plus ancien / dernier seulement).
+        """
+        data_bytes = data.encode('utf-8') if isinstance(data, str) else data
+        if now is None:
+            now = time.ticks_ms()
+        for conn in self._conns.values():
+            if conn.format != fmt or not conn.subscriptions & SUB_TELEMETRY:
+                continue
+            if conn.due(conn.sent_ms, now):
+                conn.queue.put(data_bytes)
+                conn.sent_ms = now
+                conn.missed = False
+            else:
+                conn.missed = True
+    
+    def send_delta(self, values, now=None):
+        """
+        Mettre une trame delta en file pour les clients abonnés à la
+        télémétrie au format delta
+        
+        Comme send(), mais encodée pour chaque connexion à son échéance:
+        écarts à la dernière trame complète que ce client a acquittée, ou
+        trame complète tant qu'il n'en a acquitté aucune (trame perdue,
+        file pleine: une nouvelle part au tour suivant).
+        
+        Args:
+            values: valeurs entières (telemetry.scaled())
+        """
+        if now is None:
+            now = time.ticks_ms()
+        for conn in self._conns.values():
+            if conn.format != telemetry.FORMAT_DELTA or not conn.subscriptions & SUB_TELEMETRY:
+                continue
+            if conn.due(conn.sent_ms, now):
+                conn.queue.put(conn.delta.encode(values))
+                conn.sent_ms = now
+                conn.missed = False
+            else:
+                conn.missed = True
+    
+    def ack_snapshot(self, conn_handle, seq):
+        """
+        Acquittement d'une trame complète par un client (référence delta)
+        
+        Returns:
+            bool: True si seq était la trame complète en attente de ce client
+        """
+        conn = self._conns.get(conn_handle)
+        return conn is not None and conn.delta.ack(seq)
+    
+    def missed_due(self, now=None):
+        """True si une connexion a sauté une trame et arrive à échéance"""
+        if now is None:
+            now = time.ticks_ms()
+        for conn in self._conns.values():
+            if conn.missed and conn.due(conn.sent_ms, now):
+                return True
+        return False
+
+    def send_to(self, conn_handle, data):
+        """
+        Mettre une réponse en file pour une seule connexion
+        
+        Les réponses ont leur propre file et passent avant la télémétrie
+        (sans couper un message déjà commencé): elles ne sont pas
+        rejetées par la politique de la file de télémétrie.
+        
+        Returns:
+            bool: False si la connexion n'existe pas ou si le message est rejeté
+        """
+        conn = self._conns.get(conn_handle)
+        if conn is None:
+            return False
+        return conn.control.put(data.encode('utf-8') if isinstance(data, str) else data)
+
+    def start_bulk(self, conn_handle, source):
+        """
+        Démarre un transfert en masse vers une connexion
+        
+        source.next_page(buf, size) écrit la page suivante (au plus une
+        notification) et renvoie sa longueur, 0 à la fin. Les pages partent
+        quand la file de la connexion est vide et ne sont jamais rejetées:
+        une page refusée par la pile (OSError) est renvoyée au tour suivant.
+        
+        Returns:
+            bool: False si la connexion n'existe pas
+        """
+        conn = self._conns.get(conn_handle)
+        if conn is None:
+            return False
+        conn.bulk = [source, bytearray(_PREFERRED_MTU - _ATT_HEADER), 0]
+        return True
+
+    def bulk_active(self, conn_handle):
+        """True si un transfert en masse est en cours pour cette connexion"""
+        conn = self._conns.get(conn_handle)
+        return conn is not None and conn.bulk is not None
+
+    def _bulk_chunk(self, conn, size):
+        bulk = conn.bulk
+        if bulk is None:
+            return None
+        if bulk[2] == 0:
+            bulk[2] = bulk[0].next_page(bulk[1], size)
+            if bulk[2] == 0:
+                conn.bulk = None
+                return None
+        return memoryview(bulk[1])[:bulk[2]]
+
+    def _pump_one(self, conn):
+        """
+        Une notification pour cette connexion
+        
+        Returns:
+            bool: False si rien à envoyer ou pile saturée
+        """
+        queue = conn.queue
+        control = conn.control
+        size = conn.mtu - _ATT_HEADER
+        # Un message commencé est terminé avant tout autre (le téléphone
+        # réassemble les trames par longueur), puis les réponses, la
+        # télémétrie et enfin le transfert en masse
+        if queue.in_flight() or not len(control):
+            source = queue
+        else:
+            source = control
+        chunk = source.peek(size)
+        bulk = chunk is None
+        if bulk:
+            chunk = self._bulk_chunk(conn, size)
+            if chunk is None:
+                return False
+        try:
+            self._ble.gatts_notify(conn.handle, self._handle_tx, chunk)
+        except OSError:
+            return False
+        except Exception as e:
+            print(f"[BLE] Erreur envoi: {e}")
+            return False
+        if bulk:
+            conn.bulk[2] = 0
+        else:
+            source.advance(len(chunk))
+        return True
+
+    def pump(self, max_packets=8):
+        """
+        Vider les files par notifications de MTU - 3 octets
+        
+        Appelée à chaque tour de boucle. Au plus max_packets notifications
+        par appel pour borner le temps passé hors échantillonnage, servies
+        à tour de rôle (une par connexion et par passe, premier client
+        décalé à chaque appel): un client lent ou un transfert en masse ne
+        prive pas les autres. Une connexion dont la pile BLE est saturée
+        (OSError) est reprise au prochain appel, sans couper le message en
+        cours. Les pages d'un transfert en masse passent quand la file est
+        vide (la télémétrie reste prioritaire).
+        
+        Returns:
+            bool: True si toutes les files sont vides
+        """
+        conns = list(self._conns.values())
+        if conns:
+            start = self._next % len(conns)
+            self._next = start + 1
+            ready = conns[start:] + conns[:start]
+            budget = max_packets
+            while budget > 0 and ready:
+                k = 0
+                while k < len(ready) and budget > 0:
+                    if self._pump_one(ready[k]):
+                        budget -= 1
+                        k += 1
+                    else:
+                        # Rien à envoyer ou pile saturée: client suivant
+                        ready.pop(k)
+        for conn in conns:
+            if len(conn.queue) or len(conn.control) or conn.bulk is not None:
+                return False
+        return True
+
+    def stats(self):
+        """Compteurs de trames envoyées / rejetées (toutes connexions)"""
+        sent = self._closed_sent
+        dropped = self._closed_dropped
+        queued = 0
+        for conn in self._conns.values():
+            sent += conn.queue.sent
+            dropped += conn.queue.dropped
+            queued += len(conn.queue)
+        return {'sent': sent, 'dropped': dropped, 'queued': queued,
+                'connections': len(self._conns)}
+
+    def update_metrics(self, values, stride_cm, now=None):
+        """
+        Mettre à jour les caractéristiques RSC et podomètre
+        
+        Chaque valeur est encodée une fois, réécrite (lecture) si elle a
+        changé, puis notifiée aux connexions abonnées à leur échéance si
+        elles ne l'ont pas encore reçue: un client abonné aux pas
+        seulement reçoit 4 octets par pas.
+        
+        Args:
+            values: valeurs entières (telemetry.scaled())
+            stride_cm: longueur de pas du profil (cm)
+            
+        Returns:
+            int: nombre de notifications envoyées
+        """
+        versions = self._versions
+        for k, entry in enumerate(self._values):
+            handle, buf, last, written = entry
+            if k == 0:
+                telemetry.pack_rsc(buf, values, stride_cm)
+            else:
+                telemetry.pack_group(buf, k - 1, values)
+            if written and buf == last:
+                continue
+            last[:] = buf
+            entry[3] = True
+            versions[k] = (versions[k] + 1) & 0xFFFF
+            self._ble.gatts_write(handle, buf)
+        
+        if now is None:
+            now = time.ticks_ms()
+        notified = 0
+        for conn in self._conns.values():
+            subscriptions = conn.subscriptions
+            if not subscriptions & ~SUB_TELEMETRY or not conn.due(conn.notified_ms, now):
+                continue
+            sent = False
+            for k in range(len(versions)):
+                if not subscriptions & (1 << k) or conn.versions[k] == versions[k]:
+                    continue
+                try:
+                    self._ble.gatts_notify(conn.handle, self._values[k][0], self._values[k][1])
+                except OSError:
+                    break  # pile saturée: réessayé au prochain tour
+                conn.versions[k] = versions[k]
+                sent = True
+                notified += 1
+            if sent:
+                conn.notified_ms = now
+        return notified
+
+    def on_write(self, callback):
+        """Enregistre callback(value, conn_handle) appelé à chaque écriture sur RX"""
+        self._write_callback = callback
+
+    def on_connections(self, callback):
+        """Enregistre callback() appelé à chaque connexion ou déconnexion d'un client"""
+        self._connections_callback = callback
+
+    def is_connected(self):
+        """Vérifie si au moins un client est connecté"""
+        return len(self._conns) > 0
+
+    def set_advertising_interval(self, interval_us):
+        """
+        Change l'intervalle d'advertising (relancé tout de suite si aucun
+        client n'est connecté, sinon appliqué à la prochaine déconnexion)
+        """
+        if interval_us == self._adv_interval_us:
+            return
+        self._adv_interval_us = interval_us
+        if not self._conns:
+            self._advertise()
+
+    def _advertise(self, interval_us=None):
+        """Commencer l'advertising BLE"""
+        if interval_us is None:
+            interval_us = self._adv_interval_us
+        print(f"[BLE] Advertising démarré ({interval_us // 1000} ms)...")
+        self._ble.gap_advertise(interval_us, adv_data=self._payload, resp_data=self._resp)
+
+    @staticmethod
+    def _advertising_payload(name=None, services=None, appearance=0, flags=True):
+        """Créer le payload d'advertising (flags=False: réponse au scan)"""
+        payload = bytearray()
+
+        def _append(adv_type, value):
+            nonlocal payload
+            payload += struct.pack("BB", len(value) + 1, adv_type) + value
+
+        # Flags: General Discoverable + BR/EDR not supported
+        if flags:
+            _append(_ADV_TYPE_FLAGS, struct.pack("B", 0x06))
+
+        # Nom du dispositif
+        if name:
+            _append(_ADV_TYPE_NAME, name.encode())
+
+        # Services
+        if services:
+            for uuid in services:
+                b = bytes(uuid)
+                if len(b) == 2:
+                    _append(_ADV_TYPE_UUID16_COMPLETE, b)
+                elif len(b) == 16:
+                    _append(_ADV_TYPE_UUID128_COMPLETE, b)
+
+        # Appearance
+        if appearance:
+            _append(_ADV_TYPE_APPEARANCE, struct.pack("<h", appearance))
+
+        return payload
@@ -0,0 +1,323 @@
+"""
+Protocole de commandes binaire sur la caractéristique RX
+Reconfiguration à chaud (télémétrie, capteur, détecteur) et statistiques
+
+Commande (écrite sur RX):    opcode u8 | paramètres (little-endian)
+Réponse  (notifiée sur TX):  0xAC | opcode u8 | status u8 | données éventuelles
+Le marqueur 0xAC ne peut pas être confondu avec le JSON ('{'), la trame
+de télémétrie (0x01) ou une page d'historique (0xB5).
+
+| Opcode | Commande      | Paramètres                          |
+|--------|---------------|-------------------------------------|
+| 0x01   | SET_FORMAT    | format u8 (0 JSON, 1 binaire, 2 delta), pour ce client |
+| 0x02   | SYNC          | from_minute u32 (réponse: pages)    |
+| 0x03   | SET_RATE      | interval_ms u16 (100..60000), pour ce client |
+| 0x04   | SET_SENSOR    | odr_hz u16 (4..1000), dlpf u8 (1..6)|
+| 0x05   | SET_DETECTOR  | type u8 (0 simple, 1 avancé, 2 fusionné, 3 entier)|
+| 0x06   | SET_PROFILE   | step_length u16 (mm), weight u16 (kg)|
+| 0x07   | RESET         | -                                   |
+| 0x08   | GET_STATS     | - (données: STATS_FMT)              |
+| 0x09   | SET_PUBLISH   | mode u8 (0 périodique, 1 sur changement), heartbeat_s u16 (1..3600) |
+| 0x0A   | ACK_SNAPSHOT  | seq u8 de la trame complète reçue (sans réponse) |
+| 0x0B   | GET_PERF      | étape u8 (perf.STAGE_*) (données: PERF_FMT) |
+| 0x0C   | SUBSCRIBE     | abonnements u8 (ble_pedometer.SUB_*), pour ce client |
+"""
+import gc
+import struct
+import time
+
+import perf
+import telemetry
+from history import HistorySync, CMD_SYNC
+
+ACK_MARKER = 0xAC
+
+CMD_SET_FORMAT = telemetry.CMD_SET_FORMAT
+CMD_SET_RATE = 0x03
+CMD_SET_SENSOR = 0x04
+CMD_SET_DETECTOR = 0x05
+CMD_SET_PROFILE = 0x06
+CMD_RESET = 0x07
+CMD_GET_STATS = 0x08
+CMD_SET_PUBLISH = 0x09
+CMD_ACK_SNAPSHOT = 0x0A
+CMD_GET_PERF = 0x0B
+CMD_SUBSCRIBE = 0x0C
+
+STATUS_OK = 0
+STATUS_UNKNOWN = 1      # opcode inconnu
+STATUS_BAD_LENGTH = 2   # paramètres trop courts
+STATUS_BAD_VALUE = 3    # valeur hors plage
+STATUS_ERROR = 4        # échec de l'application (ex: I2C)
+
+DETECTOR_SIMPLE = 0
+DETECTOR_ADVANCED = 1
+DETECTOR_FUSED = 2
+DETECTOR_FIXED = 3
+
+PUBLISH_PERIODIC = 0
+PUBLISH_ON_CHANGE = 1
+
+# Statistiques: uptime s, échantillons, pas, retards, perdus, erreurs,
+# notifications envoyées / rejetées, mémoire libre, publish_ms, odr, détecteur,
+# collectes GC et mémoire libre minimale (0 sans Profiler), clients connectés
+STATS_FMT = '<IIIHHHIIIHHBIIB'
+# Compteurs d'une étape: étape, nombre, total ms, max µs, histogramme
+# (perf.BUCKETS classes, voir perf.bucket_bounds)
+PERF_FMT = '<BIII%dI' % perf.BUCKETS
+
+
+class CommandHandler:
+    """
+    Décodage et application des commandes reçues sur RX
+
+    Appelé depuis l'IRQ _IRQ_GATTS_WRITE (contexte planifié): les
+    commandes ne font que modifier des paramètres lus par les tâches
+    du runtime au tour suivant.
+    """
+
+    def __init__(self, runtime, ble, history=None, change=None):
+        """
+        Args:
+            change: telemetry.ChangeFilter du mode « sur changement »
+        """
+        self.runtime = runtime
+        self.ble = ble
+        self.history = history
+        self.change = change
+        # Période de publication configurée, rétablie sans client
+        self.publish_ms = runtime.publish_ms
+        self.started = time.ticks_ms()
+        self.commands = 0
+        self._conn = None
+        self._ack = bytearray(3 + max(struct.calcsize(STATS_FMT), struct.calcsize(PERF_FMT)))
+        self._handlers = {
+            CMD_SET_FORMAT: (1, self._set_format),
+            CMD_SYNC: (4, self._sync),
+            CMD_SET_RATE: (2, self._set_rate),
+            CMD_SET_SENSOR: (3, self._set_sensor),
+            CMD_SET_DETECTOR: (1, self._set_detector),
+            CMD_SET_PROFILE: (4, self._set_profile),
+            CMD_RESET: (0, self._reset),
+            CMD_GET_STATS: (0, self._stats),
+            CMD_SET_PUBLISH: (3, self._set_publish),
+            CMD_ACK_SNAPSHOT: (1, self._ack_snapshot),
+            CMD_GET_PERF: (1, self._perf),
+            CMD_SUBSCRIBE: (1, self._subscribe),
+        }
+
+    def handle(self, value, conn_handle):
+        """Callback de BLEPedometer.on_write: applique et acquitte une commande"""
+        if not value:
+            return
+        opcode = value[0]
+        self.commands += 1
+        self._conn = conn_handle
+        entry = self._handlers.get(opcode)
+        if entry is None:
+            status, n = STATUS_UNKNOWN, 0
+        elif len(value) - 1 < entry[0]:
+            status, n = STATUS_BAD_LENGTH, 0
+        else:
+            try:
+                status, n = entry[1](value, 1)
+            except ValueError:
+                status, n = STATUS_BAD_VALUE, 0
+            except Exception as e:
+                print(f"[CMD] Erreur 0x{opcode:02X}: {e}")
+                status, n = STATUS_ERROR, 0
+        if status is None:
+            return  # commande sans réponse
+        ack = self._ack
+        ack[0] = ACK_MARKER
+        ack[1] = opcode
+        ack[2] = status
+        self.ble.send_to(conn_handle, memoryview(ack)[:3 + n])
+        self._conn = None
+
+    def update_rate(self):
+        """
+        Période de publication: rythme du client le plus rapide, ou période
+        configurée sans client (ou si un client reçoit chaque trame)
+
+        Callback de BLEPedometer.on_connections, appelé aussi par SET_RATE
+        """
+        fastest = self.ble.fastest_interval()
+        self.runtime.publish_ms = fastest or self.publish_ms
+
+    # ---------- Commandes ----------
+
+    def _set_format(self, value, i):
+        if value[i] not in (telemetry.FORMAT_JSON, telemetry.FORMAT_BINARY,
+                            telemetry.FORMAT_DELTA):
+            raise ValueError("format")
+        # Format de ce client; publish encode une fois chaque format demandé
+        if not self.ble.set_format(self._conn, value[i]):
+            return STATUS_ERROR, 0
+        print(f"[CMD] Format de télémétrie: {value[i]} (client {self._conn})")
+        return STATUS_OK, 0
+
+    def _sync(self, value, i):
+        if self.history is None:
+            return STATUS_UNKNOWN, 0
+        (from_minute,) = struct.unpack_from('<I', value, i)
+        sync = HistorySync(self.history, from_minute)
+        self.ble.start_bulk(self._conn, sync)
+        print(f"[CMD] Synchronisation: minutes {sync.minute} à {sync.end - 1}")
+        return STATUS_OK, 0
+
+    def _set_rate(self, value, i):
+        (interval_ms,) = struct.unpack_from('<H', value, i)
+        if not 100 <= interval_ms <= 60000:
+            raise ValueError("interval_ms")
+        # Rythme de ce client; la publication suit le client le plus rapide
+        if self.ble.set_interval(self._conn, interval_ms) is None:
+            return STATUS_ERROR, 0
+        self.update_rate()
+        print(f"[CMD] Télémétrie toutes les {interval_ms} ms (client {self._conn}), "
+              f"publication toutes les {self.runtime.publish_ms} ms")
+        return STATUS_OK, 0
+
+    def _subscribe(self, value, i):
+        if not self.ble.subscribe(self._conn, value[i]):
+            return STATUS_ERROR, 0
+        print(f"[CMD] Abonnements 0x{value[i]:02X} (client {self._conn})")
+        return STATUS_OK, 0
+
+    def _set_sensor(self, value, i):
+        odr, dlpf = struct.unpack_from('<HB', value, i)
+        if not 4 <= odr <= 1000 or not 1 <= dlpf <= 6:
+            raise ValueError("odr/dlpf")
+        rt = self.runtime
+        mpu = rt.mpu
+        mpu.set_dlpf(dlpf)
+        rate = mpu.set_sample_rate(odr)
+        if rt.power is not None:
+            # Fréquence en marche retenue par le gestionnaire d'énergie
+            rt.power.active_odr = odr
+        # La cadence des détecteurs (rt.sample_ms) ne change pas: le runtime
+        # décime les échantillons du capteur (DATA_RDY, FIFO)
+        print(f"[CMD] Capteur: {rate:.1f} Hz, DLPF {dlpf}")
+        return STATUS_OK, 0
+
+    def _set_detector(self, value, i):
+        kind = value[i]
+        rt = self.runtime
+        old = rt.detector
+        if kind == DETECTOR_SIMPLE:
+            from step_detector import StepDetector
+            new = StepDetector(step_length=old.step_length)
+        elif kind == DETECTOR_ADVANCED:
+            from step_detector_advanced import AdvancedStepDetector
+            new = AdvancedStepDetector(step_length=old.step_length,
+                                       user_weight=getattr(old, 'user_weight', 70))
+        elif kind == DETECTOR_FUSED:
+            # Gyroscope rallumé par le gestionnaire d'énergie (uses_gyro)
+            from step_detector_fused import FusedStepDetector
+            new = FusedStepDetector(step_length=old.step_length,
+                                    user_weight=getattr(old, 'user_weight', 70))
+        elif kind == DETECTOR_FIXED:
+            from step_detector_fixed import FixedStepDetector
+            new = FixedStepDetector(step_length=old.step_length,
+                                    user_weight=getattr(old, 'user_weight', 70),
+                                    accel_scale=int(rt.mpu.ACCEL_SCALE))
+        else:
+            raise ValueError("detector")
+        # Le total de pas continue (historique et affichage cohérents)
+        new.step_count = old.step_count
+        rt.detector = new
+        print(f"[CMD] Détecteur: {type(new).__name__}")
+        return STATUS_OK, 0
+
+    def _set_profile(self, value, i):
+        step_mm, weight = struct.unpack_from('<HH', value, i)
+        if not 200 <= step_mm <= 2000 or not 20 <= weight <= 300:
+            raise ValueError("profile")
+        d = self.runtime.detector
+        d.step_length = step_mm / 1000
+        if hasattr(d, 'user_weight'):
+            d.user_weight = weight
+        print(f"[CMD] Profil: pas {d.step_length:.2f} m, {weight} kg")
+        return STATUS_OK, 0
+
+    def _reset(self, value, i):
+        self.runtime.detector.reset()
+        print("[CMD] Compteurs remis à zéro")
+        return STATUS_OK, 0
+
+    def _set_publish(self, value, i):
+        if self.change is None:
+            return STATUS_UNKNOWN, 0
+        mode, heartbeat_s = struct.unpack_from('<BH', value, i)
+        if mode not in (PUBLISH_PERIODIC, PUBLISH_ON_CHANGE) or not 1 <= heartbeat_s <= 3600:
+            raise ValueError("mode/heartbeat")
+        self.change.enabled = mode == PUBLISH_ON_CHANGE
+        self.change.heartbeat_ms = heartbeat_s * 1000
+        self.change.reset()
+        print(f"[CMD] Publication: {'sur changement' if mode else 'périodique'}, "
+              f"battement {heartbeat_s} s")
+        return STATUS_OK, 0
+
+    def _ack_snapshot(self, value, i):
+        # Fréquent et sans effet visible: pas de réponse. Référence propre
+        # à ce client: l'acquittement d'un autre ne la change pas
+        self.ble.ack_snapshot(self._conn, value[i])
+        return None, 0
+
+    def _stats(self, value, i):
+        rt = self.runtime
+        st = self.ble.stats()
+        if getattr(rt.detector, 'uses_gyro', False):
+            kind = DETECTOR_FUSED
+        elif hasattr(rt.detector, 'update_raw'):
+            kind = DETECTOR_FIXED
+        elif hasattr(rt.detector, 'get_calories'):
+            kind = DETECTOR_ADVANCED
+        else:
+            kind = DETECTOR_SIMPLE
+        profiler = rt.perf
+        gc_collections = mem_low = 0
+        if profiler is not None:
+            gc_collections = profiler.gc_collections
+            mem_low = profiler.mem_low or 0
+        struct.pack_into(STATS_FMT, self._ack, 3,
+                         time.ticks_diff(time.ticks_ms(), self.started) // 1000,
+                         rt.samples, rt.detector.step_count,
+                         min(rt.overruns, 0xFFFF), min(rt.dropped, 0xFFFF),
+                         min(rt.errors, 0xFFFF), st['sent'], st['dropped'],
+                         gc.mem_free(), rt.publish_ms, int(rt.mpu.sample_rate), kind,
+                         gc_collections, mem_low, min(st['connections'], 0xFF))
+        return STATUS_OK, struct.calcsize(STATS_FMT)
+
+    def _perf(self, value, i):
+        profiler = self.runtime.perf
+        if profiler is None:
+            return STATUS_UNKNOWN, 0
+        stage = value[i]
+        if stage >= profiler.stages:
+            raise ValueError("stage")
+        count, total_ms, max_us, hist = profiler.stage(stage)
+        struct.pack_into(PERF_FMT, self._ack, 3, stage, count, total_ms, max_us, *hist)
+        return STATUS_OK, struct.calcsize(PERF_FMT)
+
+
+def decode_ack(frame):
+    """
+    Décodage d'une réponse (côté téléphone / tests sur PC)
+
+    Returns:
+        dict: opcode, status et, pour GET_STATS et GET_PERF, les compteurs
+    """
+    if frame[0] != ACK_MARKER:
+        raise ValueError("pas une réponse de commande")
+    ack = {'opcode': frame[1], 'status': frame[2]}
+    if frame[1] == CMD_GET_STATS and frame[2] == STATUS_OK:
+        (ack['uptime_s'], ack['samples'], ack['steps'], ack['overruns'], ack['dropped'],
+         ack['errors'], ack['ble_sent'], ack['ble_dropped'], ack['mem_free'],
+         ack['publish_ms'], ack['odr_hz'], ack['detector'], ack['gc_collections'],
+         ack['mem_low'], ack['connections']) = struct.unpack_from(STATS_FMT, frame, 3)
+    elif frame[1] == CMD_GET_PERF and frame[2] == STATUS_OK:
+        fields = struct.unpack_from(PERF_FMT, frame, 3)
+        ack['stage'], ack['count'], ack['total_ms'], ack['max_us'] = fields[:4]
+        ack['histogram'] = list(fields[4:])
+    return ack
@@ -0,0 +1,216 @@
+"""
+Historique d'activité minute par minute (RAM + flash)
+Conservé même sans téléphone connecté, puis synchronisé en masse par BLE
+
+Enregistrement d'une minute (8 octets, '<HHHBB'):
+    steps u16 | distance u16 (dm) | calories u16 (0.01 kcal) | cadence u8 | activity u8
+Les minutes sont numérotées en continu (compteur conservé en flash);
+l'enregistrement de la minute m est à l'emplacement m % capacity.
+
+Synchronisation (commande RX [CMD_SYNC, from_minute u32 LE]):
+le périphérique envoie des pages de la taille d'une notification
+    marker u8 (0xB5) | count u8 (bit 7 = dernière page) | first_minute u32 | device_minute u32
+suivies de count enregistrements consécutifs à partir de first_minute.
+device_minute est la minute en cours sur le Pico: l'enregistrement m date
+de (device_minute - m) minutes. Pour reprendre un transfert interrompu,
+le téléphone renvoie CMD_SYNC avec la minute suivant la dernière reçue.
+"""
+import struct
+
+CMD_SYNC = 0x02
+
+RECORD_FMT = '<HHHBB'
+RECORD_SIZE = 8
+PAGE_MARKER = 0xB5
+PAGE_HEADER_FMT = '<BBII'
+PAGE_HEADER_SIZE = 10
+PAGE_LAST = 0x80
+PAGE_MAX_RECORDS = 0x7F
+
+_FILE_MAGIC = b'PHST'
+_FILE_HEADER_FMT = '<4sHHII'
+_FILE_HEADER_SIZE = 16
+
+
+def _u16(v):
+    v = int(round(v))
+    return 0 if v < 0 else 0xFFFF if v > 0xFFFF else v
+
+
+def _u8(v):
+    v = int(round(v))
+    return 0 if v < 0 else 0xFF if v > 0xFF else v
+
+
+class HistoryStore:
+    """
+    Anneau des capacity dernières minutes (720 = 12 h, 5,6 Ko)
+
+    Copie en RAM pour la synchronisation, miroir en flash (un fichier de
+    taille fixe, écrit en place une fois par minute) pour survivre à un
+    redémarrage.
+    """
+
+    def __init__(self, capacity=720, path='history.bin'):
+        self.capacity = capacity
+        self.path = path
+        self._data = bytearray(capacity * RECORD_SIZE)
+        self.first_minute = 0   # plus ancienne minute conservée
+        self.next_minute = 0    # minute en cours (pas encore enregistrée)
+        # Dernières valeurs cumulées (pour calculer les écarts par minute)
+        self._last = None
+        self._load()
+
+    # ---------- Flash ----------
+
+    def _load(self):
+        if self.path is None:
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                header = f.read(_FILE_HEADER_SIZE)
+                magic, size, capacity, first, nxt = struct.unpack(_FILE_HEADER_FMT, header)
+                if magic != _FILE_MAGIC or size != RECORD_SIZE or capacity != self.capacity:
+                    raise ValueError("format")
+                f.readinto(self._data)
+            self.first_minute = first
+            self.next_minute = nxt
+        except (OSError, ValueError):
+            # Absent ou d'un autre format: fichier neuf de taille fixe
+            with open(self.path, 'wb') as f:
+                f.write(self._header())
+                f.write(self._data)
+
+    def _header(self):
+        return struct.pack(_FILE_HEADER_FMT, _FILE_MAGIC, RECORD_SIZE, self.capacity,
+                           self.first_minute, self.next_minute)
+
+    def _persist(self, slot):
+        if self.path is None:
+            return
+        try:
+            with open(self.path, 'r+b') as f:
+                f.seek(_FILE_HEADER_SIZE + slot * RECORD_SIZE)
+                f.write(memoryview(self._data)[slot * RECORD_SIZE:(slot + 1) * RECORD_SIZE])
+                f.seek(0)
+                f.write(self._header())
+        except OSError as e:
+            print(f"[HIST] Écriture flash impossible: {e}")
+
+    # ---------- Enregistrement ----------
+
+    def __len__(self):
+        return self.next_minute - self.first_minute
+
+    def record(self, steps, distance, calories, cadence, activity):
+        """Enregistre la minute écoulée (valeurs de la minute, pas cumulées)"""
+        minute = self.next_minute
+        slot = minute % self.capacity
+        struct.pack_into(RECORD_FMT, self._data, slot * RECORD_SIZE,
+                         _u16(steps), _u16(distance * 10), _u16(calories * 100),
+                         _u8(cadence), _u8(activity))
+        self.next_minute = minute + 1
+        if self.next_minute - self.first_minute > self.capacity:
+            self.first_minute = self.next_minute - self.capacity
+        self._persist(slot)
+
+    def add_minute(self, steps, speed, distance, calories, cadence, activity):
+        """
+        Enregistre la minute à partir des métriques cumulées
+        (runtime.metrics()); un compteur remis à zéro repart de 0
+        """
+        last = self._last
+        self._last = (steps, distance, calories)
+        if last is None:
+            last = (0, 0.0, 0.0)
+        d_steps = steps - last[0] if steps >= last[0] else steps
+        d_distance = distance - last[1] if distance >= last[1] else distance
+        d_calories = calories - last[2] if calories >= last[2] else calories
+        self.record(d_steps, d_distance, d_calories, cadence, activity)
+
+    def get(self, minute):
+        """
+        Returns:
+            tuple: (steps, distance m, calories, cadence, activity) ou None
+        """
+        if not self.first_minute <= minute < self.next_minute:
+            return None
+        steps, dist, cal, cadence, activity = struct.unpack_from(
+            RECORD_FMT, self._data, (minute % self.capacity) * RECORD_SIZE)
+        return steps, dist / 10, cal / 100, cadence, activity
+
+    def copy_into(self, buf, offset, minute, count):
+        """Copie count enregistrements consécutifs (à partir de minute) dans buf"""
+        data = self._data
+        for i in range(count):
+            src = ((minute + i) % self.capacity) * RECORD_SIZE
+            dst = offset + i * RECORD_SIZE
+            buf[dst:dst + RECORD_SIZE] = data[src:src + RECORD_SIZE]
+
+
+class HistorySync:
+    """
+    Source de pages pour un transfert en masse (BLEPedometer.start_bulk)
+
+    La minute en cours au début du transfert borne l'envoi; les pages
+    suivent le rythme de la pile BLE (aucune n'est rejetée).
+    """
+
+    def __init__(self, store, from_minute=0):
+        self.store = store
+        self.minute = max(from_minute, store.first_minute)
+        self.end = store.next_minute
+        self.done = False
+        self.pages = 0
+
+    def next_page(self, buf, size):
+        """
+        Écrit la page suivante dans buf (au plus size octets)
+
+        Returns:
+            int: longueur de la page, 0 quand le transfert est terminé
+        """
+        if self.done:
+            return 0
+        store = self.store
+        # Des minutes ont pu sortir de l'anneau pendant le transfert
+        if self.minute < store.first_minute:
+            self.minute = store.first_minute
+        remaining = self.end - self.minute
+        if remaining < 0:
+            remaining = 0
+        count = (size - PAGE_HEADER_SIZE) // RECORD_SIZE
+        if count > PAGE_MAX_RECORDS:
+            count = PAGE_MAX_RECORDS
+        if count > remaining:
+            count = remaining
+        flags = count
+        if count == remaining:
+            flags |= PAGE_LAST
+            self.done = True
+        struct.pack_into(PAGE_HEADER_FMT, buf, 0, PAGE_MARKER, flags,
+                         self.minute, store.next_minute)
+        store.copy_into(buf, PAGE_HEADER_SIZE, self.minute, count)
+        self.minute += count
+        self.pages += 1
+        return PAGE_HEADER_SIZE + count * RECORD_SIZE
+
+
+def decode_page(page):
+    """
+    Décodage d'une page (côté téléphone / tests sur PC)
+
+    Returns:
+        dict: first_minute, device_minute, last, records [(steps, distance, calories, cadence, activity)]
+    """
+    marker, flags, first, device_minute = struct.unpack_from(PAGE_HEADER_FMT, page, 0)
+    if marker != PAGE_MARKER:
+        raise ValueError("pas une page d'historique")
+    count = flags & PAGE_MAX_RECORDS
+    records = []
+    for i in range(count):
+        steps, dist, cal, cadence, activity = struct.unpack_from(
+            RECORD_FMT, page, PAGE_HEADER_SIZE + i * RECORD_SIZE)
+        records.append((steps, dist / 10, cal / 100, cadence, activity))
+    return {'first_minute': first, 'device_minute': device_minute,
+            'last': bool(flags & PAGE_LAST), 'records': records}
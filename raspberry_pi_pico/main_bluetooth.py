@@ -4,246 +4,186 @@ Envoie les données du capteur MPU6050 via Bluetooth Low Energy (BLE)
 Utilise le service UART BLE pour la communication
 """
 
-import bluetooth
-import struct
-import time
-import math
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
 from machine import Pin, I2C
-from micropython import const
-import json
+import time
 
 from mpu6050 import MPU6050
 from step_detector import StepDetector
-
-# ---------- Configuration BLE UART ----------
-_IRQ_CENTRAL_CONNECT = const(1)
-_IRQ_CENTRAL_DISCONNECT = const(2)
-_IRQ_GATTS_WRITE = const(3)
-
-# UUID du service UART Nordic (standard)
-_UART_UUID = bluetooth.UUID("6E400001-B5A3-F393-E0A9-E50E24DCCA9E")
-_UART_TX = (
-    bluetooth.UUID("6E400003-B5A3-F393-E0A9-E50E24DCCA9E"),
-    bluetooth.FLAG_READ | bluetooth.FLAG_NOTIFY,
-)
-_UART_RX = (
-    bluetooth.UUID("6E400002-B5A3-F393-E0A9-E50E24DCCA9E"),
-    bluetooth.FLAG_WRITE | bluetooth.FLAG_WRITE_NO_RESPONSE,
-)
-_UART_SERVICE = (
-    _UART_UUID,
-    (_UART_TX, _UART_RX),
-)
-
-# Configuration Advertising
-_ADV_APPEARANCE_GENERIC_COMPUTER = const(128)
-_ADV_TYPE_FLAGS = const(0x01)
-_ADV_TYPE_NAME = const(0x09)
-_ADV_TYPE_UUID16_COMPLETE = const(0x3)
-_ADV_TYPE_UUID128_COMPLETE = const(0x7)
-_ADV_TYPE_APPEARANCE = const(0x19)
-
-
-class BLEPedometer:
-    def __init__(self, name="PicoW-Steps"):
-        self._ble = bluetooth.BLE()
-        self._ble.active(True)
-        self._ble.irq(self._irq)
-        
-        # Enregistrer le service UART
-        ((self._handle_tx, self._handle_rx),) = self._ble.gatts_register_services((_UART_SERVICE,))
-        
-        self._connections = set()
-        self._write_callback = None
-        
-        # Créer un payload minimal (comme test_ble_ultra_simple.py)
-        # Flags + Nom seulement, pas de UUID pour garder <31 bytes
-        payload = bytearray()
-        payload.append(0x02)  # Longueur flags
-        payload.append(0x01)  # Type: Flags
-        payload.append(0x06)  # Flags: General Discoverable + BR/EDR not supported
-        
-        name_bytes = name.encode('utf-8')
-        payload.append(len(name_bytes) + 1)  # Longueur nom
-        payload.append(0x09)  # Type: Complete Local Name
-        payload.extend(name_bytes)  # Nom
-        
-        self._payload = bytes(payload)
-        
-        self._advertise()
-        
-        print(f"[BLE] Dispositif '{name}' initialisé")
-        print(f"[BLE] Payload: {len(self._payload)} octets")
-        print("[BLE] Service UUID:", _UART_UUID)
-        print("[BLE] En attente de connexion...")
-
-    def _irq(self, event, data):
-        # Gestion des événements BLE
-        if event == _IRQ_CENTRAL_CONNECT:
-            conn_handle, _, _ = data
-            print(f"[BLE] Client connecté: {conn_handle}")
-            self._connections.add(conn_handle)
-            
-        elif event == _IRQ_CENTRAL_DISCONNECT:
-            conn_handle, _, _ = data
-            print(f"[BLE] Client déconnecté: {conn_handle}")
-            self._connections.remove(conn_handle)
-            # Recommencer l'advertising
-            self._advertise()
-            
-        elif event == _IRQ_GATTS_WRITE:
-            conn_handle, value_handle = data
-            value = self._ble.gatts_read(value_handle)
-            if value_handle == self._handle_rx and self._write_callback:
-                self._write_callback(value)
-
-    def send(self, data):
-        """Envoyer des données à tous les clients connectés"""
-        for conn_handle in self._connections:
-            try:
-                # BLE MTU typique: 20 bytes par notification
-                # Si données > 20 bytes, découper en chunks
-                data_bytes = data.encode('utf-8') if isinstance(data, str) else data
-                
-                # Envoyer par chunks de 20 bytes
-                chunk_size = 20
-                for i in range(0, len(data_bytes), chunk_size):
-                    chunk = data_bytes[i:i+chunk_size]
-                    self._ble.gatts_notify(conn_handle, self._handle_tx, chunk)
-                    time.sleep_ms(10)  # Petit délai entre chunks
-                    
-            except Exception as e:
-                print(f"[BLE] Erreur envoi: {e}")
-
-    def is_connected(self):
-        """Vérifie si au moins un client est connecté"""
-        return len(self._connections) > 0
-
-    def _advertise(self, interval_us=500000):
-        """Commencer l'advertising BLE"""
-        print("[BLE] Advertising démarré...")
-        self._ble.gap_advertise(interval_us, adv_data=self._payload)
-
-    @staticmethod
-    def _advertising_payload(name=None, services=None, appearance=0):
-        """Créer le payload d'advertising"""
-        payload = bytearray()
-
-        def _append(adv_type, value):
-            nonlocal payload
-            payload += struct.pack("BB", len(value) + 1, adv_type) + value
-
-        # Flags
-        _append(_ADV_TYPE_FLAGS, struct.pack("B", 0x06))
-
-        # Nom du dispositif
-        if name:
-            _append(_ADV_TYPE_NAME, name.encode())
-
-        # Services
-        if services:
-            for uuid in services:
-                b = bytes(uuid)
-                if len(b) == 2:
-                    _append(_ADV_TYPE_UUID16_COMPLETE, b)
-                elif len(b) == 16:
-                    _append(_ADV_TYPE_UUID128_COMPLETE, b)
-
-        # Appearance
-        if appearance:
-            _append(_ADV_TYPE_APPEARANCE, struct.pack("<h", appearance))
-
-        return payload
-
+from ble_pedometer import BLEPedometer
+from runtime import PedometerRuntime
+from history import HistoryStore
+from commands import CommandHandler
+from power import PowerManager
+from perf import Profiler, STAGE_FORMAT, STAGE_SEND
+import telemetry
+
+# Enregistrement des échantillons bruts sur la flash (diagnostic terrain,
+# relu sur PC avec tools/rawlog.py)
+RAW_LOG = False
+
+# Veille du capteur quand l'utilisateur est immobile (réveil sur
+# mouvement), fréquence du capteur selon l'activité, BLE ralenti au repos
+ADAPTIVE_POWER = True
+# Gyroscope arrêté quand le détecteur ne l'utilise pas (~3,3 mA de moins),
+# mais champs gyro de la télémétrie à 0: seulement si l'application ne
+# les affiche pas
+GYRO_STANDBY = False
+
+# Chronométrage des étapes de la boucle et suivi de la mémoire (GET_PERF,
+# GET_STATS), résumé dans la console toutes les 10 s
+PROFILE = True
 
 # ---------- Initialisation Capteurs ----------
+# GPIO reliée à la broche INT du MPU (None = lecture périodique)
+MPU_INT_PIN = None
+
 print("[INFO] Initialisation des capteurs...")
 i2c = I2C(0, scl=Pin(1), sda=Pin(0))
 mpu = MPU6050(i2c)
 step_detector = StepDetector(step_length=0.7)
+if MPU_INT_PIN is not None:
+    # Échantillons cadencés par le MPU (100 Hz) et horodatés dans l'IRQ
+    mpu.start_data_ready(Pin(MPU_INT_PIN, Pin.IN))
+    print(f"[INFO] Acquisition sur interruption DATA_RDY (GPIO {MPU_INT_PIN})")
 print("[INFO] MPU6050 initialisé avec succès")
 
 # ---------- Initialisation BLE ----------
-ble_pedometer = BLEPedometer(name="PicoW-Steps")
-
-# ---------- Boucle Principale ----------
-print("[INFO] Démarrage de la boucle principale...")
+# Chaque client a ses abonnements et son rythme (SUBSCRIBE, SET_RATE);
+# 500 ms par défaut, comme la période de publication
+ble_pedometer = BLEPedometer(name="PicoW-Steps", interval_ms=500)
+
+# ---------- Historique ----------
+# 12 h de minutes en RAM et en flash, synchronisées à la reconnexion
+history = HistoryStore(capacity=720, path='history.bin')
+print(f"[INFO] Historique: {len(history)} minutes en mémoire")
+
+# ---------- Publication ----------
+# JSON par défaut; chaque téléphone peut demander la trame binaire compacte
+# ou les trames delta (commande SET_FORMAT, voir commands.py)
+encoder = telemetry.TelemetryEncoder()
+# Périodique par défaut (jauges de l'application à jour toutes les 500 ms);
+# le téléphone peut demander l'envoi seulement sur pas détecté, sur
+# changement notable ou toutes les 5 s au plus tard (commande SET_PUBLISH)
+PUBLISH_ON_CHANGE = False
+change = telemetry.ChangeFilter(heartbeat_ms=5000, enabled=PUBLISH_ON_CHANGE)
 counter = 0
-temp_counter = 0
-last_send_time = time.ticks_ms()
-send_interval = 500  # Envoyer toutes les 500ms
-
-temp = 0.0  # Température initiale
-
-while True:
-    try:
-        # Lire les données du capteur MPU6050
-        accel = mpu.get_accel_data()
-        gyro = mpu.get_gyro_data()
-        
-        # Calculer la magnitude de l'accélération
-        magnitude = math.sqrt(accel['x']**2 + accel['y']**2 + accel['z']**2)
-        
-        # Détecter les pas
-        step_detector.update(magnitude)
-        
-        # Lire la température toutes les 5 secondes (100 itérations × 50ms)
-        temp_counter += 1
-        if temp_counter >= 100:
-            temp = mpu.get_temp()
-            temp_counter = 0
-        
-        # Calculer les métriques avec l'algorithme simple
-        distance = step_detector.step_count * step_detector.step_length
-        calories = step_detector.step_count * 0.04
-        speed = step_detector.get_speed()
-        cadence = 0.0
-        activity_type = "Marche"
-        
-        # Envoyer les données via BLE toutes les 500ms
-        current_time = time.ticks_ms()
-        if time.ticks_diff(current_time, last_send_time) >= send_interval:
-            if ble_pedometer.is_connected():
-                # Créer le message JSON avec plus de détails
-                message = json.dumps({
-                    "steps": step_detector.step_count,
-                    "speed": round(speed, 2),
-                    "distance": round(distance, 2),
-                    "calories": round(calories, 1),
-                    "cadence": round(cadence, 1),
-                    "activity": activity_type,
-                    "temp": round(temp, 1),
-                    "accel": {
-                        "x": round(accel['x'], 2),
-                        "y": round(accel['y'], 2),
-                        "z": round(accel['z'], 2)
-                    },
-                    "gyro": {
-                        "x": round(gyro['x'], 2),
-                        "y": round(gyro['y'], 2),
-                        "z": round(gyro['z'], 2)
-                    }
-                })
-                
-                # Ajouter délimiteur pour faciliter le parsing côté Flutter
-                ble_pedometer.send(message + "\n")
-                
-                # Debug: afficher toutes les 10 secondes
-                counter += 1
-                if counter >= 20:  # 20 × 500ms = 10s
-                    print(f"[DATA] Steps: {step_detector.step_count}, Speed: {speed:.2f} m/s, Temp: {temp:.1f}°C")
-                    counter = 0
-            
-            last_send_time = current_time
-        
-        # Attendre 50ms avant la prochaine lecture
-        time.sleep_ms(50)
-        
-    except KeyboardInterrupt:
-        print("\n[INFO] Arrêt du programme")
-        break
-    except Exception as e:
-        print(f"[ERROR] Exception: {e}")
-        time.sleep(1)
+connects = 0
+perf = Profiler() if PROFILE else None
+
+
+def publish(rt):
+    """
+    Envoyer les métriques via BLE (vérifié toutes les publish_ms, 500ms par défaut)
+    
+    Chaque format demandé (SET_FORMAT) est encodé une seule fois et partagé
+    par ses clients; chacun reçoit la trame de son format à son rythme.
+    Trames delta: encodées par client (référence acquittée propre à chacun)
+    """
+    global counter, connects
+    if not ble_pedometer.is_connected():
+        # Nouvelle connexion: repartir sur le mode de publication par
+        # défaut (le format est propre à chaque connexion)
+        change.enabled = PUBLISH_ON_CHANGE
+        change.reset()
+        return
+    if ble_pedometer.connects != connects:
+        # Nouveau client: instantané complet (sa référence delta est neuve)
+        connects = ble_pedometer.connects
+        change.reset()
+    
+    steps, speed, distance, calories, cadence, activity = rt.metrics()
+    ax, ay, az, gx, gy, gz = rt.last_raw
+    
+    # Debug: afficher toutes les 10 secondes
+    counter += 1
+    if counter >= 20:  # 20 × 500ms = 10s
+        st = ble_pedometer.stats()
+        print(f"[DATA] Steps: {steps}, Speed: {speed:.2f} m/s, Temp: {rt.temp:.1f}°C, "
+              f"cadence moyenne: {rt.detector.get_average_cadence():.0f} pas/min, "
+              f"BLE: {st['sent']} envoyées / {st['dropped']} rejetées, "
+              f"retards: {rt.overruns}, non envoyées (inchangées): {change.suppressed}")
+        if perf is not None:
+            print(perf.report())
+        counter = 0
+    
+    values = telemetry.scaled(steps, speed, distance, calories, cadence, activity,
+                              rt.temp, ax, ay, az, gx, gy, gz)
+    # Caractéristiques RSC et podomètre: notifiées aux abonnés si elles changent
+    ble_pedometer.update_metrics(values, int(rt.detector.step_length * 100))
+    # Un client qui a sauté la dernière trame (rythme plus lent) la reçoit
+    # à son échéance même sans changement
+    if not change.due(values) and not ble_pedometer.missed_due():
+        return
+    now = time.ticks_ms()
+    t0 = time.ticks_us()
+    frame = message = None
+    if ble_pedometer.clients(telemetry.FORMAT_BINARY):
+        # Trame binaire de 31 octets, sans allocation
+        frame = encoder.pack(values)
+    if ble_pedometer.clients(telemetry.FORMAT_JSON):
+        # Message JSON avec délimiteur '\n' (parsing côté Flutter)
+        message = telemetry.encode_json(steps, speed, distance, calories, cadence,
+                                        activity, rt.temp, ax, ay, az, gx, gy, gz)
+    t1 = time.ticks_us()
+    if frame is not None:
+        ble_pedometer.send(frame, now, telemetry.FORMAT_BINARY)
+    if message is not None:
+        ble_pedometer.send(message, now, telemetry.FORMAT_JSON)
+    if ble_pedometer.clients(telemetry.FORMAT_DELTA):
+        # Écarts à la dernière trame complète acquittée par chaque client
+        # (quelques octets), encodés et mis en file par connexion
+        ble_pedometer.send_delta(values, now)
+    if perf is not None:
+        perf.record(STAGE_FORMAT, time.ticks_diff(t1, t0))
+        perf.record(STAGE_SEND, time.ticks_diff(time.ticks_us(), t1))
+    change.sent(values)
+
+
+# ---------- Enregistreur brut ----------
+recorder = None
+if RAW_LOG:
+    from raw_recorder import RawRecorder
+    # Fichiers de 256 Ko, 1 Mo au total: les ~55 dernières minutes à 20 Hz
+    recorder = RawRecorder(directory='logs', file_bytes=256 * 1024,
+                           max_bytes=1024 * 1024, sample_ms=50)
+    print(f"[INFO] Enregistrement brut dans logs/ ({recorder.prefix}_*.bin)")
+
+# ---------- Gestion d'énergie ----------
+# Veille après 30 s sans pas, réveil quand l'accélération varie de plus
+# de 64 mg (mesurée 5 fois par seconde)
+power = None
+if ADAPTIVE_POWER:
+    power = PowerManager(mpu, ble_pedometer, idle_ms=30000, wake_hz=5, wake_mg=64,
+                         gyro_standby=GYRO_STANDBY)
+
+# ---------- Tâches ----------
+# Acquisition toutes les 50ms, télémétrie toutes les 500ms,
+# température toutes les 5s, files BLE vidées toutes les 20ms
+runtime = PedometerRuntime(mpu, step_detector, publish=publish, ble=ble_pedometer,
+                           on_step=change.step, recorder=recorder, history=history,
+                           power=power, perf=perf, sample_ms=50, publish_ms=500,
+                           temp_ms=5000, pump_ms=20)
+
+# ---------- Commandes (caractéristique RX) ----------
+# Format, fréquences, capteur, détecteur, profil, remise à zéro,
+# statistiques, compteurs de performance et synchronisation de
+# l'historique, avec acquittement
+commands = CommandHandler(runtime, ble_pedometer, history, change=change)
+ble_pedometer.on_write(commands.handle)
+# Publication au rythme du client le plus rapide, 500 ms sans client
+ble_pedometer.on_connections(commands.update_rate)
+
+print("[INFO] Démarrage des tâches...")
+try:
+    asyncio.run(runtime.run())
+except KeyboardInterrupt:
+    print("\n[INFO] Arrêt du programme")
+finally:
+    if recorder is not None:
+        recorder.close()
 
 print("[INFO] Programme terminé")
@@ -4,7 +4,9 @@ Supporte MPU6050, MPU6500 et MPU9250
 Compatible Raspberry Pi Pico WH
 """
 
-from machine import I2C
+from array import array
+import micropython
+import struct
 import time
 
 class MPU:
@@ -12,6 +14,7 @@ class MPU:
     
     # Registres communs
     PWR_MGMT_1 = 0x6B
+    PWR_MGMT_2 = 0x6C
     GYRO_CONFIG = 0x1B
     ACCEL_CONFIG = 0x1C
     CONFIG = 0x1A
@@ -23,11 +26,96 @@ class MPU:
     GYRO_XOUT_H = 0x43
     TEMP_OUT_H = 0x41
     
+    # Registres FIFO
+    FIFO_EN = 0x23
+    INT_STATUS = 0x3A
+    USER_CTRL = 0x6A
+    FIFO_COUNTH = 0x72
+    FIFO_R_W = 0x74
+    
+    # Bits FIFO
+    FIFO_EN_ACCEL = 0x08        # FIFO_EN: ACCEL_XOUT..ACCEL_ZOUT
+    FIFO_EN_GYRO = 0x70         # FIFO_EN: XG | YG | ZG
+    USER_CTRL_FIFO_EN = 0x40
+    USER_CTRL_FIFO_RESET = 0x04
+    INT_STATUS_FIFO_OFLOW = 0x10
+    
+    # Trame FIFO: accel (6) + gyro (6)
+    FIFO_FRAME_SIZE = 12
+    # Lecture FIFO maximale: 1020 octets = 85 trames (FIFO de 1024 octets,
+    # MPU6050), 504 octets = 42 trames (FIFO de 512 octets, MPU6500/MPU9250)
+    FIFO_MAX_FRAMES = 85
+    FIFO_MAX_FRAMES_6500 = 42
+    
+    # Registres d'interruption
+    INT_PIN_CFG = 0x37
+    INT_ENABLE = 0x38
+    INT_ENABLE_DATA_RDY = 0x01
+    
+    # Veille basse consommation (mode cycle) et réveil sur mouvement
+    ACCEL_CONFIG2 = 0x1D        # MPU6500/MPU9250
+    LP_ACCEL_ODR = 0x1E         # MPU6500/MPU9250
+    MOT_THR = 0x1F              # MOT_THR (MPU6050, 2 mg/LSB), WOM_THR (MPU6500, 4 mg/LSB)
+    MOT_DUR = 0x20              # MPU6050
+    MOT_DETECT_CTRL = 0x69
+    PWR_CYCLE = 0x20            # PWR_MGMT_1
+    PWR_TEMP_DIS = 0x08         # PWR_MGMT_1
+    STBY_GYRO = 0x07            # PWR_MGMT_2: STBY_XG | STBY_YG | STBY_ZG
+    INT_ENABLE_MOTION = 0x40
+    INT_STATUS_MOTION = 0x40
+    # Fréquences de réveil: LP_WAKE_CTRL (MPU6050), LP_ACCEL_ODR (MPU6500)
+    LP_WAKE_HZ_6050 = (1.25, 5, 20, 40)
+    LP_WAKE_HZ_6500 = (0.24, 0.49, 0.98, 1.95, 3.91, 7.81, 15.63, 31.25, 62.5, 125, 250, 500)
+    
+    # Taille d'une lecture en rafale (accel + temp + gyro)
+    BURST_SIZE = 14
+    
+    # Facteurs d'échelle (±2g, ±250°/s)
+    ACCEL_SCALE = 16384.0
+    GYRO_SCALE = 131.0
+    
     def __init__(self, i2c, addr=0x68):
         self.i2c = i2c
         self.addr = addr
         self.mpu_type = "Unknown"
         
+        # Tampon préalloué pour la lecture en rafale
+        # accel (6) + temp (2) + gyro (6) = 14 octets depuis ACCEL_XOUT_H
+        self._buf = bytearray(14)
+        self._mv = memoryview(self._buf)
+        
+        # Fréquence de sortie et filtre (appliqués par _configure)
+        self.sample_rate = 100
+        self.dlpf = 4
+        
+        # Gestion d'énergie: gyroscope en veille, mode cycle
+        self.gyro_enabled = True
+        self.motion_wake_enabled = False
+        self.wake_hz = 0
+        
+        # Mode FIFO (désactivé par défaut)
+        self.fifo_enabled = False
+        self.fifo_overflows = 0
+        # Taille de la FIFO selon le capteur détecté (512 octets par défaut)
+        self.fifo_max_frames = self.FIFO_MAX_FRAMES_6500
+        self._fifo_buf = None
+        self._fifo_mv = None
+        self._fifo_base_ms = 0
+        self._fifo_offset_us = 0
+        self._fifo_batch_start_us = 0
+        
+        # Mode interruption DATA_RDY (désactivé par défaut)
+        self.data_ready_enabled = False
+        self.dr_overruns = 0
+        self.dr_missed = 0
+        self._dr_pin = None
+        self._dr_ring = None
+        self._dr_ring_mv = None
+        self._dr_times = None
+        self._dr_head = 0
+        self._dr_tail = 0
+        self._dr_read_ref = self._on_data_ready
+        
         # Détecter le type de MPU
         self._detect_mpu()
         
@@ -45,6 +133,7 @@ class MPU:
             
             if who_am_i == 0x68:
                 self.mpu_type = "MPU6050"
+                self.fifo_max_frames = self.FIFO_MAX_FRAMES
             elif who_am_i == 0x70:
                 self.mpu_type = "MPU6500"
             elif who_am_i == 0x71:
@@ -67,37 +156,344 @@ class MPU:
             
             # Low Pass Filter: 20Hz (réduit le bruit)
             # Important pour MPU6500/MPU9250
-            self.i2c.writeto_mem(self.addr, self.CONFIG, b'\x04')
+            self.set_dlpf(4)
             
             # Sample Rate Divider: 100Hz (1kHz / (1 + 9) = 100Hz)
-            self.i2c.writeto_mem(self.addr, self.SMPLRT_DIV, b'\x09')
+            self.set_sample_rate(100)
             
             print(f"[MPU] Configuration appliquée pour {self.mpu_type}")
         except Exception as e:
             print(f"[MPU] Erreur configuration: {e}")
     
+    def set_dlpf(self, cfg):
+        """
+        Règle le filtre passe-bas numérique (CONFIG.DLPF_CFG, 1 à 6)
+        
+        1: ~184 Hz ... 4: ~20 Hz ... 6: ~5 Hz. Les valeurs 0 et 7 (filtre
+        coupé, base 8 kHz) ne sont pas acceptées: set_sample_rate suppose
+        une base de 1 kHz.
+        """
+        if not 1 <= cfg <= 6:
+            raise ValueError("DLPF 1..6")
+        self.i2c.writeto_mem(self.addr, self.CONFIG, bytes((cfg,)))
+        self.dlpf = cfg
+    
+    def set_sample_rate(self, hz):
+        """
+        Règle la fréquence d'échantillonnage (DLPF actif: base 1 kHz)
+        
+        Returns:
+            float: fréquence réellement appliquée (1000 / (1 + SMPLRT_DIV))
+        """
+        div = int(1000 // hz) - 1
+        if div < 0:
+            div = 0
+        elif div > 255:
+            div = 255
+        self.i2c.writeto_mem(self.addr, self.SMPLRT_DIV, bytes((div,)))
+        self.sample_rate = 1000 / (1 + div)
+        if self.fifo_enabled:
+            # Horodatage des trames déduit de la fréquence: repartir à vide
+            self._reset_fifo()
+        return self.sample_rate
+    
+    # ---------- Gestion d'énergie ----------
+    
+    def set_gyro_enabled(self, enabled):
+        """
+        Gyroscope actif ou en veille (PWR_MGMT_2), ~3,3 mA économisés
+        
+        En veille les registres du gyroscope restent à 0.
+        """
+        self.i2c.writeto_mem(self.addr, self.PWR_MGMT_2,
+                             b'\x00' if enabled else bytes((self.STBY_GYRO,)))
+        self.gyro_enabled = enabled
+    
+    def enable_motion_wake(self, threshold_mg=64, wake_hz=5):
+        """
+        Veille: accéléromètre seul en mode cycle, réveil sur mouvement
+        
+        Le MPU ne se réveille que wake_hz fois par seconde pour mesurer
+        l'accélération (gyroscope et température arrêtés, quelques dizaines
+        de µA) et lève INT_STATUS.MOT (et la broche INT) quand
+        l'accélération varie de plus de threshold_mg. Les registres de
+        données ne sont mis à jour qu'aux réveils: l'acquisition doit être
+        suspendue jusqu'à disable_motion_wake().
+        
+        Returns:
+            float: fréquence de réveil appliquée
+        """
+        w = self.i2c.writeto_mem
+        a = self.addr
+        w(a, self.INT_ENABLE, b'\x00')
+        if self.mpu_type == "MPU6050":
+            rates = self.LP_WAKE_HZ_6050
+            code = _nearest(rates, wake_hz)
+            # Filtre passe-haut 5 Hz de l'accéléromètre (détection de mouvement)
+            w(a, self.ACCEL_CONFIG, b'\x01')
+            w(a, self.MOT_THR, bytes((_clamp8(threshold_mg // 2),)))
+            w(a, self.MOT_DUR, b'\x01')
+            w(a, self.INT_ENABLE, bytes((self.INT_ENABLE_MOTION,)))
+            w(a, self.PWR_MGMT_2, bytes(((code << 6) | self.STBY_GYRO,)))
+            w(a, self.PWR_MGMT_1, bytes((self.PWR_CYCLE | self.PWR_TEMP_DIS,)))
+        else:
+            # MPU6500/MPU9250: Wake-on-Motion (ACCEL_INTEL)
+            rates = self.LP_WAKE_HZ_6500
+            code = _nearest(rates, wake_hz)
+            w(a, self.PWR_MGMT_2, bytes((self.STBY_GYRO,)))
+            w(a, self.ACCEL_CONFIG2, b'\x09')   # ACCEL_FCHOICE_B, A_DLPF_CFG 1
+            w(a, self.INT_ENABLE, bytes((self.INT_ENABLE_MOTION,)))
+            w(a, self.MOT_DETECT_CTRL, b'\xc0')  # ACCEL_INTEL_EN | ACCEL_INTEL_MODE
+            w(a, self.MOT_THR, bytes((_clamp8(threshold_mg // 4),)))
+            w(a, self.LP_ACCEL_ODR, bytes((code,)))
+            w(a, self.PWR_MGMT_1, bytes((self.PWR_CYCLE,)))
+        self.motion_wake_enabled = True
+        self.wake_hz = rates[code]
+        # Effacer un mouvement antérieur à la mise en veille
+        self.motion_detected()
+        return self.wake_hz
+    
+    def disable_motion_wake(self):
+        """Sortie de veille: mode normal, interruptions et FIFO rétablies"""
+        w = self.i2c.writeto_mem
+        a = self.addr
+        w(a, self.PWR_MGMT_1, b'\x00')
+        w(a, self.PWR_MGMT_2, b'\x00' if self.gyro_enabled else bytes((self.STBY_GYRO,)))
+        if self.mpu_type == "MPU6050":
+            w(a, self.ACCEL_CONFIG, b'\x00')
+        else:
+            w(a, self.MOT_DETECT_CTRL, b'\x00')
+            w(a, self.ACCEL_CONFIG2, b'\x00')
+        w(a, self.INT_ENABLE, bytes((self.INT_ENABLE_DATA_RDY,)) if self.data_ready_enabled else b'\x00')
+        self.motion_wake_enabled = False
+        self.wake_hz = 0
+        # Échantillons de la période de veille: sans intérêt
+        self._dr_tail = self._dr_head
+        if self.fifo_enabled:
+            self._reset_fifo()
+    
+    def motion_detected(self):
+        """True si un mouvement a été détecté depuis la dernière lecture (INT_STATUS)"""
+        self.i2c.readfrom_mem_into(self.addr, self.INT_STATUS, self._mv[0:1])
+        return bool(self._buf[0] & self.INT_STATUS_MOTION)
+    
+    # ---------- Mode FIFO ----------
+    
+    def enable_fifo(self):
+        """Active la FIFO matérielle pour accel + gyro (12 octets par trame)"""
+        if self._fifo_buf is None:
+            self._fifo_buf = bytearray(self.fifo_max_frames * self.FIFO_FRAME_SIZE)
+            self._fifo_mv = memoryview(self._fifo_buf)
+        self.i2c.writeto_mem(self.addr, self.FIFO_EN, b'\x00')
+        self._reset_fifo()
+        self.i2c.writeto_mem(self.addr, self.FIFO_EN,
+                             bytes((self.FIFO_EN_ACCEL | self.FIFO_EN_GYRO,)))
+        self.fifo_enabled = True
+    
+    def disable_fifo(self):
+        """Désactive la FIFO et revient au mode lecture directe"""
+        self.i2c.writeto_mem(self.addr, self.FIFO_EN, b'\x00')
+        self.i2c.writeto_mem(self.addr, self.USER_CTRL, b'\x00')
+        self.fifo_enabled = False
+    
+    def _reset_fifo(self):
+        """Vide la FIFO et recale l'horloge des trames sur maintenant"""
+        self.i2c.writeto_mem(self.addr, self.USER_CTRL,
+                             bytes((self.USER_CTRL_FIFO_RESET,)))
+        self.i2c.writeto_mem(self.addr, self.USER_CTRL,
+                             bytes((self.USER_CTRL_FIFO_EN,)))
+        self._fifo_base_ms = time.ticks_ms()
+        self._fifo_offset_us = 0
+    
+    def fifo_count(self):
+        """Nombre d'octets en attente dans la FIFO"""
+        self.i2c.readfrom_mem_into(self.addr, self.FIFO_COUNTH, self._mv[0:2])
+        return struct.unpack_from('>H', self._buf, 0)[0]
+    
+    def read_fifo(self, max_frames=None):
+        """
+        Vide la FIFO en une seule lecture groupée
+        
+        Les trames sont copiées dans un tampon réutilisé, puis parcourues
+        avec fifo_frames(). En cas de débordement la FIFO est réinitialisée
+        (les données partielles seraient désalignées).
+        
+        Returns:
+            int: nombre de trames lues
+        """
+        self.i2c.readfrom_mem_into(self.addr, self.INT_STATUS, self._mv[0:1])
+        if self._buf[0] & self.INT_STATUS_FIFO_OFLOW:
+            self.fifo_overflows += 1
+            self._reset_fifo()
+            return 0
+        
+        available = self.fifo_count() // self.FIFO_FRAME_SIZE
+        n = available
+        if max_frames is None or max_frames > self.fifo_max_frames:
+            max_frames = self.fifo_max_frames
+        if n > max_frames:
+            n = max_frames
+        if n:
+            self.i2c.readfrom_mem_into(self.addr, self.FIFO_R_W,
+                                       self._fifo_mv[0:n * self.FIFO_FRAME_SIZE])
+        self._fifo_batch_start_us = self._fifo_offset_us
+        self._fifo_offset_us += int(n * 1000000 / self.sample_rate)
+        
+        self._advance_fifo_clock(n == available)
+        return n
+    
+    def _advance_fifo_clock(self, drained):
+        """Reporte l'offset sur la base (entiers courts) et corrige la dérive"""
+        carry_ms = self._fifo_offset_us // 1000
+        self._fifo_base_ms = time.ticks_add(self._fifo_base_ms, carry_ms)
+        self._fifo_offset_us -= carry_ms * 1000
+        self._fifo_batch_start_us -= carry_ms * 1000
+        
+        # FIFO entièrement vidée: la dernière trame date de moins d'une
+        # période, on recale la base si l'horloge du capteur a dérivé
+        if drained:
+            period_ms = 1000 / self.sample_rate
+            drift_ms = time.ticks_diff(time.ticks_ms(), self._fifo_base_ms)
+            if drift_ms < 0 or drift_ms > 2 * period_ms:
+                self._fifo_base_ms = time.ticks_add(self._fifo_base_ms, drift_ms)
+    
+    def fifo_frames(self, n):
+        """
+        Parcourt les n trames lues par read_fifo()
+        
+        Yields:
+            tuple: (t_ms, ax, ay, az, gx, gy, gz), t_ms déduit de la
+            fréquence d'échantillonnage configurée (ticks_ms)
+        """
+        period = 1000000 / self.sample_rate
+        base = self._fifo_base_ms
+        start = self._fifo_batch_start_us
+        for i in range(n):
+            ax, ay, az, gx, gy, gz = struct.unpack_from(
+                '>6h', self._fifo_buf, i * self.FIFO_FRAME_SIZE)
+            t = time.ticks_add(base, int(start + (i + 1) * period) // 1000)
+            yield t, ax, ay, az, gx, gy, gz
+    
+    # ---------- Mode interruption DATA_RDY ----------
+    
+    def start_data_ready(self, pin, capacity=32):
+        """
+        Acquisition pilotée par l'interruption DATA_RDY du MPU
+        
+        Le MPU pulse sa broche INT à chaque nouvel échantillon (fréquence
+        réglée par set_sample_rate). L'IRQ horodate l'échantillon puis
+        planifie via micropython.schedule une lecture en rafale dans un
+        anneau préalloué, consommé avec pop_sample().
+        
+        Args:
+            pin: machine.Pin en entrée reliée à la broche INT du MPU
+            capacity: nombre d'échantillons conservés dans l'anneau
+        """
+        # Une case de plus que la capacité: anneau plein sans compteur partagé
+        slots = capacity + 1
+        if self._dr_times is None or len(self._dr_times) != slots:
+            self._dr_ring = bytearray(slots * self.BURST_SIZE)
+            self._dr_ring_mv = memoryview(self._dr_ring)
+            self._dr_times = array('l', [0] * slots)
+        self._dr_head = 0
+        self._dr_tail = 0
+        
+        # INT active haut, push-pull, impulsion de 50 µs (pas de verrouillage)
+        self.i2c.writeto_mem(self.addr, self.INT_PIN_CFG, b'\x00')
+        self.i2c.writeto_mem(self.addr, self.INT_ENABLE,
+                             bytes((self.INT_ENABLE_DATA_RDY,)))
+        self._dr_pin = pin
+        pin.irq(handler=self._dr_irq, trigger=pin.IRQ_RISING)
+        self.data_ready_enabled = True
+    
+    def stop_data_ready(self):
+        """Désactive l'interruption DATA_RDY"""
+        self.i2c.writeto_mem(self.addr, self.INT_ENABLE, b'\x00')
+        if self._dr_pin is not None:
+            self._dr_pin.irq(handler=None)
+            self._dr_pin = None
+        self.data_ready_enabled = False
+    
+    def _dr_irq(self, pin):
+        # Contexte IRQ: horodater et différer la lecture I2C
+        try:
+            micropython.schedule(self._dr_read_ref, time.ticks_ms())
+        except RuntimeError:
+            # File de micropython.schedule pleine
+            self.dr_missed += 1
+    
+    def _on_data_ready(self, t):
+        # Producteur unique: n'écrit que _dr_head (le consommateur n'écrit
+        # que _dr_tail), pas besoin de section critique
+        i = self._dr_head
+        nxt = i + 1
+        if nxt == len(self._dr_times):
+            nxt = 0
+        if nxt == self._dr_tail:
+            # Anneau plein: l'échantillon est perdu
+            self.dr_overruns += 1
+            return
+        off = i * self.BURST_SIZE
+        self.i2c.readfrom_mem_into(self.addr, self.ACCEL_XOUT_H,
+                                   self._dr_ring_mv[off:off + self.BURST_SIZE])
+        self._dr_times[i] = t
+        self._dr_head = nxt
+    
+    def samples_available(self):
+        """Nombre d'échantillons DATA_RDY en attente"""
+        if self._dr_times is None:
+            return 0
+        n = self._dr_head - self._dr_tail
+        return n if n >= 0 else n + len(self._dr_times)
+    
+    def pop_sample(self):
+        """
+        Retire l'échantillon le plus ancien de l'anneau DATA_RDY
+        
+        Returns:
+            tuple: (t_ms, ax, ay, az, temp, gx, gy, gz) ou None si vide
+        """
+        i = self._dr_tail
+        if i == self._dr_head:
+            return None
+        ax, ay, az, temp, gx, gy, gz = struct.unpack_from(
+            '>7h', self._dr_ring, i * self.BURST_SIZE)
+        t = self._dr_times[i]
+        i += 1
+        self._dr_tail = 0 if i == len(self._dr_times) else i
+        return t, ax, ay, az, temp, gx, gy, gz
+    
     def read_raw_data(self, reg):
-        """Lit 2 bytes et les convertit en valeur signée"""
-        high = self.i2c.readfrom_mem(self.addr, reg, 1)
-        low = self.i2c.readfrom_mem(self.addr, reg+1, 1)
-        value = (high[0] << 8) | low[0]
-        if value > 32768:
-            value = value - 65536
-        return value
+        """Lit 2 bytes en une transaction et les convertit en valeur signée"""
+        self.i2c.readfrom_mem_into(self.addr, reg, self._mv[0:2])
+        return struct.unpack_from('>h', self._buf, 0)[0]
+    
+    def read_all_raw(self):
+        """
+        Lit les 14 registres de données en une seule transaction I2C
+        
+        Les octets haut/bas proviennent tous du même échantillon
+        (pas de lecture déchirée entre deux mises à jour du capteur).
+        
+        Returns:
+            tuple: (ax, ay, az, temp, gx, gy, gz) en valeurs brutes int16
+        """
+        self.i2c.readfrom_mem_into(self.addr, self.ACCEL_XOUT_H, self._buf)
+        return struct.unpack_from('>7h', self._buf, 0)
     
     def get_accel_data(self):
         """Lit les données de l'accéléromètre (en g)"""
-        acc_x = self.read_raw_data(self.ACCEL_XOUT_H) / 16384.0
-        acc_y = self.read_raw_data(self.ACCEL_XOUT_H + 2) / 16384.0
-        acc_z = self.read_raw_data(self.ACCEL_XOUT_H + 4) / 16384.0
-        return {'x': acc_x, 'y': acc_y, 'z': acc_z}
+        self.i2c.readfrom_mem_into(self.addr, self.ACCEL_XOUT_H, self._mv[0:6])
+        x, y, z = struct.unpack_from('>3h', self._buf, 0)
+        s = self.ACCEL_SCALE
+        return {'x': x / s, 'y': y / s, 'z': z / s}
     
     def get_gyro_data(self):
         """Lit les données du gyroscope (en °/s)"""
-        gyro_x = self.read_raw_data(self.GYRO_XOUT_H) / 131.0
-        gyro_y = self.read_raw_data(self.GYRO_XOUT_H + 2) / 131.0
-        gyro_z = self.read_raw_data(self.GYRO_XOUT_H + 4) / 131.0
-        return {'x': gyro_x, 'y': gyro_y, 'z': gyro_z}
+        self.i2c.readfrom_mem_into(self.addr, self.GYRO_XOUT_H, self._mv[0:6])
+        x, y, z = struct.unpack_from('>3h', self._buf, 0)
+        s = self.GYRO_SCALE
+        return {'x': x / s, 'y': y / s, 'z': z / s}
     
     def get_temp(self):
         """Lit la température du capteur (en °C)"""
@@ -106,13 +502,26 @@ class MPU:
         return temp_c
     
     def get_all_data(self):
-        """Lit toutes les données en une fois (optimisé)"""
+        """Lit toutes les données en une seule lecture en rafale (14 octets)"""
+        ax, ay, az, t, gx, gy, gz = self.read_all_raw()
+        a = self.ACCEL_SCALE
+        g = self.GYRO_SCALE
         return {
-            'accel': self.get_accel_data(),
-            'gyro': self.get_gyro_data(),
-            'temp': self.get_temp()
+            'accel': {'x': ax / a, 'y': ay / a, 'z': az / a},
+            'gyro': {'x': gx / g, 'y': gy / g, 'z': gz / g},
+            'temp': (t / 340.0) + 36.53
         }
 
+def _nearest(rates, hz):
+    """Index de la fréquence la plus proche de hz"""
+    best = 0
+    for i in range(len(rates)):
+        if abs(rates[i] - hz) < abs(rates[best] - hz):
+            best = i
+    return best
+
+def _clamp8(v):
+    return 1 if v < 1 else 255 if v > 255 else int(v)
 
 # Alias pour compatibilité avec le code existant
 class MPU6050(MPU):
@@ -0,0 +1,426 @@
+"""
+Envoi de la télémétrie à un broker MQTT (firmware Wi-Fi, main_updated.py)
+Échantillons pris toutes les sample_ms (1 s), regroupés en lots publiés en
+QoS 0 toutes les batch_ms sur une connexion persistante (MQTT 3.1.1)
+
+- un échantillon = les 13 valeurs entières de la trame v1
+  (telemetry.scaled), 29 octets dans le lot en cours (tampon préalloué)
+- lot JSON sur devices/{id}/telemetry: clés lues par l'application
+  (device_id, total_steps, steps_delta, timestamp) et échantillons en
+  tableaux d'entiers (ordre de telemetry.FIELDS)
+- ou lot binaire sur devices/{id}/batch: en-tête BATCH_HEADER_FMT puis
+  les échantillons (SAMPLE_FMT)
+- broker injoignable: lots gardés en RAM (ram_batches), les plus anciens
+  versés dans un fichier sur la flash (spool_bytes au plus) et republiés
+  dans l'ordre à la reconnexion; reconnexion après une attente doublée à
+  chaque échec, avec un aléa pour qu'une flotte ne revienne pas d'un bloc
+
+QoS 0: un lot écrit sur une connexion qui vient de tomber peut être perdu
+et un lot interrompu peut être republié; seq (numéro du premier
+échantillon) permet au serveur de repérer trous et doublons.
+"""
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+import json
+import os
+import random
+import struct
+import time
+
+import telemetry
+
+FORMAT_JSON = telemetry.FORMAT_JSON
+FORMAT_BINARY = telemetry.FORMAT_BINARY
+
+# Échantillon: champs de la trame v1 sans version ni seq (ordre de FIELDS)
+SAMPLE_FMT = '<IHIHHBh6h'
+SAMPLE_SIZE = struct.calcsize(SAMPLE_FMT)
+
+# Lot binaire: marker u8 | count u8 | seq u32 (premier échantillon)
+#   | t u32 (time.time() du premier) | dt u16 (ms), puis count échantillons
+BATCH_MARKER = 0xB7
+BATCH_HEADER_FMT = '<BBIIH'
+BATCH_HEADER_SIZE = struct.calcsize(BATCH_HEADER_FMT)
+MAX_SAMPLES = 255
+
+# Paquets MQTT 3.1.1 (octet de tête)
+_CONNECT = 0x10
+_CONNACK = 0x20
+_PUBLISH = 0x30
+_PINGREQ = b"\xc0\x00"
+_DISCONNECT = b"\xe0\x00"
+
+# Fichier d'attente sur la flash: longueur u16 puis lot, à la suite
+_SPOOL_LEN = '<H'
+_TIMEOUT_S = 10
+
+
+def _remaining_length(n):
+    """Longueur restante MQTT (7 bits par octet, 4 octets au plus)"""
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        out.append(b | 0x80 if n else b)
+        if not n:
+            return out
+
+
+def _string(s):
+    if isinstance(s, str):
+        s = s.encode()
+    return struct.pack('!H', len(s)) + s
+
+
+def connect_packet(client_id, keepalive_s, user=None, password=None):
+    """Paquet CONNECT (session propre)"""
+    flags = 0x02
+    payload = _string(client_id)
+    if user is not None:
+        flags |= 0x80
+        payload += _string(user)
+        if password is not None:
+            flags |= 0x40
+            payload += _string(password)
+    body = _string(b"MQTT") + bytes((4, flags)) + struct.pack('!H', keepalive_s) + payload
+    return bytes((_CONNECT,)) + _remaining_length(len(body)) + body
+
+
+def publish_header(topic, n):
+    """En-tête d'un PUBLISH QoS 0 pour une charge de n octets"""
+    t = _string(topic)
+    return bytes((_PUBLISH,)) + _remaining_length(len(t) + n) + t
+
+
+def decode_batch(payload):
+    """
+    Décodeur de référence d'un lot, JSON ou binaire (côté serveur / tests)
+
+    Returns:
+        dict: seq, t, dt (ms) et samples (tuples dans l'ordre de FIELDS)
+    """
+    if payload[:1] == b"{":
+        d = json.loads(payload)
+        return {'seq': d['seq'], 't': d['t'], 'dt': d['dt'],
+                'samples': [tuple(s) for s in d['samples']]}
+    if len(payload) < BATCH_HEADER_SIZE or payload[0] != BATCH_MARKER:
+        raise ValueError("lot invalide")
+    _, n, seq, t, dt = struct.unpack_from(BATCH_HEADER_FMT, payload, 0)
+    if len(payload) != BATCH_HEADER_SIZE + n * SAMPLE_SIZE:
+        raise ValueError("lot tronqué")
+    return {'seq': seq, 't': t, 'dt': dt,
+            'samples': [struct.unpack_from(SAMPLE_FMT, payload, BATCH_HEADER_SIZE + i * SAMPLE_SIZE)
+                        for i in range(n)]}
+
+
+class MqttPublisher:
+    """
+    Client MQTT en publication seule, lots en QoS 0
+
+    Usage:
+        mqtt = MqttPublisher("pico-1234", "192.168.1.10")
+        mqtt.start(lambda: telemetry.scaled(...))   # dans la boucle asyncio
+    """
+
+    def __init__(self, device_id, broker, port=1883, sample_ms=1000, batch_ms=10000,
+                 fmt=FORMAT_JSON, keepalive_s=60, ram_batches=16, spool='mqtt_spool.bin',
+                 spool_bytes=65536, backoff_ms=(1000, 60000), user=None, password=None):
+        """
+        Args:
+            batch_ms: cadence de publication (batch_ms // sample_ms
+                échantillons par lot, 255 au plus)
+            ram_batches: lots gardés en RAM pendant une coupure
+            spool: fichier de la flash pour les lots suivants (None = RAM seule)
+            backoff_ms: (première, plus longue) attente avant reconnexion
+        """
+        self.device_id = device_id
+        self.broker = broker
+        self.port = port
+        self.sample_ms = sample_ms
+        self.batch_samples = max(1, min(MAX_SAMPLES, batch_ms // sample_ms))
+        self.format = fmt
+        self.topic = ("devices/%s/telemetry" if fmt == FORMAT_JSON else
+                      "devices/%s/batch") % device_id
+        self.keepalive_s = keepalive_s
+        self.ram_batches = ram_batches
+        self.spool = spool
+        self.spool_bytes = spool_bytes
+        self.backoff_ms = backoff_ms
+        self.user = user
+        self.password = password
+
+        self._samples = bytearray(self.batch_samples * SAMPLE_SIZE)
+        self._count = 0
+        self._seq = 0           # numéro du premier échantillon du lot en cours
+        self._first_t = 0
+        self._steps = None      # total de pas à la fin du lot précédent
+        self._pending = []      # lots encodés en RAM, le plus ancien en tête
+        self._spool_size = 0
+        self._spool_read = 0
+        self._ready = asyncio.Event()
+        self._reader = None
+        self._writer = None
+        self._rx_ms = 0
+        self._ping_ms = 0
+        self._failures = 0
+        self._tasks = ()
+        self.connected = False
+        # Compteurs
+        self.batches = 0
+        self.published = 0
+        self.spooled = 0
+        self.lost = 0
+        self.connects = 0
+        self.disconnects = 0
+        if spool is not None:
+            try:
+                # Lots d'avant un redémarrage: republiés à la connexion
+                self._spool_size = os.stat(spool)[6]
+            except OSError:
+                pass
+
+    # ---------- Lots ----------
+
+    def add(self, values, t=None):
+        """Ajoute un échantillon (telemetry.scaled()); publie le lot s'il est plein"""
+        if self._count == 0:
+            self._first_t = int(time.time()) if t is None else t
+        struct.pack_into(SAMPLE_FMT, self._samples, self._count * SAMPLE_SIZE, *values)
+        self._count += 1
+        if self._count == self.batch_samples:
+            self.flush_batch()
+
+    def flush_batch(self):
+        """Encode le lot en cours et le met en attente d'envoi"""
+        n = self._count
+        if not n:
+            return
+        payload = self._encode(n)
+        self._seq += n
+        self._count = 0
+        self.batches += 1
+        self._pending.append(payload)
+        if len(self._pending) > self.ram_batches:
+            self._spill(self._pending.pop(0))
+        self._ready.set()
+
+    def _encode(self, n):
+        if self.format == FORMAT_BINARY:
+            return (struct.pack(BATCH_HEADER_FMT, BATCH_MARKER, n, self._seq, self._first_t,
+                                self.sample_ms) + self._samples[:n * SAMPLE_SIZE])
+        samples = [struct.unpack_from(SAMPLE_FMT, self._samples, i * SAMPLE_SIZE)
+                   for i in range(n)]
+        total = samples[-1][0]
+        last = samples[0][0] if self._steps is None else self._steps
+        self._steps = total
+        return json.dumps({
+            "device_id": self.device_id,
+            "seq": self._seq,
+            "t": self._first_t,
+            "timestamp": "%04d-%02d-%02dT%02d:%02d:%02dZ" % time.gmtime(self._first_t)[:6],
+            "dt": self.sample_ms,
+            "total_steps": total,
+            "steps_delta": total - last,
+            "samples": samples,
+        }).encode()
+
+    def _spill(self, payload):
+        """Verse un lot sur la flash (perdu si le fichier est plein)"""
+        n = len(payload)
+        if self.spool is None or self._spool_size + 2 + n > self.spool_bytes:
+            self.lost += 1
+            return
+        try:
+            with open(self.spool, 'ab') as f:
+                f.write(struct.pack(_SPOOL_LEN, n))
+                f.write(payload)
+            self._spool_size += 2 + n
+            self.spooled += 1
+        except OSError:
+            self.lost += 1
+
+    # ---------- Connexion ----------
+
+    def start(self, sample):
+        """
+        Lance l'échantillonnage et la connexion (dans la boucle asyncio)
+
+        Args:
+            sample: fonction sans argument qui renvoie telemetry.scaled()
+        """
+        self._tasks = (asyncio.create_task(self._sample_loop(sample)),
+                       asyncio.create_task(self._connection_loop()))
+
+    async def stop(self):
+        """Publie le lot en cours et les lots en attente si possible, puis se déconnecte"""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = ()
+        self.flush_batch()
+        if self.connected:
+            try:
+                await asyncio.wait_for(self._flush(), _TIMEOUT_S)
+                self._writer.write(_DISCONNECT)
+                await self._writer.drain()
+            except (OSError, EOFError, asyncio.TimeoutError):
+                pass
+        self._close()
+
+    def stats(self):
+        return {
+            'samples': self._seq + self._count,
+            'connected': self.connected,
+            'connects': self.connects,
+            'disconnects': self.disconnects,
+            'batches': self.batches,
+            'published': self.published,
+            'pending': len(self._pending),
+            'spooled': self.spooled,
+            'spool_bytes': self._spool_size - self._spool_read,
+            'lost': self.lost,
+        }
+
+    async def _sample_loop(self, sample):
+        due = time.ticks_ms()
+        while True:
+            self.add(sample())
+            due = time.ticks_add(due, self.sample_ms)
+            delay = time.ticks_diff(due, time.ticks_ms())
+            if delay < 0:
+                # En retard: pas de rattrapage en rafale
+                due = time.ticks_ms()
+                delay = 0
+            await asyncio.sleep(delay / 1000)
+
+    async def _connection_loop(self):
+        while True:
+            established = False
+            try:
+                await self._connect()
+                established = True
+                self._failures = 0
+                await self._serve()
+            except (OSError, EOFError, asyncio.TimeoutError):
+                pass
+            if established:
+                self.disconnects += 1
+            self._close()
+            self._failures += 1
+            await asyncio.sleep(self._backoff() / 1000)
+
+    def _backoff(self):
+        """Attente avant la prochaine tentative (ms): doublée à chaque échec, aléa de 0 à 50 %"""
+        lo, hi = self.backoff_ms
+        delay = lo << min(self._failures - 1, 16)
+        if delay > hi:
+            delay = hi
+        return delay + (((delay >> 1) * random.getrandbits(8)) >> 8)
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.broker, self.port), _TIMEOUT_S)
+        self._writer.write(connect_packet(self.device_id, self.keepalive_s,
+                                          self.user, self.password))
+        await self._writer.drain()
+        connack = await asyncio.wait_for(self._reader.readexactly(4), _TIMEOUT_S)
+        if connack[0] != _CONNACK or connack[3] != 0:
+            raise OSError("connexion MQTT refusée (%d)" % connack[3])
+        self.connected = True
+        self.connects += 1
+        self._rx_ms = self._ping_ms = time.ticks_ms()
+
+    def _close(self):
+        self.connected = False
+        if self._writer is not None:
+            try:
+                self._writer.close()
+            except OSError:
+                pass
+        self._reader = self._writer = None
+
+    async def _serve(self):
+        """Connexion établie: publie les lots en attente, ping toutes les keepalive_s / 2"""
+        receiver = asyncio.create_task(self._receive())
+        try:
+            while self.connected:
+                self._ready.clear()
+                await self._flush()
+                try:
+                    await asyncio.wait_for(self._ready.wait(), self.keepalive_s / 2)
+                except asyncio.TimeoutError:
+                    pass
+                now = time.ticks_ms()
+                if time.ticks_diff(now, self._rx_ms) > self.keepalive_s * 1000:
+                    raise OSError("broker muet")
+                if self.connected and time.ticks_diff(now, self._ping_ms) >= self.keepalive_s * 500:
+                    self._ping_ms = now
+                    self._writer.write(_PINGREQ)
+                    await self._writer.drain()
+        finally:
+            receiver.cancel()
+
+    async def _receive(self):
+        """Paquets du broker (PINGRESP); détecte la fin de la connexion"""
+        reader = self._reader
+        try:
+            while True:
+                head = await reader.readexactly(2)
+                n = 0
+                shift = 0
+                b = head[1]
+                while True:
+                    n |= (b & 0x7F) << shift
+                    if b < 0x80:
+                        break
+                    shift += 7
+                    b = (await reader.readexactly(1))[0]
+                if n:
+                    await reader.readexactly(n)
+                self._rx_ms = time.ticks_ms()
+        except (OSError, EOFError):
+            pass
+        self.connected = False
+        self._ready.set()
+
+    async def _flush(self):
+        """Publie les lots en attente, ceux de la flash d'abord (les plus anciens)"""
+        while True:
+            if self._spool_read < self._spool_size:
+                with open(self.spool, 'rb') as f:
+                    f.seek(self._spool_read)
+                    head = f.read(2)
+                    n = struct.unpack(_SPOOL_LEN, head)[0] if len(head) == 2 else 0
+                    payload = f.read(n)
+                if not n or len(payload) != n:
+                    # Fin de fichier tronquée (coupure pendant l'écriture)
+                    self._spool_read = self._spool_size
+                    continue
+                await self._publish(payload)
+                self._spool_read += 2 + n
+                continue
+            if self._spool_size:
+                os.remove(self.spool)
+                self._spool_size = self._spool_read = 0
+            if not self._pending:
+                return
+            # Retiré de la file avant l'envoi: pendant drain(), la RAM pleine
+            # verse sur la flash les lots suivants (publiés au tour suivant,
+            # avant ceux restés en RAM), jamais celui-ci
+            payload = self._pending.pop(0)
+            try:
+                await self._publish(payload)
+            except BaseException:
+                # Échec ou annulation (stop): republié en tête de la RAM à la
+                # reconnexion (après les lots versés entre-temps: seq)
+                self._pending.insert(0, payload)
+                raise
+
+    async def _publish(self, payload):
+        if not self.connected:
+            raise OSError("déconnecté")
+        self._writer.write(publish_header(self.topic, len(payload)))
+        self._writer.write(payload)
+        await self._writer.drain()
+        self.published += 1
@@ -0,0 +1,120 @@
+"""
+Compteurs de performance du firmware (time.ticks_us)
+Temps passé par étape de la boucle (lecture I2C, détection, formatage,
+mise en file BLE, envoi radio, marge avant l'échéance d'acquisition),
+collectes du ramasse-miettes et mémoire libre minimale
+
+Tous les compteurs sont préalloués (array): une mesure n'alloue rien.
+Lus sur le téléphone par la commande GET_PERF (commands.py) et affichés
+dans la console par report().
+"""
+import gc
+from array import array
+
+STAGE_READ = 0      # lecture du capteur (I2C, FIFO ou IRQ)
+STAGE_DETECT = 1    # détecteur de pas, par échantillon
+STAGE_FORMAT = 2    # encodage de la télémétrie (JSON, binaire, delta)
+STAGE_SEND = 3      # BLEPedometer.send (copie dans les files)
+STAGE_PUMP = 4      # BLEPedometer.pump (notifications, radio)
+STAGE_SLACK = 5     # marge avant l'échéance d'acquisition (sommeil)
+STAGE_NAMES = ("lecture", "détection", "format", "file", "radio", "marge")
+
+# Histogrammes: classe 0 < 64 µs, classe k < 64 << k µs, la dernière
+# au-delà de 65 ms
+BUCKETS = 12
+_BUCKET_SHIFT = 6
+
+
+class Profiler:
+    """
+    Histogrammes de durée par étape et état de la mémoire
+
+    Usage dans le code instrumenté:
+        t = time.ticks_us()
+        ...
+        perf.record(STAGE_DETECT, time.ticks_diff(time.ticks_us(), t))
+
+    La mémoire est relevée par sample_memory() (gc.mem_free() parcourt le
+    tas: à appeler hors du chemin critique, quelques fois par seconde).
+    Une collecte est comptée quand la mémoire libre remonte entre deux
+    relevés (au moins une collecte dans l'intervalle).
+    """
+
+    def __init__(self, stages=len(STAGE_NAMES)):
+        self.stages = stages
+        self._count = array('L', [0] * stages)
+        self._ms = array('L', [0] * stages)    # total en ms ...
+        self._us = array('H', [0] * stages)    # ... et reste en µs
+        self._max = array('L', [0] * stages)
+        self._hist = array('L', [0] * (stages * BUCKETS))
+        self.gc_collections = 0
+        self.mem_low = None
+        self._mem_last = None
+
+    def record(self, stage, us):
+        """Ajoute une durée (µs) à l'étape stage"""
+        if us < 0:
+            us = 0
+        self._count[stage] += 1
+        t = self._us[stage] + us
+        if t >= 1000:
+            self._ms[stage] += t // 1000
+            t %= 1000
+        self._us[stage] = t
+        if us > self._max[stage]:
+            self._max[stage] = us
+        b = 0
+        d = us >> _BUCKET_SHIFT
+        while d and b < BUCKETS - 1:
+            d >>= 1
+            b += 1
+        self._hist[stage * BUCKETS + b] += 1
+
+    def sample_memory(self):
+        """Relève la mémoire libre (minimum, collectes détectées)"""
+        free = gc.mem_free()
+        last = self._mem_last
+        if last is not None and free > last:
+            self.gc_collections += 1
+        self._mem_last = free
+        if self.mem_low is None or free < self.mem_low:
+            self.mem_low = free
+        return free
+
+    def stage(self, stage):
+        """
+        Returns:
+            tuple: (nombre, total_ms, max_us, histogramme) de l'étape
+        """
+        i = stage * BUCKETS
+        return (self._count[stage], self._ms[stage] + self._us[stage] // 1000,
+                self._max[stage], self._hist[i:i + BUCKETS])
+
+    def mean_us(self, stage):
+        n = self._count[stage]
+        if not n:
+            return 0
+        return (self._ms[stage] * 1000 + self._us[stage]) // n
+
+    def reset(self):
+        """Remet tous les compteurs à zéro"""
+        for a in (self._count, self._ms, self._us, self._max, self._hist):
+            for i in range(len(a)):
+                a[i] = 0
+        self.gc_collections = 0
+        self.mem_low = None
+        self._mem_last = None
+
+    def report(self):
+        """Résumé pour la console: moyenne / max par étape (µs), GC, mémoire"""
+        parts = []
+        for s in range(self.stages):
+            if self._count[s]:
+                parts.append(f"{STAGE_NAMES[s]} {self.mean_us(s)}/{self._max[s]}")
+        return (f"[PERF] µs moy/max: {', '.join(parts)}; "
+                f"GC: {self.gc_collections}, mémoire min: {self.mem_low}")
+
+
+def bucket_bounds():
+    """Bornes supérieures des classes (µs), None pour la dernière"""
+    return [64 << k for k in range(BUCKETS - 1)] + [None]
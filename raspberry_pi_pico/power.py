@@ -0,0 +1,191 @@
+"""
+Gestion adaptative de la consommation selon l'activité
+Capteur en veille (accéléromètre seul, mode cycle, réveil sur mouvement)
+quand l'utilisateur est immobile, gyroscope arrêté s'il ne sert pas (sur
+demande), fréquence du capteur relevée en course, BLE ralenti au repos
+"""
+import time
+
+STATE_ACTIVE = 0
+STATE_RUNNING = 1
+STATE_IDLE = 2
+STATE_NAMES = ("actif", "course", "veille")
+
+# Consommation estimée (µA), fiche technique MPU6050 (§6.3):
+# accel + gyro 3,8 mA, accéléromètre seul 500 µA, mode cycle selon la
+# fréquence de réveil (1,25 Hz: 10 µA ... 40 Hz: 140 µA)
+MPU_UA_ACCEL_GYRO = 3800
+MPU_UA_ACCEL = 500
+MPU_UA_CYCLE = ((1.25, 10), (5, 20), (20, 70), (40, 140))
+# Ordre de grandeur pour la carte: RP2040 à 125 MHz sans veille + CYW43
+# (BLE actif), et charge d'un événement d'advertising (µC)
+BOARD_UA = 25000
+ADV_EVENT_UC = 30
+
+
+def _cycle_ua(wake_hz):
+    for hz, ua in MPU_UA_CYCLE:
+        if wake_hz <= hz:
+            return ua
+    return MPU_UA_CYCLE[-1][1]
+
+
+class PowerManager:
+    """
+    Machine à états actif / course / veille, mise à jour par le runtime
+    (tâche manage_power, toutes les poll_ms)
+
+    - veille après idle_ms sans pas: MPU en mode cycle à wake_hz, réveil
+      quand l'accélération varie de plus de wake_mg; acquisition suspendue,
+      files BLE vidées moins souvent, advertising plus lent, fenêtre des
+      derniers pas du détecteur vidée (pause())
+    - course (AdvancedStepDetector.get_activity_type): fréquence du
+      capteur running_odr, sinon active_odr. La cadence des détecteurs
+      (sample_ms) ne change pas: le runtime décime les échantillons du
+      capteur (DATA_RDY, FIFO), les fenêtres des détecteurs sont en
+      nombre d'échantillons.
+    - gyroscope: allumé (la télémétrie transmet ses axes). Avec
+      gyro_standby, arrêté sauf si le détecteur l'utilise (uses_gyro) ou
+      si l'enregistreur brut est actif; gyro=True/False pour l'imposer
+    """
+
+    def __init__(self, mpu, ble=None, idle_ms=30000, wake_hz=5, wake_mg=64,
+                 active_odr=50, running_odr=100, gyro=None, gyro_standby=False, poll_ms=250,
+                 pump_idle_ms=100, adv_active_us=500000, adv_idle_us=2000000):
+        self.mpu = mpu
+        self.ble = ble
+        self.idle_ms = idle_ms
+        self.wake_hz = wake_hz
+        self.wake_mg = wake_mg
+        self.active_odr = active_odr
+        self.running_odr = running_odr
+        self.gyro = gyro
+        self.gyro_standby = gyro_standby
+        self.poll_ms = poll_ms
+        self.pump_idle_ms = pump_idle_ms
+        self.adv_active_us = adv_active_us
+        self.adv_idle_us = adv_idle_us
+
+        self.state = STATE_ACTIVE
+        self._steps = None
+        self._last_step = time.ticks_ms()
+        self._last_update = None
+        self._pump_ms = None
+        self._odr = None
+        self._adv_us = adv_active_us
+
+        # Compteurs
+        self.sleeps = 0
+        self.wakes = 0
+        self.last_wake_ms = None
+        self.state_ms = [0, 0, 0]
+        self._charge = 0.0  # µA·ms (capteur)
+        self._adv_events = 0.0
+
+    # ---------- Estimation ----------
+
+    def sensor_ua(self):
+        """Consommation estimée du MPU dans son mode actuel (µA)"""
+        mpu = self.mpu
+        if mpu.motion_wake_enabled:
+            return _cycle_ua(mpu.wake_hz)
+        return MPU_UA_ACCEL_GYRO if mpu.gyro_enabled else MPU_UA_ACCEL
+
+    def _account(self, now):
+        last = self._last_update
+        self._last_update = now
+        if last is None:
+            return
+        dt = time.ticks_diff(now, last)
+        self.state_ms[self.state] += dt
+        self._charge += self.sensor_ua() * dt
+        if self.ble is not None and not self.ble.is_connected():
+            self._adv_events += dt * 1000 / self._adv_us
+
+    def stats(self):
+        """
+        Returns:
+            dict: temps par état (ms), veilles/réveils et consommations
+            moyennes estimées (µA): capteur, capteur sans gestion, carte
+        """
+        total = sum(self.state_ms)
+        sensor = self._charge / total if total else 0.0
+        adv = self._adv_events * ADV_EVENT_UC * 1000 / total if total else 0.0
+        return {
+            'state': STATE_NAMES[self.state],
+            'active_ms': self.state_ms[STATE_ACTIVE],
+            'running_ms': self.state_ms[STATE_RUNNING],
+            'idle_ms': self.state_ms[STATE_IDLE],
+            'sleeps': self.sleeps, 'wakes': self.wakes,
+            'sensor_ua': sensor, 'sensor_always_on_ua': MPU_UA_ACCEL_GYRO,
+            'board_ua': BOARD_UA + sensor + adv,
+        }
+
+    # ---------- Transitions ----------
+
+    def update(self, rt):
+        """Appelée périodiquement par le runtime"""
+        now = time.ticks_ms()
+        self._account(now)
+        mpu = self.mpu
+        if self.state == STATE_IDLE:
+            if mpu.motion_detected():
+                self._wake(rt, now)
+            return
+
+        gyro = self.gyro
+        if gyro is None:
+            gyro = (not self.gyro_standby or getattr(rt.detector, 'uses_gyro', False)
+                    or rt.recorder is not None)
+        if gyro != mpu.gyro_enabled:
+            mpu.set_gyro_enabled(gyro)
+
+        steps = rt.detector.step_count
+        if steps != self._steps:
+            self._steps = steps
+            self._last_step = now
+        if time.ticks_diff(now, self._last_step) >= self.idle_ms:
+            self._sleep(rt)
+            return
+
+        d = rt.detector
+        running = hasattr(d, 'get_activity_type') and d.get_activity_type() == "Course"
+        state = STATE_RUNNING if running else STATE_ACTIVE
+        odr = self.running_odr if running else self.active_odr
+        if odr != self._odr:
+            mpu.set_sample_rate(odr)
+            self._odr = odr
+        self.state = state
+
+    def _set_advertising(self, interval_us):
+        self._adv_us = interval_us
+        if self.ble is not None:
+            self.ble.set_advertising_interval(interval_us)
+
+    def _sleep(self, rt):
+        hz = self.mpu.enable_motion_wake(self.wake_mg, self.wake_hz)
+        rt.suspended = True
+        # Fin de la marche: vitesse à 0, cadence de reprise jugée à neuf
+        rt.detector.pause()
+        self._pump_ms = rt.pump_ms
+        rt.pump_ms = max(rt.pump_ms, self.pump_idle_ms)
+        self._set_advertising(self.adv_idle_us)
+        self.state = STATE_IDLE
+        self.sleeps += 1
+        print(f"[POWER] Veille: réveil sur mouvement (> {self.wake_mg} mg, {hz} Hz)")
+
+    def _wake(self, rt, now):
+        mpu = self.mpu
+        mpu.disable_motion_wake()
+        mpu.set_sample_rate(self.active_odr)
+        self._odr = self.active_odr
+        rt.suspended = False
+        if self._pump_ms is not None:
+            rt.pump_ms = self._pump_ms
+        self._set_advertising(self.adv_active_us)
+        self.state = STATE_ACTIVE
+        # Laisser idle_ms au détecteur pour trouver un pas
+        self._last_step = now
+        self.wakes += 1
+        self.last_wake_ms = now
+        print("[POWER] Réveil: mouvement détecté")
@@ -0,0 +1,249 @@
+"""
+Enregistreur des échantillons bruts du MPU sur la flash (LittleFS)
+Trames binaires de 16 octets dans des tampons préalloués, écrites par
+blocs de 4096 octets alignés, avec rotation des fichiers et plafond total
+
+Format d'un fichier (tout en big-endian, comme les registres du MPU):
+- en-tête 32 octets: '>4sBBHHHIIII4x' = magic b'PRAW', version, taille de
+  trame, LSB/g accel, LSB/(°/s) gyro ×10, période nominale (ms), numéro de
+  fichier, numéro de démarrage, heure (s depuis 1970, 0 si l'horloge n'est
+  pas réglée) et ticks_ms au même instant
+- trames 16 octets: '>I6h' = ticks_ms, ax, ay, az, gx, gy, gz (int16 bruts)
+L'en-tête occupe le début du premier bloc: toutes les écritures restent
+alignées sur 4096 octets. Lecture côté PC: tools/rawlog.py
+
+Le numéro de démarrage (fichier <préfixe>_boot, incrémenté à chaque
+création de l'enregistreur) distingue les ticks_ms de deux démarrages,
+qui repartent de 0; l'heure situe l'enregistrement quand l'horloge a été
+réglée (NTP, téléphone).
+"""
+import binascii
+import os
+import struct
+import time
+
+MAGIC = b'PRAW'
+VERSION = 2
+HEADER_FMT = '>4sBBHHHIIII4x'
+HEADER_SIZE = 32
+# En deçà (1er janvier 2024), l'horloge n'a pas été réglée: le RP2040
+# démarre au 1er janvier 2021
+MIN_EPOCH = 1704067200
+FRAME_FMT = '>I6h'
+FRAME_SIZE = 16
+BLOCK_SIZE = 4096
+
+
+class RawRecorder:
+    """
+    Journal circulaire des échantillons bruts
+
+    append() ne fait que copier la trame dans le bloc courant (sans
+    allocation); les blocs pleins sont écrits par flush(), appelé hors du
+    chemin d'acquisition (tâche record du runtime). Deux blocs: l'un se
+    remplit pendant que l'autre attend l'écriture.
+    """
+
+    def __init__(self, directory='logs', file_bytes=256 * 1024, max_bytes=1024 * 1024,
+                 min_free=64 * 1024, sample_ms=50, prefix=None):
+        """
+        Args:
+            file_bytes: taille d'un fichier avant rotation (multiple de 4096)
+            max_bytes: plafond de l'ensemble des fichiers (les plus anciens sont supprimés)
+            min_free: espace libre minimal à laisser sur la flash
+            prefix: préfixe des fichiers (par défaut l'identifiant unique du Pico)
+        """
+        self.directory = directory
+        self.blocks_per_file = max(1, file_bytes // BLOCK_SIZE)
+        self.max_bytes = max_bytes
+        self.min_free = min_free
+        self.sample_ms = sample_ms
+        if prefix is None:
+            import machine
+            prefix = binascii.hexlify(machine.unique_id()).decode()
+        self.prefix = prefix
+
+        self._blocks = [bytearray(BLOCK_SIZE), bytearray(BLOCK_SIZE)]
+        self._fill = 0           # bloc en cours de remplissage
+        self._pos = 0            # octets utilisés dans ce bloc
+        self._full = [False, False]
+        self._block_seq = [0, 0] # numéro de fichier de chaque bloc
+        self._block_new = [False, False]  # premier bloc d'un fichier
+        self._file = None
+        self._file_seq = -1      # fichier ouvert
+        self._next_seq = self._scan_next_seq()
+        self._blocks_in_file = self.blocks_per_file  # force un nouveau fichier
+        self.enabled = True
+        self.boot = self._next_boot()
+
+        # Compteurs
+        self.frames = 0
+        self.dropped = 0
+        self.bytes_written = 0
+        self.files = 0
+        self.write_ms_max = 0
+
+        self._start_block()
+
+    # ---------- Fichiers ----------
+
+    def _path(self, seq):
+        return "%s/%s_%06d.bin" % (self.directory, self.prefix, seq)
+
+    def _list(self):
+        """Fichiers du journal (numéro, nom), du plus ancien au plus récent"""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            os.mkdir(self.directory)
+            return []
+        files = []
+        start = self.prefix + '_'
+        for name in names:
+            if name.startswith(start) and name.endswith('.bin'):
+                try:
+                    files.append((int(name[len(start):-4]), name))
+                except ValueError:
+                    pass
+        files.sort()
+        return files
+
+    def _scan_next_seq(self):
+        files = self._list()
+        return files[-1][0] + 1 if files else 0
+
+    def _next_boot(self):
+        """Incrémente le compteur de démarrages conservé sur la flash"""
+        path = "%s/%s_boot" % (self.directory, self.prefix)
+        try:
+            with open(path) as f:
+                boot = int(f.read()) + 1
+        except (OSError, ValueError):
+            boot = 0
+        try:
+            with open(path, 'w') as f:
+                f.write(str(boot))
+        except OSError:
+            pass
+        return boot
+
+    def _free_bytes(self):
+        try:
+            st = os.statvfs(self.directory)
+            return st[0] * st[4]  # f_bsize × f_bavail
+        except (OSError, AttributeError):
+            return self.min_free + BLOCK_SIZE
+
+    def _make_room(self):
+        """Supprime les plus anciens fichiers pour respecter le plafond"""
+        budget = self.max_bytes - self.blocks_per_file * BLOCK_SIZE
+        files = self._list()
+        sizes = []
+        total = 0
+        for seq, name in files:
+            size = os.stat(self.directory + '/' + name)[6]
+            sizes.append(size)
+            total += size
+        i = 0
+        while i < len(files) and (total > budget or self._free_bytes() < self.min_free + BLOCK_SIZE):
+            if files[i][0] == self._file_seq:
+                break
+            os.remove(self.directory + '/' + files[i][1])
+            total -= sizes[i]
+            i += 1
+        return self._free_bytes() >= BLOCK_SIZE
+
+    def _open(self, seq):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if not self._make_room():
+            # Flash pleine malgré la rotation: arrêter l'enregistrement
+            self.enabled = False
+            return False
+        self._file = open(self._path(seq), 'wb')
+        self._file_seq = seq
+        self.files += 1
+        return True
+
+    # ---------- Blocs ----------
+
+    def _start_block(self):
+        i = self._fill
+        self._pos = 0
+        if self._blocks_in_file >= self.blocks_per_file:
+            # Premier bloc d'un nouveau fichier: l'en-tête en tête de bloc
+            seq = self._next_seq
+            self._next_seq += 1
+            self._blocks_in_file = 0
+            epoch = int(time.time())
+            ticks = time.ticks_ms()
+            struct.pack_into(HEADER_FMT, self._blocks[i], 0, MAGIC, VERSION, FRAME_SIZE,
+                             16384, 1310, self.sample_ms, seq, self.boot,
+                             epoch if epoch >= MIN_EPOCH else 0, ticks)
+            self._pos = HEADER_SIZE
+            self._block_new[i] = True
+        else:
+            self._block_new[i] = False
+        self._block_seq[i] = self._next_seq - 1
+        self._blocks_in_file += 1
+
+    def append(self, t, ax, ay, az, gx, gy, gz):
+        """Ajoute une trame (valeurs int16 brutes, horodatage ticks_ms)"""
+        if not self.enabled:
+            return
+        i = self._fill
+        if self._full[i]:
+            self.dropped += 1  # les deux blocs attendent l'écriture
+            return
+        struct.pack_into(FRAME_FMT, self._blocks[i], self._pos,
+                         t & 0xFFFFFFFF, ax, ay, az, gx, gy, gz)
+        self._pos += FRAME_SIZE
+        self.frames += 1
+        if self._pos >= BLOCK_SIZE:
+            self._full[i] = True
+            nxt = 1 - i
+            if not self._full[nxt]:
+                self._fill = nxt
+                self._start_block()
+
+    def pending(self):
+        """True si un bloc plein attend l'écriture"""
+        return self._full[0] or self._full[1]
+
+    def _write(self, i, n):
+        if self._block_new[i] or self._file is None:
+            if not self._open(self._block_seq[i]):
+                return
+        t0 = time.ticks_ms()
+        self._file.write(memoryview(self._blocks[i])[:n])
+        self._file.flush()
+        dt = time.ticks_diff(time.ticks_ms(), t0)
+        if dt > self.write_ms_max:
+            self.write_ms_max = dt
+        self.bytes_written += n
+
+    def flush(self):
+        """Écrit les blocs pleins (le plus ancien d'abord)"""
+        for i in (1 - self._fill, self._fill):
+            if self._full[i]:
+                self._write(i, BLOCK_SIZE)
+                self._full[i] = False
+                if i == self._fill:
+                    # Le bloc courant était plein aussi: reprendre le remplissage
+                    self._start_block()
+
+    def close(self):
+        """Écrit tout, y compris le bloc partiel, et ferme le fichier"""
+        self.flush()
+        if self._pos > (HEADER_SIZE if self._block_new[self._fill] else 0):
+            self._write(self._fill, self._pos)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.enabled = False
+
+    def stats(self):
+        return {'frames': self.frames, 'dropped': self.dropped,
+                'bytes': self.bytes_written, 'files': self.files,
+                'write_ms_max': self.write_ms_max}
@@ -0,0 +1,160 @@
+"""
+Tampons circulaires de taille fixe sans allocation
+RingBuffer: array('f') avec somme et somme des carrés glissantes (O(1) par ajout)
+TickWindow: derniers horodatages ticks_ms dans un array('l')
+"""
+from array import array
+import math
+import time
+
+
+class RingBuffer:
+    """Fenêtre glissante de flottants: push, moyenne et écart-type en O(1)"""
+    
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = array('f', [0.0] * capacity)
+        self._head = 0
+        self._count = 0
+        self._sum = 0.0
+        self._sumsq = 0.0
+    
+    def push(self, value):
+        """Ajoute une valeur, écrase la plus ancienne si le tampon est plein"""
+        i = self._head
+        data = self._data
+        old = data[i] if self._count == self.capacity else 0.0
+        data[i] = value
+        # Relire la valeur stockée (arrondie en float32) pour que les
+        # sommes restent cohérentes avec le contenu du tampon
+        v = data[i]
+        self._sum += v - old
+        self._sumsq += v * v - old * old
+        
+        i += 1
+        if i == self.capacity:
+            i = 0
+        self._head = i
+        if self._count < self.capacity:
+            self._count += 1
+        elif i == 0:
+            # Un tour complet: recalcul exact pour éliminer la dérive
+            # d'arrondi des sommes glissantes (coût amorti O(1))
+            self._resync()
+    
+    def _resync(self):
+        s = 0.0
+        sq = 0.0
+        for v in self._data:
+            s += v
+            sq += v * v
+        self._sum = s
+        self._sumsq = sq
+    
+    def __len__(self):
+        return self._count
+    
+    def clear(self):
+        self._head = 0
+        self._count = 0
+        self._sum = 0.0
+        self._sumsq = 0.0
+    
+    def sum(self):
+        return self._sum
+    
+    def mean(self):
+        if self._count == 0:
+            return 0.0
+        return self._sum / self._count
+    
+    def variance(self):
+        """Variance de population (comme sum((x - avg)²) / n)"""
+        n = self._count
+        if n == 0:
+            return 0.0
+        avg = self._sum / n
+        var = self._sumsq / n - avg * avg
+        return var if var > 0.0 else 0.0
+    
+    def std(self):
+        return math.sqrt(self.variance())
+    
+    def max(self):
+        """Maximum de la fenêtre (parcours de capacity éléments, sans allocation)"""
+        data = self._data
+        n = self._count
+        if n == 0:
+            return 0.0
+        m = data[0]
+        for i in range(1, n):
+            if data[i] > m:
+                m = data[i]
+        return m
+    
+    def last(self):
+        if self._count == 0:
+            return 0.0
+        return self._data[self._head - 1]
+
+
+class TickWindow:
+    """
+    Derniers horodatages ticks_ms dans un anneau array('l') de taille fixe
+    
+    Seuls les estimateurs (vitesse, cadence, fréquence) lisent les
+    horodatages, et uniquement les plus récents: la mémoire reste
+    constante quel que soit le nombre de pas. Le total, le premier et le
+    dernier horodatage sont conservés à part (agrégats O(1) de la cadence
+    moyenne): clear() ne vide que la fenêtre, reset() oublie aussi les
+    agrégats.
+    """
+    
+    def __init__(self, capacity=5):
+        self.capacity = capacity
+        self._data = array('l', [0] * capacity)
+        self._head = 0
+        self._count = 0
+        self.total = 0
+        self.first = 0
+        self.latest = 0
+    
+    def push(self, t):
+        if self.total == 0:
+            self.first = t
+        self.latest = t
+        self._data[self._head] = t
+        self._head = (self._head + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+        self.total += 1
+    
+    def __len__(self):
+        return self._count
+    
+    def clear(self):
+        """Vide la fenêtre (pause d'activité), total et premier conservés"""
+        self._head = 0
+        self._count = 0
+    
+    def reset(self):
+        """Vide la fenêtre et les agrégats"""
+        self.clear()
+        self.total = 0
+        self.first = 0
+        self.latest = 0
+    
+    def elapsed(self):
+        """Durée en ms du premier horodatage au dernier, pauses comprises"""
+        return time.ticks_diff(self.latest, self.first)
+    
+    def last(self, k=0):
+        """k-ième horodatage en partant du plus récent (0 = dernier)"""
+        return self._data[(self._head - 1 - k) % self.capacity]
+    
+    def span(self, k=None):
+        """Durée en ms entre le dernier horodatage et le k-ième précédent
+        (par défaut le plus ancien de la fenêtre)"""
+        if k is None:
+            k = self._count - 1
+        return time.ticks_diff(self.last(0), self.last(k))
@@ -0,0 +1,352 @@
+"""
+Runtime asyncio du podomètre
+Tâches séparées, chacune à son rythme: acquisition, détection de pas,
+publication de la télémétrie, température et connexions
+Fonctionne avec asyncio de MicroPython et de CPython (simulation)
+"""
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+from array import array
+import math
+import time
+
+import telemetry
+from perf import STAGE_READ, STAGE_DETECT, STAGE_PUMP, STAGE_SLACK
+
+
+class PedometerRuntime:
+    """
+    Orchestration des tâches du firmware
+
+    L'acquisition dépend du mode du pilote MPU:
+    - interruption DATA_RDY (start_data_ready): échantillons horodatés dans l'IRQ
+    - FIFO (enable_fifo): lecture groupée toutes les fifo_ms
+    - sinon lecture en rafale périodique toutes les sample_ms, sur échéances
+      fixes (pas de dérive liée au temps de traitement)
+
+    Les détecteurs sont réglés pour un échantillon toutes les sample_ms
+    (20 Hz): en modes DATA_RDY et FIFO, les échantillons du capteur (à sa
+    fréquence, voir SET_SENSOR et power.py) sont décimés à cette cadence.
+
+    Les échantillons passent par un anneau préalloué vers la tâche de
+    détection, qui peut prendre du retard sans perdre de données.
+    Quand le capteur est en veille (suspended, voir power.py),
+    l'acquisition s'arrête jusqu'au réveil sur mouvement.
+    Avec un Profiler (perf.py), chaque étape est chronométrée (ticks_us).
+    """
+
+    def __init__(self, mpu, detector, publish=None, ble=None, on_step=None,
+                 recorder=None, history=None, power=None, perf=None, sample_ms=50, fifo_ms=100,
+                 publish_ms=500, temp_ms=5000, pump_ms=20, record_ms=500,
+                 history_ms=60000, capacity=64):
+        """
+        Args:
+            mpu: pilote MPU (mpu_universal.MPU)
+            detector: StepDetector, AdvancedStepDetector, FusedStepDetector
+                (uses_gyro: reçoit les 6 axes par update_imu) ou
+                FixedStepDetector (reçoit les comptes bruts par update_raw)
+            publish: publish(runtime) appelée toutes les publish_ms
+            ble: BLEPedometer dont la file d'envoi est vidée toutes les pump_ms
+            on_step: on_step(runtime) appelée à chaque pas détecté
+            recorder: RawRecorder qui reçoit chaque échantillon brut; ses
+                blocs pleins sont écrits sur la flash toutes les record_ms
+            history: HistoryStore qui reçoit les métriques toutes les history_ms
+            power: PowerManager dont update(runtime) est appelée toutes les power.poll_ms
+            perf: Profiler qui reçoit les durées de lecture, détection,
+                envoi radio et la marge d'acquisition; mémoire relevée
+                toutes les publish_ms
+        """
+        self.mpu = mpu
+        self.detector = detector
+        self.publish = publish
+        self.ble = ble
+        self.on_step = on_step
+        self.recorder = recorder
+        self.history = history
+        self.power = power
+        self.perf = perf
+        self.sample_ms = sample_ms
+        self.fifo_ms = fifo_ms
+        self.publish_ms = publish_ms
+        self.temp_ms = temp_ms
+        self.pump_ms = pump_ms
+        self.record_ms = record_ms
+        self.history_ms = history_ms
+
+        # Anneau acquisition -> détection: horodatage + accel/gyro bruts
+        self._times = array('l', [0] * capacity)
+        self._raw = array('h', [0] * (capacity * 6))
+        self._head = 0
+        self._tail = 0
+        self._capacity = capacity
+        # Prochain horodatage gardé par la décimation (None: le prochain)
+        self._keep_t = None
+        self._ready = asyncio.Event()
+
+        # Capteur en veille: pas d'acquisition (gestionnaire d'énergie)
+        self.suspended = False
+
+        # Dernier échantillon traité et température
+        self.last_raw = (0, 0, 0, 0, 0, 0)
+        self.temp = 0.0
+
+        # Compteurs
+        self.samples = 0
+        self.overruns = 0      # échéances d'acquisition manquées
+        self.dropped = 0       # échantillons perdus (anneau plein)
+        self.errors = 0
+
+    # ---------- Anneau d'échantillons ----------
+
+    def _push(self, t, ax, ay, az, gx, gy, gz):
+        i = self._head
+        nxt = (i + 1) % self._capacity
+        if nxt == self._tail:
+            self.dropped += 1
+            return
+        self._times[i] = t
+        raw = self._raw
+        j = i * 6
+        raw[j] = ax
+        raw[j + 1] = ay
+        raw[j + 2] = az
+        raw[j + 3] = gx
+        raw[j + 4] = gy
+        raw[j + 5] = gz
+        self._head = nxt
+
+    def _decimate(self, t):
+        """Vrai pour un échantillon par sample_ms, sur une grille sans dérive"""
+        keep = self._keep_t
+        if keep is not None:
+            late = time.ticks_diff(t, keep)
+            if late < 0:
+                return False
+            if late < self.sample_ms:
+                t = keep
+        # Premier échantillon ou reprise après un trou: nouvelle grille
+        self._keep_t = time.ticks_add(t, self.sample_ms)
+        return True
+
+    def pending(self):
+        """Échantillons acquis pas encore traités par la détection"""
+        return (self._head - self._tail) % self._capacity
+
+    # ---------- Métriques ----------
+
+    def metrics(self):
+        """
+        Returns:
+            tuple: (steps, speed, distance, calories, cadence, activity_code)
+        """
+        d = self.detector
+        steps = d.step_count
+        speed = d.get_speed()
+        if hasattr(d, 'get_calories'):
+            # AdvancedStepDetector
+            return (steps, speed, d.get_distance(), d.get_calories(),
+                    d.get_cadence(), telemetry.activity_code(d.get_activity_type()))
+        return (steps, speed, steps * d.step_length, steps * 0.04,
+                0.0, telemetry.activity_code("Marche"))
+
+    # ---------- Tâches ----------
+
+    async def acquire(self):
+        """Acquisition des échantillons selon le mode du pilote"""
+        mpu = self.mpu
+        perf = self.perf
+        next_t = time.ticks_ms()
+        while True:
+            if self.suspended:
+                # Capteur en veille (réveil sur mouvement): rien à lire
+                await asyncio.sleep(self.sample_ms / 1000)
+                next_t = time.ticks_ms()
+                continue
+            try:
+                t0 = time.ticks_us()
+                if mpu.data_ready_enabled:
+                    sample = mpu.pop_sample()
+                    while sample is not None:
+                        t, ax, ay, az, _, gx, gy, gz = sample
+                        if self._decimate(t):
+                            self._push(t, ax, ay, az, gx, gy, gz)
+                        sample = mpu.pop_sample()
+                    period = self.sample_ms
+                elif mpu.fifo_enabled:
+                    n = mpu.read_fifo()
+                    for t, ax, ay, az, gx, gy, gz in mpu.fifo_frames(n):
+                        if self._decimate(t):
+                            self._push(t, ax, ay, az, gx, gy, gz)
+                    period = self.fifo_ms
+                else:
+                    ax, ay, az, _, gx, gy, gz = mpu.read_all_raw()
+                    self._push(next_t, ax, ay, az, gx, gy, gz)
+                    period = self.sample_ms
+                if perf is not None:
+                    perf.record(STAGE_READ, time.ticks_diff(time.ticks_us(), t0))
+                if self._head != self._tail:
+                    self._ready.set()
+            except Exception as e:
+                self.errors += 1
+                print(f"[ERROR] Acquisition: {e}")
+                await asyncio.sleep(1)
+                next_t = time.ticks_ms()
+                continue
+
+            # Échéances fixes: le temps de traitement ne décale pas la cadence
+            next_t = time.ticks_add(next_t, period)
+            delay = time.ticks_diff(next_t, time.ticks_ms())
+            if delay < 0:
+                self.overruns += 1
+                next_t = time.ticks_ms()
+                delay = 0
+            if perf is not None:
+                perf.record(STAGE_SLACK, delay * 1000)
+            await asyncio.sleep(delay / 1000)
+
+    async def detect(self):
+        """Détection de pas sur les échantillons acquis"""
+        scale = self.mpu.ACCEL_SCALE
+        gscale = self.mpu.GYRO_SCALE
+        recorder = self.recorder
+        perf = self.perf
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            try:
+                raw = self._raw
+                # Détecteur lu une fois par lot (SET_DETECTOR peut le changer)
+                detector = self.detector
+                fused = getattr(detector, 'uses_gyro', False)
+                counts = hasattr(detector, 'update_raw')
+                while self._tail != self._head:
+                    i = self._tail
+                    # Avancé avant le traitement: un échantillon qui lève
+                    # une exception est abandonné, pas rejoué indéfiniment
+                    self._tail = (i + 1) % self._capacity
+                    j = i * 6
+                    t0 = time.ticks_us()
+                    if counts:
+                        # Virgule fixe: comptes int16 lus dans l'anneau
+                        # (step_detector_fixed), sans flottant
+                        step = detector.update_raw(raw, j, self._times[i])
+                    else:
+                        x = raw[j] / scale
+                        y = raw[j + 1] / scale
+                        z = raw[j + 2] / scale
+                        if fused:
+                            # Détecteur 6 axes (step_detector_fused)
+                            step = detector.update_imu(x, y, z, raw[j + 3] / gscale,
+                                                       raw[j + 4] / gscale, raw[j + 5] / gscale,
+                                                       self._times[i])
+                        else:
+                            magnitude = math.sqrt(x * x + y * y + z * z)
+                            step = detector.update(magnitude, self._times[i])
+                    if perf is not None:
+                        perf.record(STAGE_DETECT, time.ticks_diff(time.ticks_us(), t0))
+                    self.last_raw = (raw[j], raw[j + 1], raw[j + 2],
+                                     raw[j + 3], raw[j + 4], raw[j + 5])
+                    if recorder is not None:
+                        recorder.append(self._times[i], raw[j], raw[j + 1], raw[j + 2],
+                                        raw[j + 3], raw[j + 4], raw[j + 5])
+                    self.samples += 1
+                    if step and self.on_step is not None:
+                        self.on_step(self)
+            except Exception as e:
+                self.errors += 1
+                print(f"[ERROR] Détection: {e}")
+                await asyncio.sleep(1)
+                if self._tail != self._head:
+                    # Reprise sur les échantillons suivants
+                    self._ready.set()
+
+    async def publish_telemetry(self):
+        """Publication périodique de la télémétrie"""
+        while True:
+            await asyncio.sleep(self.publish_ms / 1000)
+            if self.perf is not None:
+                self.perf.sample_memory()
+            if self.publish is None:
+                continue
+            try:
+                self.publish(self)
+            except Exception as e:
+                self.errors += 1
+                print(f"[ERROR] Publication: {e}")
+
+    async def sample_temperature(self):
+        """Lecture de la température (lente, hors chemin critique)"""
+        while True:
+            try:
+                self.temp = self.mpu.get_temp()
+            except Exception as e:
+                self.errors += 1
+                print(f"[ERROR] Température: {e}")
+            await asyncio.sleep(self.temp_ms / 1000)
+
+    async def manage_connections(self):
+        """Vidage des files d'envoi BLE, indépendant de l'échantillonnage"""
+        perf = self.perf
+        while True:
+            try:
+                t0 = time.ticks_us()
+                self.ble.pump()
+                if perf is not None:
+                    perf.record(STAGE_PUMP, time.ticks_diff(time.ticks_us(), t0))
+            except Exception as e:
+                self.errors += 1
+                print(f"[ERROR] BLE: {e}")
+            await asyncio.sleep(self.pump_ms / 1000)
+
+    async def record(self):
+        """Écriture sur la flash des blocs pleins de l'enregistreur brut"""
+        while True:
+            try:
+                if self.recorder.pending():
+                    self.recorder.flush()
+            except Exception as e:
+                self.errors += 1
+                print(f"[ERROR] Enregistrement: {e}")
+            await asyncio.sleep(self.record_ms / 1000)
+
+    async def record_history(self):
+        """Historique minute par minute, connecté ou non"""
+        next_t = time.ticks_ms()
+        while True:
+            next_t = time.ticks_add(next_t, self.history_ms)
+            await asyncio.sleep(max(0, time.ticks_diff(next_t, time.ticks_ms())) / 1000)
+            try:
+                self.history.add_minute(*self.metrics())
+            except Exception as e:
+                self.errors += 1
+                print(f"[ERROR] Historique: {e}")
+
+    async def manage_power(self):
+        """Veille et réveil du capteur, fréquences selon l'activité"""
+        while True:
+            try:
+                self.power.update(self)
+            except Exception as e:
+                self.errors += 1
+                print(f"[ERROR] Énergie: {e}")
+            await asyncio.sleep(self.power.poll_ms / 1000)
+
+    def tasks(self):
+        """Coroutines à lancer (BLE, enregistrement, historique et énergie seulement s'ils sont fournis)"""
+        coros = [self.acquire(), self.detect(), self.publish_telemetry(),
+                 self.sample_temperature()]
+        if self.ble is not None:
+            coros.append(self.manage_connections())
+        if self.recorder is not None:
+            coros.append(self.record())
+        if self.history is not None:
+            coros.append(self.record_history())
+        if self.power is not None:
+            coros.append(self.manage_power())
+        return coros
+
+    async def run(self):
+        """Lance toutes les tâches (ne retourne pas)"""
+        await asyncio.gather(*[asyncio.create_task(c) for c in self.tasks()])
@@ -0,0 +1,119 @@
+"""
+File d'envoi bornée pour les notifications BLE
+Emplacements préalloués, politique de rejet configurable et compteurs
+"""
+from array import array
+
+# Politiques quand la file est pleine
+DROP_OLDEST = 0       # jeter le plus ancien message pas encore commencé
+COALESCE_LATEST = 1   # ne garder que le dernier message en attente
+
+
+class SendQueue:
+    """
+    File de messages pour une connexion
+    
+    Les messages sont copiés dans des tampons préalloués (pas d'allocation
+    par envoi). Le message de tête peut être partiellement envoyé: il
+    n'est jamais rejeté pour ne pas couper une trame côté récepteur.
+    """
+    
+    def __init__(self, depth=4, max_size=256, policy=DROP_OLDEST):
+        if depth < 2:
+            raise ValueError("depth >= 2")
+        self.depth = depth
+        self.max_size = max_size
+        self.policy = policy
+        self._slots = [bytearray(max_size) for _ in range(depth)]
+        self._lens = array('H', [0] * depth)
+        self._head = 0
+        self._count = 0
+        self._offset = 0  # octets déjà envoyés du message de tête
+        self.sent = 0
+        self.dropped = 0
+    
+    def __len__(self):
+        return self._count
+    
+    def in_flight(self):
+        """True si le message de tête est partiellement envoyé"""
+        return self._offset > 0
+    
+    def clear(self):
+        self._head = 0
+        self._count = 0
+        self._offset = 0
+    
+    def put(self, data):
+        """
+        Ajoute un message (copié)
+        
+        Returns:
+            bool: False si le message a été rejeté (trop grand)
+        """
+        n = len(data)
+        if n > self.max_size:
+            self.dropped += 1
+            return False
+        
+        # Messages pas encore commencés (la tête peut être en cours d'envoi)
+        waiting = self._count - (1 if self._offset else 0)
+        if self.policy == COALESCE_LATEST and waiting > 0:
+            # Remplacer le dernier message en attente par le plus récent
+            self.dropped += 1
+            self._write((self._head + self._count - 1) % self.depth, data, n)
+            return True
+        
+        if self._count == self.depth:
+            # Pleine: rejeter le plus ancien message non commencé
+            self.dropped += 1
+            self._remove(1 if self._offset else 0)
+        self._write((self._head + self._count) % self.depth, data, n)
+        self._count += 1
+        return True
+    
+    def _write(self, i, data, n):
+        self._slots[i][0:n] = data
+        self._lens[i] = n
+    
+    def _remove(self, k):
+        """Retire le k-ième message (décalage des références, sans copie)"""
+        if k == 0:
+            self._head = (self._head + 1) % self.depth
+            self._count -= 1
+            return
+        slots = self._slots
+        lens = self._lens
+        i = (self._head + k) % self.depth
+        removed = slots[i]
+        for _ in range(k, self._count - 1):
+            j = (i + 1) % self.depth
+            slots[i] = slots[j]
+            lens[i] = lens[j]
+            i = j
+        slots[i] = removed
+        self._count -= 1
+    
+    def peek(self, size):
+        """
+        Prochain fragment à envoyer (au plus size octets)
+        
+        Returns:
+            memoryview ou None si la file est vide
+        """
+        if self._count == 0:
+            return None
+        i = self._head
+        end = self._offset + size
+        if end > self._lens[i]:
+            end = self._lens[i]
+        return memoryview(self._slots[i])[self._offset:end]
+    
+    def advance(self, n):
+        """Marque n octets du message de tête comme envoyés"""
+        self._offset += n
+        if self._offset >= self._lens[self._head]:
+            self._offset = 0
+            self._head = (self._head + 1) % self.depth
+            self._count -= 1
+            self.sent += 1
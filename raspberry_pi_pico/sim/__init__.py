@@ -0,0 +1,96 @@
+"""
+Outils de simulation côté hôte (CPython)
+Permettent d'exécuter le firmware du Pico sans le matériel
+Ne pas copier ce dossier sur le Pico
+
+Utilisation:
+    import sim
+    clock = sim.install()
+    import mpu_universal  # importe les modules machine/micropython simulés
+
+    # Firmware asyncio en temps virtuel
+    from sim.aio import run_for
+    run_for(runtime.run(), clock, 60)
+
+    # Script du firmware non modifié, avec un téléphone simulé
+    from sim import traces
+    from sim.runner import Simulation
+    with Simulation(trace=traces.walking(30)) as s:
+        phone = s.central()
+        s.at(1000, phone.connect)
+        s.run_script("main_bluetooth.py", seconds=30)
+        print(phone.lines()[-1])
+"""
+
+import gc
+import sys
+import traceback
+import tracemalloc
+
+from sim import clock as _clock_mod
+from sim import bluetooth, machine, micropython, network
+from sim.clock import SimulationEnd, VirtualClock
+
+_restore_time = None
+
+
+def install(clock=None):
+    """
+    Installe les modules simulés et l'horloge virtuelle
+
+    Returns:
+        VirtualClock: l'horloge qui pilote time.ticks_ms()/sleep_ms()
+    """
+    global _restore_time
+    uninstall()
+    clock = clock or VirtualClock()
+    clock.after_event = micropython.run_scheduled
+    sys.modules['machine'] = machine
+    sys.modules['micropython'] = micropython
+    sys.modules['bluetooth'] = bluetooth
+    sys.modules['network'] = network
+    # Extension MicroPython utilisée par le firmware
+    sys.print_exception = _print_exception
+    gc.mem_free = _mem_free
+    gc.mem_alloc = _mem_alloc
+    _restore_time = _clock_mod.install(clock)
+    return clock
+
+
+def uninstall():
+    """Restaure le module time et retire les modules simulés"""
+    global _restore_time
+    if _restore_time is not None:
+        _restore_time()
+        _restore_time = None
+    for name, module in (('machine', machine), ('micropython', micropython),
+                         ('bluetooth', bluetooth), ('network', network)):
+        if sys.modules.get(name) is module:
+            del sys.modules[name]
+    if getattr(sys, 'print_exception', None) is _print_exception:
+        del sys.print_exception
+    if getattr(gc, 'mem_free', None) is _mem_free:
+        del gc.mem_free
+        del gc.mem_alloc
+    machine.Pin.reset_all()
+    machine.I2C.reset_all()
+    network.WLAN.reset_all()
+    bluetooth.BLE.reset()
+    del micropython._pending[:]
+
+
+# Tas MicroPython d'un Pico W avec BLE actif (ordre de grandeur)
+HEAP_SIZE = 160 * 1024
+
+
+def _mem_alloc():
+    # Mémoire Python allouée, si tracemalloc est actif
+    return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+
+
+def _mem_free():
+    return max(0, HEAP_SIZE - _mem_alloc())
+
+
+def _print_exception(exc, file=None):
+    traceback.print_exception(type(exc), exc, exc.__traceback__, file=file)
@@ -0,0 +1,55 @@
+"""
+Boucle asyncio en temps virtuel
+Les attentes (asyncio.sleep) avancent l'horloge virtuelle au lieu d'attendre:
+le firmware asyncio tourne plus vite que le temps réel et de façon
+déterministe. Les événements simulés (échantillons MPU, IRQ) sont déclenchés
+pendant l'avance de l'horloge.
+"""
+
+import asyncio
+import math
+import selectors
+
+
+class SimulationStalled(RuntimeError):
+    """Aucune tâche ne peut progresser (attente infinie sans événement)"""
+
+
+class _VirtualSelector(selectors.SelectSelector):
+    def __init__(self, clock):
+        super().__init__()
+        self._clock = clock
+
+    def select(self, timeout=None):
+        if timeout is None:
+            raise SimulationStalled("aucune échéance en attente")
+        if timeout > 0:
+            self._clock.advance_us(math.ceil(timeout * 1000000))
+        return []
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """Boucle d'événements dont loop.time() suit l'horloge virtuelle"""
+
+    def __init__(self, clock):
+        super().__init__(_VirtualSelector(clock))
+        self._virtual_clock = clock
+
+    def time(self):
+        return self._virtual_clock.now_us / 1000000
+
+
+def run_for(coro, clock, seconds):
+    """
+    Exécute coro pendant seconds de temps virtuel puis l'annule
+
+    Returns:
+        le résultat de coro si elle se termine avant la fin
+    """
+    loop = VirtualTimeLoop(clock)
+    try:
+        return loop.run_until_complete(asyncio.wait_for(coro, seconds))
+    except asyncio.TimeoutError:
+        return None
+    finally:
+        loop.close()
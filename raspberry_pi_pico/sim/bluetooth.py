@@ -0,0 +1,185 @@
+"""
+Module bluetooth simulé (serveur GATT côté périphérique)
+Même API que bluetooth.BLE de MicroPython pour ce qu'utilise le firmware
+"""
+
+FLAG_BROADCAST = 0x0001
+FLAG_READ = 0x0002
+FLAG_WRITE_NO_RESPONSE = 0x0004
+FLAG_WRITE = 0x0008
+FLAG_NOTIFY = 0x0010
+FLAG_INDICATE = 0x0020
+
+
+class UUID:
+    """UUID 16 bits (int) ou 128 bits (chaîne)"""
+
+    def __init__(self, value):
+        if isinstance(value, UUID):
+            value = value._value
+        if isinstance(value, int):
+            self._bytes = value.to_bytes(2, 'little')
+        else:
+            hexstr = value.replace('-', '')
+            self._bytes = bytes.fromhex(hexstr)[::-1]
+        self._value = value
+
+    def __bytes__(self):
+        return self._bytes
+
+    def __eq__(self, other):
+        return isinstance(other, UUID) and self._bytes == other._bytes
+
+    def __hash__(self):
+        return hash(self._bytes)
+
+    def __repr__(self):
+        if len(self._bytes) == 2:
+            return "UUID(0x%04x)" % int.from_bytes(self._bytes, 'little')
+        return "UUID('%s')" % self._value
+
+
+class BLE:
+    """
+    Pile BLE simulée (une seule instance, comme sur le Pico)
+
+    Les notifications envoyées sont transmises aux centraux simulés
+    connectés (voir sim.central), sinon conservées dans notifications.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            inst = super().__new__(cls)
+            inst._reset()
+            cls._instance = inst
+        return cls._instance
+
+    def _reset(self):
+        self._active = False
+        self._handler = None
+        self._config = {'mtu': 23, 'gap_name': b'MPY BTSTACK', 'mac': (0, b'\x28\xcd\xc1\x00\x00\x01')}
+        self._next_handle = 1
+        self.values = {}          # handle -> bytearray
+        self.characteristics = {} # handle -> (uuid, flags)
+        self.services = []        # [(uuid, [handles])]
+        self.advertising = None   # (interval_us, adv_data, resp_data, connectable)
+        self.notifications = []   # (conn_handle, value_handle, bytes)
+        self.centrals = {}        # conn_handle -> central simulé
+        self.subscriptions = {}   # conn_handle -> handles notifiés (CCCD)
+        # Nombre de notifications acceptées avant OSError (None = illimité)
+        self.tx_credits = None
+
+    @classmethod
+    def reset(cls):
+        cls._instance = None
+
+    def active(self, state=None):
+        if state is not None:
+            self._active = bool(state)
+        return self._active
+
+    def irq(self, handler):
+        self._handler = handler
+
+    def _irq(self, event, data):
+        if self._handler is not None:
+            return self._handler(event, data)
+
+    def config(self, *args, **kwargs):
+        if args:
+            return self._config.get(args[0])
+        self._config.update(kwargs)
+
+    # ---------- GAP ----------
+
+    def gap_advertise(self, interval_us, adv_data=None, resp_data=None, connectable=True):
+        if interval_us is None:
+            self.advertising = None
+            return
+        if adv_data is not None and len(adv_data) > 31:
+            raise OSError(22)  # EINVAL, comme le contrôleur
+        if resp_data is not None and len(resp_data) > 31:
+            raise OSError(22)
+        self.advertising = (interval_us, bytes(adv_data or b''), bytes(resp_data or b''), connectable)
+
+    def gap_disconnect(self, conn_handle):
+        central = self.centrals.get(conn_handle)
+        if central is None:
+            return False
+        central.disconnect()
+        return True
+
+    # ---------- GATT serveur ----------
+
+    def gatts_register_services(self, services):
+        handles = []
+        for uuid, chars in services:
+            service_handles = []
+            self._next_handle += 1  # déclaration de service
+            for char in chars:
+                char_uuid, flags = char[0], char[1]
+                self._next_handle += 1  # déclaration de caractéristique
+                handle = self._next_handle
+                self._next_handle += 1
+                self.values[handle] = bytearray()
+                self.characteristics[handle] = (char_uuid, flags)
+                service_handles.append(handle)
+                if flags & (FLAG_NOTIFY | FLAG_INDICATE):
+                    self._next_handle += 1  # CCCD
+                # Descripteurs éventuels
+                for _ in (char[2] if len(char) > 2 else ()):
+                    self._next_handle += 1
+            self.services.append((uuid, service_handles))
+            handles.append(tuple(service_handles))
+        return tuple(handles)
+
+    def gatts_read(self, value_handle):
+        return bytes(self.values[value_handle])
+
+    def gatts_write(self, value_handle, data, send_update=False):
+        self.values[value_handle] = bytearray(data)
+        if send_update:
+            # Comme la pile: seuls les centraux abonnés (CCCD) sont notifiés,
+            # une notification refusée est perdue sans erreur
+            for conn_handle in list(self.centrals):
+                if value_handle in self.subscriptions.get(conn_handle, ()):
+                    try:
+                        self.gatts_notify(conn_handle, value_handle)
+                    except OSError:
+                        pass
+
+    def gatts_set_buffer(self, value_handle, size, append=False):
+        self.values.setdefault(value_handle, bytearray())
+
+    def _take_credit(self):
+        if self.tx_credits is None:
+            return
+        if self.tx_credits <= 0:
+            raise OSError(12)  # ENOMEM: pile saturée
+        self.tx_credits -= 1
+
+    def gatts_notify(self, conn_handle, value_handle, data=None):
+        if data is None:
+            data = self.values[value_handle]
+        central = self.centrals.get(conn_handle)
+        if central is None and self.centrals:
+            raise OSError(128)  # ENOTCONN
+        mtu = central.mtu if central is not None else 23
+        if len(data) > mtu - 3:
+            data = data[:mtu - 3]  # tronqué par la pile, comme sur le Pico
+        self._take_credit()
+        data = bytes(data)
+        self.notifications.append((conn_handle, value_handle, data))
+        if central is not None:
+            central._on_notify(value_handle, data)
+
+    def gatts_indicate(self, conn_handle, value_handle, data=None):
+        self.gatts_notify(conn_handle, value_handle, data)
+        self._irq(20, (conn_handle, value_handle, 0))  # _IRQ_GATTS_INDICATE_DONE
+
+    def gattc_exchange_mtu(self, conn_handle):
+        central = self.centrals.get(conn_handle)
+        if central is not None:
+            central._exchange_mtu(self._config.get('mtu', 23))
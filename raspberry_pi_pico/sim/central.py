@@ -0,0 +1,141 @@
+"""
+Central BLE simulé (le téléphone)
+Se connecte au périphérique simulé, négocie le MTU, écrit sur les
+caractéristiques et collecte les notifications reçues
+"""
+
+import json
+
+from sim import bluetooth
+
+_IRQ_CENTRAL_CONNECT = 1
+_IRQ_CENTRAL_DISCONNECT = 2
+_IRQ_GATTS_WRITE = 3
+_IRQ_MTU_EXCHANGED = 21
+
+# UUID du service UART Nordic utilisé par le firmware
+UART_TX = bluetooth.UUID("6E400003-B5A3-F393-E0A9-E50E24DCCA9E")
+UART_RX = bluetooth.UUID("6E400002-B5A3-F393-E0A9-E50E24DCCA9E")
+
+
+class VirtualCentral:
+    """
+    Central connecté à la pile BLE simulée
+
+    received contient les notifications (handle, bytes) dans l'ordre
+    d'arrivée; lines() et frames() les réassemblent comme l'application.
+    """
+
+    _next_conn = 0
+
+    def __init__(self, ble=None, mtu=247, addr=b'\x11\x22\x33\x44\x55\x66'):
+        self.ble = ble or bluetooth.BLE()
+        self.preferred_mtu = mtu
+        self.mtu = 23
+        self.addr = addr
+        self.conn_handle = None
+        self.received = []
+
+    @property
+    def connected(self):
+        return self.conn_handle is not None
+
+    def connect(self):
+        """Connexion au périphérique (IRQ _IRQ_CENTRAL_CONNECT)"""
+        if self.connected:
+            return self.conn_handle
+        VirtualCentral._next_conn += 1
+        self.conn_handle = VirtualCentral._next_conn
+        self.mtu = 23
+        self.ble.centrals[self.conn_handle] = self
+        self.ble._irq(_IRQ_CENTRAL_CONNECT, (self.conn_handle, 0, self.addr))
+        return self.conn_handle
+
+    def disconnect(self):
+        """Déconnexion (IRQ _IRQ_CENTRAL_DISCONNECT)"""
+        if not self.connected:
+            return
+        conn_handle = self.conn_handle
+        self.conn_handle = None
+        self.ble.centrals.pop(conn_handle, None)
+        self.ble.subscriptions.pop(conn_handle, None)
+        self.ble._irq(_IRQ_CENTRAL_DISCONNECT, (conn_handle, 0, self.addr))
+
+    def exchange_mtu(self):
+        """Négociation du MTU demandée par le central"""
+        self._exchange_mtu(self.ble.config('mtu') or 23)
+
+    def _exchange_mtu(self, server_mtu):
+        if not self.connected:
+            return
+        self.mtu = min(self.preferred_mtu, server_mtu)
+        self.ble._irq(_IRQ_MTU_EXCHANGED, (self.conn_handle, self.mtu))
+
+    def handle(self, uuid):
+        """Handle de valeur d'une caractéristique à partir de son UUID"""
+        uuid = bluetooth.UUID(uuid)
+        for handle, (char_uuid, _) in self.ble.characteristics.items():
+            if bluetooth.UUID(char_uuid) == uuid:
+                return handle
+        raise KeyError(uuid)
+
+    def write(self, data, uuid=UART_RX):
+        """Écriture GATT (IRQ _IRQ_GATTS_WRITE), limitée à MTU - 3 octets"""
+        if not self.connected:
+            raise OSError(128)  # ENOTCONN
+        data = bytes(data)
+        if len(data) > self.mtu - 3:
+            raise ValueError("écriture plus longue que MTU - 3")
+        handle = self.handle(uuid)
+        self.ble.values[handle] = bytearray(data)
+        self.ble._irq(_IRQ_GATTS_WRITE, (self.conn_handle, handle))
+
+    def subscribe(self, uuid, enable=True):
+        """Écriture du CCCD (notifications de la caractéristique)"""
+        if not self.connected:
+            raise OSError(128)  # ENOTCONN
+        handle = self.handle(uuid)
+        handles = self.ble.subscriptions.setdefault(self.conn_handle, set())
+        if enable:
+            handles.add(handle)
+        else:
+            handles.discard(handle)
+        # CCCD juste après la valeur; écriture remontée au firmware
+        self.ble.values[handle + 1] = bytearray(b'\x01\x00' if enable else b'\x00\x00')
+        self.ble._irq(_IRQ_GATTS_WRITE, (self.conn_handle, handle + 1))
+
+    def read(self, uuid):
+        """Lecture GATT de la valeur courante d'une caractéristique"""
+        if not self.connected:
+            raise OSError(128)  # ENOTCONN
+        return bytes(self.ble.values[self.handle(uuid)])
+
+    def _on_notify(self, value_handle, data):
+        self.received.append((value_handle, bytes(data)))
+
+    # ---------- Données reçues ----------
+
+    def payload(self, uuid=UART_TX):
+        """Octets reçus sur une caractéristique, notifications concaténées"""
+        handle = self.handle(uuid)
+        return b''.join(data for h, data in self.received if h == handle)
+
+    def lines(self, uuid=UART_TX):
+        """Messages JSON complets (délimités par '\\n'), décodés"""
+        messages = []
+        for line in self.payload(uuid).split(b'\n'):
+            line = line.strip()
+            if line.startswith(b'{'):
+                try:
+                    messages.append(json.loads(line))
+                except ValueError:
+                    pass  # message partiel (connexion en cours de flux)
+        return messages
+
+    def frames(self, size, uuid=UART_TX):
+        """Notifications de taille fixe (trames binaires)"""
+        handle = self.handle(uuid)
+        return [data for h, data in self.received if h == handle and len(data) == size]
+
+    def clear(self):
+        del self.received[:]
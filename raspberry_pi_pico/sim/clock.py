@@ -0,0 +1,178 @@
+"""
+Horloge virtuelle pour la simulation
+Fournit ticks_ms/ticks_us/ticks_diff/sleep_ms comme le module time de MicroPython
+Le temps n'avance que sur sleep*() ou advance_*(), plus vite que le temps réel
+"""
+
+import heapq
+import time as _time
+
+# Comme MicroPython: les ticks bouclent sur 2^30
+TICKS_PERIOD = 1 << 30
+_TICKS_MAX = TICKS_PERIOD - 1
+_TICKS_HALF = TICKS_PERIOD // 2
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & _TICKS_MAX
+
+
+def ticks_diff(ticks1, ticks2):
+    return ((ticks1 - ticks2 + _TICKS_HALF) & _TICKS_MAX) - _TICKS_HALF
+
+
+class SimulationEnd(BaseException):
+    """
+    Fin du temps virtuel alloué (voir VirtualClock.stop_at_us)
+
+    Dérive de BaseException: les `except Exception` du firmware ne
+    l'interceptent pas, comme KeyboardInterrupt sur le Pico.
+    """
+
+
+class VirtualClock:
+    """Horloge à temps virtuel avec échéancier d'événements"""
+
+    def __init__(self, start_ms=0):
+        self.now_us = start_ms * 1000
+        self._timers = []
+        self._seq = 0
+        # Appelé après chaque événement (ex: exécuter micropython.schedule)
+        self.after_event = None
+        # Échéance de fin de simulation (None = illimitée)
+        self.stop_us = None
+
+    # API compatible module time MicroPython
+    def ticks_ms(self):
+        return (self.now_us // 1000) & _TICKS_MAX
+
+    def ticks_us(self):
+        return self.now_us & _TICKS_MAX
+
+    def ticks_cpu(self):
+        return self.ticks_us()
+
+    ticks_add = staticmethod(ticks_add)
+    ticks_diff = staticmethod(ticks_diff)
+
+    def time(self):
+        return self.now_us // 1000000
+
+    def sleep(self, seconds):
+        self.advance_us(int(seconds * 1000000))
+
+    def sleep_ms(self, ms):
+        self.advance_us(int(ms) * 1000)
+
+    def sleep_us(self, us):
+        self.advance_us(int(us))
+
+    # Échéancier
+    def call_at_us(self, t_us, callback, period_us=0):
+        """Programme callback() à l'instant t_us (répété si period_us > 0)"""
+        self._seq += 1
+        timer = [t_us, self._seq, callback, period_us, True]
+        heapq.heappush(self._timers, timer)
+        return timer
+
+    def call_every_us(self, period_us, callback):
+        return self.call_at_us(self.now_us + period_us, callback, period_us)
+
+    @staticmethod
+    def cancel(timer):
+        timer[4] = False
+
+    def stop_at_us(self, t_us):
+        """Lève SimulationEnd quand le temps atteint t_us (None = jamais)"""
+        self.stop_us = t_us
+
+    def advance_us(self, us):
+        """Avance le temps en déclenchant les événements échus dans l'ordre"""
+        target = self.now_us + max(0, us)
+        stop = self.stop_us
+        if stop is not None and target >= stop:
+            # Une seule fois: le nettoyage (annulation des tâches) peut
+            # encore avancer le temps
+            self.stop_us = None
+            self.advance_us(stop - self.now_us)
+            raise SimulationEnd()
+        while self._timers and self._timers[0][0] <= target:
+            timer = heapq.heappop(self._timers)
+            if not timer[4]:
+                continue
+            self.now_us = timer[0]
+            if timer[3]:
+                timer[0] += timer[3]
+                self._seq += 1
+                timer[1] = self._seq
+                heapq.heappush(self._timers, timer)
+            timer[2]()
+            if self.after_event is not None:
+                self.after_event()
+        self.now_us = target
+
+    def advance_ms(self, ms):
+        self.advance_us(int(ms * 1000))
+
+
+class RealClock:
+    """
+    Horloge en temps réel, même API que VirtualClock (sans échéancier)
+    Pour le firmware réseau testé sur de vraies sockets (tools/bench_ws.py)
+    """
+
+    def __init__(self):
+        # Fonctions d'origine: install() remplace celles du module time
+        self._monotonic_ns = _time.monotonic_ns
+        self._sleep = _time.sleep
+        self._time = _time.time
+        self._start_ns = self._monotonic_ns()
+
+    def ticks_ms(self):
+        return ((self._monotonic_ns() - self._start_ns) // 1000000) & _TICKS_MAX
+
+    def ticks_us(self):
+        return ((self._monotonic_ns() - self._start_ns) // 1000) & _TICKS_MAX
+
+    def ticks_cpu(self):
+        return self.ticks_us()
+
+    ticks_add = staticmethod(ticks_add)
+    ticks_diff = staticmethod(ticks_diff)
+
+    def time(self):
+        return int(self._time())
+
+    def sleep(self, seconds):
+        self._sleep(seconds)
+
+    def sleep_ms(self, ms):
+        self._sleep(ms / 1000)
+
+    def sleep_us(self, us):
+        self._sleep(us / 1000000)
+
+
+_TIME_API = ('ticks_ms', 'ticks_us', 'ticks_cpu', 'ticks_add', 'ticks_diff',
+             'sleep', 'sleep_ms', 'sleep_us', 'time')
+
+
+def install(clock):
+    """
+    Branche l'horloge virtuelle sur le module time de CPython
+
+    Returns:
+        callable: fonction qui restaure le module time d'origine
+    """
+    saved = {name: getattr(_time, name) for name in _TIME_API if hasattr(_time, name)}
+    for name in _TIME_API:
+        setattr(_time, name, getattr(clock, name))
+
+    def restore():
+        for name in _TIME_API:
+            if name in saved:
+                setattr(_time, name, saved[name])
+            elif hasattr(_time, name):
+                delattr(_time, name)
+
+    return restore
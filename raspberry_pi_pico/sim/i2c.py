@@ -0,0 +1,209 @@
+"""
+Bus I2C simulé pour tester les pilotes MPU sur PC
+Expose la même API que machine.I2C et compte les transactions
+"""
+
+import errno
+import struct
+
+
+class FakeMPUDevice:
+    """Carte de registres d'un MPU6050/MPU6500/MPU9250 simulé"""
+
+    SMPLRT_DIV = 0x19
+    CONFIG = 0x1A
+    LP_ACCEL_ODR = 0x1E
+    MOT_THR = 0x1F
+    FIFO_EN = 0x23
+    INT_ENABLE = 0x38
+    INT_STATUS = 0x3A
+    ACCEL_XOUT_H = 0x3B
+    USER_CTRL = 0x6A
+    PWR_MGMT_1 = 0x6B
+    PWR_MGMT_2 = 0x6C
+    FIFO_COUNTH = 0x72
+    FIFO_R_W = 0x74
+    WHO_AM_I = 0x75
+
+    # Ordre d'écriture dans la FIFO (par adresse de registre croissante)
+    _FIFO_SOURCES = (
+        (0x08, 0x3B, 6),  # ACCEL
+        (0x80, 0x41, 2),  # TEMP
+        (0x40, 0x43, 2),  # XG
+        (0x20, 0x45, 2),  # YG
+        (0x10, 0x47, 2),  # ZG
+    )
+
+    # Fréquences du mode cycle: LP_WAKE_CTRL (MPU6050), LP_ACCEL_ODR (MPU6500)
+    _LP_WAKE_HZ_6050 = (1.25, 5, 20, 40)
+    _LP_WAKE_HZ_6500 = (0.24, 0.49, 0.98, 1.95, 3.91, 7.81, 15.63, 31.25, 62.5, 125, 250, 500)
+
+    def __init__(self, who_am_i=0x68, fifo_size=None):
+        self.regs = bytearray(128)
+        self.regs[self.WHO_AM_I] = who_am_i
+        self.regs[self.PWR_MGMT_1] = 0x40  # SLEEP au démarrage
+        self.fifo = bytearray()
+        self.fifo_size = fifo_size or (1024 if who_am_i == 0x68 else 512)
+        self.samples = 0
+        self.motion_events = 0
+        self._prev_accel = None
+        # source(t_us) -> (ax, ay, az, temp, gx, gy, gz) bruts, appelée à chaque échantillon
+        self.source = None
+        self._clock = None
+        self._timer = None
+        self._int_pin = None
+
+    def set_raw(self, ax=0, ay=0, az=16384, temp=0, gx=0, gy=0, gz=0):
+        """Écrit un échantillon brut int16 dans les registres de données"""
+        struct.pack_into('>7h', self.regs, self.ACCEL_XOUT_H,
+                         ax, ay, az, temp, gx, gy, gz)
+
+    def set_sample(self, accel=(0.0, 0.0, 1.0), gyro=(0.0, 0.0, 0.0), temp_c=25.0):
+        """Écrit un échantillon en unités physiques (g, °/s, °C)"""
+        ax, ay, az = (_clamp16(v * 16384.0) for v in accel)
+        gx, gy, gz = (_clamp16(v * 131.0) for v in gyro)
+        self.set_raw(ax, ay, az, _clamp16((temp_c - 36.53) * 340.0), gx, gy, gz)
+
+    # ---------- Horloge d'échantillonnage ----------
+
+    @property
+    def cycle_mode(self):
+        """Mode cycle (veille, accéléromètre seul) selon PWR_MGMT_1"""
+        return bool(self.regs[self.PWR_MGMT_1] & 0x20)
+
+    def odr_hz(self):
+        """Fréquence de sortie selon CONFIG (DLPF) et SMPLRT_DIV, ou de réveil en mode cycle"""
+        if self.cycle_mode:
+            if self.regs[self.WHO_AM_I] == 0x68:
+                return self._LP_WAKE_HZ_6050[self.regs[self.PWR_MGMT_2] >> 6]
+            return self._LP_WAKE_HZ_6500[min(self.regs[self.LP_ACCEL_ODR] & 0x0F, 11)]
+        dlpf = self.regs[self.CONFIG] & 0x07
+        base = 8000 if dlpf in (0, 7) else 1000
+        return base / (1 + self.regs[self.SMPLRT_DIV])
+
+    def attach(self, clock):
+        """Produit un échantillon à chaque période ODR de l'horloge virtuelle"""
+        self._clock = clock
+        self._schedule()
+
+    def connect_int(self, pin):
+        """Relie la broche INT du capteur à une Pin simulée"""
+        self._int_pin = pin
+
+    def _schedule(self):
+        if self._clock is None:
+            return
+        if self._timer is not None:
+            self._clock.cancel(self._timer)
+        self._timer = self._clock.call_every_us(int(1000000 / self.odr_hz()), self.sample)
+
+    def sample(self):
+        """Nouvel échantillon: registres de données, FIFO et DATA_RDY"""
+        if self.source is not None:
+            t_us = self._clock.now_us if self._clock is not None else self.samples
+            self.set_raw(*self.source(t_us))
+        if self.regs[self.PWR_MGMT_2] & 0x07 == 0x07:
+            # Gyroscope en veille: registres à 0
+            struct.pack_into('>3h', self.regs, 0x43, 0, 0, 0)
+        self.samples += 1
+        self._check_motion()
+        if self.regs[self.USER_CTRL] & 0x40:
+            enabled = self.regs[self.FIFO_EN]
+            for bit, reg, n in self._FIFO_SOURCES:
+                if enabled & bit:
+                    self.fifo += self.regs[reg:reg + n]
+            overflow = len(self.fifo) - self.fifo_size
+            if overflow > 0:
+                del self.fifo[:overflow]
+                self.regs[self.INT_STATUS] |= 0x10
+        self.regs[self.INT_STATUS] |= 0x01
+        if self._int_pin is not None and self.regs[self.INT_ENABLE] & 0x01:
+            self._int_pin.pulse()
+
+    def _check_motion(self):
+        """Réveil sur mouvement: écart à l'échantillon précédent sur un axe > seuil"""
+        accel = struct.unpack_from('>3h', self.regs, self.ACCEL_XOUT_H)
+        prev = self._prev_accel
+        self._prev_accel = accel
+        if prev is None or not self.regs[self.INT_ENABLE] & 0x40:
+            return
+        # MOT_THR: 2 mg/LSB (MPU6050), WOM_THR: 4 mg/LSB (MPU6500)
+        lsb_mg = 2 if self.regs[self.WHO_AM_I] == 0x68 else 4
+        threshold = self.regs[self.MOT_THR] * lsb_mg * 16384 / 1000
+        if any(abs(a - b) > threshold for a, b in zip(accel, prev)):
+            self.motion_events += 1
+            self.regs[self.INT_STATUS] |= 0x40
+            if self._int_pin is not None:
+                self._int_pin.pulse()
+
+    # ---------- Accès bus ----------
+
+    def read(self, reg, n):
+        """Lecture avec auto-incrément, sauf FIFO_R_W qui dépile la FIFO"""
+        if reg == self.FIFO_R_W:
+            data = bytes(self.fifo[:n])
+            del self.fifo[:n]
+            return data + b'\xff' * (n - len(data))
+        struct.pack_into('>H', self.regs, self.FIFO_COUNTH, len(self.fifo))
+        data = bytes(self.regs[(reg + i) & 0x7F] for i in range(n))
+        if reg <= self.INT_STATUS < reg + n:
+            self.regs[self.INT_STATUS] = 0
+        return data
+
+    def write(self, reg, data):
+        for i, b in enumerate(data):
+            r = (reg + i) & 0x7F
+            if r == self.USER_CTRL and b & 0x04:
+                self.fifo = bytearray()
+                b &= ~0x04
+            self.regs[r] = b
+            if r in (self.SMPLRT_DIV, self.CONFIG, self.PWR_MGMT_1, self.PWR_MGMT_2,
+                     self.LP_ACCEL_ODR):
+                self._schedule()
+
+
+class FakeI2C:
+    """Bus I2C simulé, compatible avec l'API machine.I2C utilisée par le firmware"""
+
+    def __init__(self, devices=None):
+        self.devices = devices if devices is not None else {0x68: FakeMPUDevice()}
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.transactions = 0
+        self.reads = 0
+        self.writes = 0
+        self.bytes_read = 0
+
+    def _device(self, addr):
+        dev = self.devices.get(addr)
+        if dev is None:
+            raise OSError(errno.ENODEV)
+        return dev
+
+    def scan(self):
+        return sorted(self.devices)
+
+    def readfrom_mem(self, addr, memaddr, nbytes):
+        data = self._device(addr).read(memaddr, nbytes)
+        self.transactions += 1
+        self.reads += 1
+        self.bytes_read += nbytes
+        return data
+
+    def readfrom_mem_into(self, addr, memaddr, buf):
+        data = self._device(addr).read(memaddr, len(buf))
+        buf[:] = data
+        self.transactions += 1
+        self.reads += 1
+        self.bytes_read += len(buf)
+
+    def writeto_mem(self, addr, memaddr, buf):
+        self._device(addr).write(memaddr, buf)
+        self.transactions += 1
+        self.writes += 1
+
+
+def _clamp16(v):
+    v = int(round(v))
+    return -32768 if v < -32768 else 32767 if v > 32767 else v
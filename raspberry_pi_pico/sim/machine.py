@@ -0,0 +1,123 @@
+"""
+Module machine simulé
+Broches avec IRQ sur front (pour l'interruption INT du MPU) et bus I2C
+reliés aux capteurs simulés (sim.i2c)
+"""
+
+from sim.i2c import FakeI2C
+
+
+class Pin:
+    """Broche GPIO simulée: une seule instance par numéro, comme une ligne physique"""
+
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    _pins = {}
+
+    def __new__(cls, id, mode=-1, pull=-1, value=None):
+        pin = cls._pins.get(id)
+        if pin is None:
+            pin = super().__new__(cls)
+            pin.id = id
+            pin._value = 0
+            pin._handler = None
+            pin._trigger = 0
+            cls._pins[id] = pin
+        return pin
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        if value is not None:
+            self._value = 1 if value else 0
+
+    def __repr__(self):
+        return "Pin(%s)" % (self.id,)
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        self.drive(v)
+
+    def on(self):
+        self.drive(1)
+
+    def off(self):
+        self.drive(0)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, hard=False):
+        self._handler = handler
+        self._trigger = trigger if handler is not None else 0
+
+    def drive(self, v):
+        """Change le niveau de la ligne et déclenche l'IRQ sur le front attendu"""
+        v = 1 if v else 0
+        old = self._value
+        self._value = v
+        if self._handler is None or v == old:
+            return
+        if (v and self._trigger & self.IRQ_RISING) or (not v and self._trigger & self.IRQ_FALLING):
+            self._handler(self)
+
+    def pulse(self):
+        """Impulsion haute brève (broche INT du MPU en mode non verrouillé)"""
+        self.drive(1)
+        self.drive(0)
+
+    @classmethod
+    def reset_all(cls):
+        cls._pins.clear()
+
+
+class I2C:
+    """
+    machine.I2C simulé: I2C(id, ...) renvoie le bus FakeI2C enregistré
+    pour id (voir attach_bus), comme deux objets sur les mêmes broches
+    """
+
+    _buses = {}
+
+    def __new__(cls, id=0, scl=None, sda=None, freq=400000, timeout=50000):
+        bus = cls._buses.get(id)
+        if bus is None:
+            # Bus vide: scan() == [], les accès lèvent OSError(ENODEV)
+            bus = cls._buses[id] = FakeI2C({})
+        return bus
+
+    @classmethod
+    def attach_bus(cls, id, bus):
+        """Enregistre le bus simulé (FakeI2C) renvoyé par I2C(id)"""
+        cls._buses[id] = bus
+        return bus
+
+    @classmethod
+    def reset_all(cls):
+        cls._buses.clear()
+
+
+def disable_irq():
+    return 0
+
+
+def enable_irq(state=0):
+    pass
+
+
+def freq(hz=None):
+    return 125000000
+
+
+def idle():
+    pass
+
+
+def unique_id():
+    return b'\xe6\x61\x38\x10\x63\x2c\x2a\x2b'
+
+
+def reset():
+    raise SystemExit("machine.reset()")
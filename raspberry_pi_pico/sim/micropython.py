@@ -0,0 +1,43 @@
+"""
+Module micropython simulé
+const(), décorateurs du compilateur natif et file de micropython.schedule
+"""
+
+# Profondeur de la file de planification (MICROPY_SCHEDULER_DEPTH)
+SCHEDULER_DEPTH = 8
+
+_pending = []
+
+
+def const(value):
+    return value
+
+
+def native(func):
+    return func
+
+
+def viper(func):
+    return func
+
+
+def schedule(func, arg):
+    """Met func(arg) en file, RuntimeError si la file est pleine (comme sur le Pico)"""
+    if len(_pending) >= SCHEDULER_DEPTH:
+        raise RuntimeError("schedule queue full")
+    _pending.append((func, arg))
+
+
+def run_scheduled():
+    """Exécute les fonctions planifiées (appelé par l'horloge entre deux événements)"""
+    while _pending:
+        func, arg = _pending.pop(0)
+        func(arg)
+
+
+def mem_info(*args):
+    pass
+
+
+def opt_level(*args):
+    return 0
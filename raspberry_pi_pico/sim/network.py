@@ -0,0 +1,96 @@
+"""
+Module network simulé (Wi-Fi du Pico W)
+La connexion aboutit après un délai de temps virtuel
+"""
+
+import time
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_WRONG_PASSWORD = -3
+STAT_NO_AP_FOUND = -2
+STAT_CONNECT_FAIL = -1
+STAT_GOT_IP = 3
+
+
+class WLAN:
+    """
+    Interface Wi-Fi simulée (une instance par interface)
+
+    networks associe un SSID à son mot de passe; connect_ms est la durée
+    d'association en temps virtuel.
+    """
+
+    networks = {}
+    connect_ms = 1500
+    _interfaces = {}
+
+    def __new__(cls, interface=STA_IF):
+        wlan = cls._interfaces.get(interface)
+        if wlan is None:
+            wlan = super().__new__(cls)
+            wlan.interface = interface
+            wlan._active = False
+            wlan._status = STAT_IDLE
+            wlan._ssid = None
+            wlan._connected_at = None
+            wlan._ip = '192.168.4.%d' % (2 + interface)
+            cls._interfaces[interface] = wlan
+        return wlan
+
+    def active(self, state=None):
+        if state is None:
+            return self._active
+        self._active = bool(state)
+        if not self._active:
+            self.disconnect()
+
+    def connect(self, ssid=None, key=None):
+        if not self._active:
+            raise OSError("WLAN inactive")
+        if self.networks and ssid not in self.networks:
+            self._status = STAT_NO_AP_FOUND
+            return
+        if self.networks and self.networks[ssid] not in (None, key):
+            self._status = STAT_WRONG_PASSWORD
+            return
+        self._ssid = ssid
+        self._status = STAT_CONNECTING
+        self._connected_at = time.ticks_add(time.ticks_ms(), self.connect_ms)
+
+    def disconnect(self):
+        self._status = STAT_IDLE
+        self._ssid = None
+        self._connected_at = None
+
+    def status(self, param=None):
+        if param == 'rssi':
+            return -55
+        if self._status == STAT_CONNECTING and time.ticks_diff(time.ticks_ms(), self._connected_at) >= 0:
+            self._status = STAT_GOT_IP
+        return self._status
+
+    def isconnected(self):
+        return self.status() == STAT_GOT_IP
+
+    def ifconfig(self, config=None):
+        if config is not None:
+            self._ip = config[0]
+            return
+        ip = self._ip if self.isconnected() else '0.0.0.0'
+        return (ip, '255.255.255.0', '192.168.4.1', '192.168.4.1')
+
+    def config(self, *args, **kwargs):
+        if args and args[0] == 'ssid':
+            return self._ssid
+        if args and args[0] == 'mac':
+            return b'\x28\xcd\xc1\x00\x00\x02'
+        return None
+
+    @classmethod
+    def reset_all(cls):
+        cls._interfaces.clear()
+        cls.networks = {}
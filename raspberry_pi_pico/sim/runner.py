@@ -0,0 +1,116 @@
+"""
+Exécution des scripts du firmware, non modifiés, en temps virtuel
+asyncio.run() du script utilise la boucle VirtualTimeLoop; le script
+s'arrête après la durée demandée (SimulationEnd)
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+import sim
+from sim import bluetooth, machine, network
+from sim.aio import VirtualTimeLoop, run_for
+from sim.central import VirtualCentral
+from sim.clock import SimulationEnd
+from sim.i2c import FakeI2C, FakeMPUDevice
+
+FIRMWARE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _VirtualTimePolicy(asyncio.DefaultEventLoopPolicy):
+    def __init__(self, clock):
+        super().__init__()
+        self._clock = clock
+
+    def new_event_loop(self):
+        return VirtualTimeLoop(self._clock)
+
+
+class Simulation:
+    """
+    Carte Pico W simulée: horloge, MPU sur I2C(0), pile BLE, Wi-Fi
+
+    Les fichiers écrits par le firmware (flash LittleFS) vont dans
+    workdir, dossier courant pendant run_script (temporaire par défaut).
+
+    Utilisation:
+        s = Simulation(trace=traces.walking(60))
+        phone = s.central()
+        s.at(1000, phone.connect)
+        s.run_script("main_bluetooth.py", seconds=60)
+        print(phone.lines()[-1])
+        s.close()
+    """
+
+    def __init__(self, trace=None, who_am_i=0x68, int_pin=None, i2c_id=0,
+                 start_ms=0, workdir=None):
+        """
+        Args:
+            trace: source du capteur (sim.traces.Trace ou source(t_us))
+            int_pin: GPIO reliée à la broche INT du MPU simulé
+        """
+        self.clock = sim.install(sim.VirtualClock(start_ms))
+        self.mpu = FakeMPUDevice(who_am_i)
+        self.mpu.source = trace
+        self.mpu.attach(self.clock)
+        if int_pin is not None:
+            self.mpu.connect_int(machine.Pin(int_pin))
+        self.i2c = machine.I2C.attach_bus(i2c_id, FakeI2C({0x68: self.mpu}))
+        self.ble = bluetooth.BLE()
+        self.wlan = network.WLAN(network.STA_IF)
+        self.centrals = []
+        self.workdir = workdir or tempfile.mkdtemp(prefix='pico-flash-')
+
+    def central(self, mtu=247):
+        """Nouveau téléphone simulé (non connecté)"""
+        central = VirtualCentral(self.ble, mtu=mtu)
+        self.centrals.append(central)
+        return central
+
+    def at(self, t_ms, callback):
+        """Programme callback() à l'instant virtuel t_ms (ex: connexion)"""
+        return self.clock.call_at_us(int(t_ms * 1000), callback)
+
+    def run(self, coro, seconds):
+        """Exécute une coroutine pendant seconds de temps virtuel"""
+        return run_for(coro, self.clock, seconds)
+
+    def run_script(self, path, seconds):
+        """
+        Exécute un script du firmware (ex: main_bluetooth.py) tel quel
+
+        Returns:
+            dict: variables globales du script à l'arrêt
+        """
+        path = os.path.abspath(path)
+        for d in (FIRMWARE_DIR, os.path.dirname(path)):
+            if d not in sys.path:
+                sys.path.insert(0, d)
+        with open(path) as f:
+            code = compile(f.read(), path, 'exec')
+        scope = {'__name__': '__main__', '__file__': path}
+        saved_cwd = os.getcwd()
+        os.chdir(self.workdir)
+        saved_policy = asyncio.get_event_loop_policy()
+        asyncio.set_event_loop_policy(_VirtualTimePolicy(self.clock))
+        self.clock.stop_at_us(self.clock.now_us + int(seconds * 1000000))
+        try:
+            exec(code, scope)
+        except SimulationEnd:
+            pass
+        finally:
+            self.clock.stop_at_us(None)
+            asyncio.set_event_loop_policy(saved_policy)
+            os.chdir(saved_cwd)
+        return scope
+
+    def close(self):
+        sim.uninstall()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
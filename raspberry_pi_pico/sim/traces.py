@@ -0,0 +1,215 @@
+"""
+Traces accélérométriques pour la simulation et les bancs d'essai
+Traces synthétiques étiquetées (nombre de pas réel connu) ou enregistrées (CSV)
+"""
+
+import bisect
+import csv
+import math
+import random
+
+ACCEL_SCALE = 16384.0
+GYRO_SCALE = 131.0
+TEMP_RAW_25C = int((25.0 - 36.53) * 340.0)
+
+
+def _clamp16(v):
+    v = int(round(v))
+    return -32768 if v < -32768 else 32767 if v > 32767 else v
+
+
+class Trace:
+    """
+    Signal capteur en fonction du temps
+
+    Appelée avec t_us (source de FakeMPUDevice), renvoie un échantillon
+    brut (ax, ay, az, temp, gx, gy, gz). steps est le nombre de pas réel
+    (None si inconnu).
+    """
+
+    def __init__(self, name, duration_s, steps, accel, gyro=None, tilt_deg=20.0):
+        self.name = name
+        self.duration_s = duration_s
+        self.steps = steps
+        self._accel = accel
+        self._gyro = gyro
+        # Capteur incliné: la composante verticale se répartit sur y et z
+        self._cos = math.cos(math.radians(tilt_deg))
+        self._sin = math.sin(math.radians(tilt_deg))
+
+    def sample(self, t_s):
+        """Échantillon en unités physiques: ((ax, ay, az) en g, (gx, gy, gz) en °/s)"""
+        vertical, lateral = self._accel(t_s)
+        accel = (lateral, vertical * self._sin, vertical * self._cos)
+        gyro = self._gyro(t_s) if self._gyro is not None else (0.0, 0.0, 0.0)
+        return accel, gyro
+
+    def __call__(self, t_us):
+        (ax, ay, az), (gx, gy, gz) = self.sample(t_us / 1000000)
+        return (_clamp16(ax * ACCEL_SCALE), _clamp16(ay * ACCEL_SCALE),
+                _clamp16(az * ACCEL_SCALE), TEMP_RAW_25C,
+                _clamp16(gx * GYRO_SCALE), _clamp16(gy * GYRO_SCALE),
+                _clamp16(gz * GYRO_SCALE))
+
+    def samples(self, rate_hz=20, start_ms=0):
+        """
+        Rejoue la trace à fréquence fixe
+
+        Yields:
+            tuple: (t_ms, ax, ay, az, gx, gy, gz) en g et °/s
+        """
+        n = int(self.duration_s * rate_hz)
+        for i in range(n):
+            t_s = i / rate_hz
+            (ax, ay, az), (gx, gy, gz) = self.sample(t_s)
+            yield start_ms + int(t_s * 1000), ax, ay, az, gx, gy, gz
+
+    def magnitudes(self, rate_hz=20, start_ms=0):
+        """Yields: (t_ms, |accel| en g), l'entrée des détecteurs de pas"""
+        for t, ax, ay, az, _, _, _ in self.samples(rate_hz, start_ms):
+            yield t, math.sqrt(ax * ax + ay * ay + az * az)
+
+
+def _gait(name, duration_s, cadence_hz, amplitude, noise, swing_dps, seed,
+          harmonic=0.3, drift=0.0):
+    rng = random.Random(seed)
+
+    def accel(t):
+        phase = 2 * math.pi * cadence_hz * t
+        v = 1.0 + amplitude * (math.sin(phase) + harmonic * math.sin(2 * phase + 0.8))
+        v += drift * math.sin(2 * math.pi * 0.05 * t)
+        return v + rng.gauss(0.0, noise), rng.gauss(0.0, noise) + 0.1 * amplitude * math.sin(phase / 2)
+
+    def gyro(t):
+        # Balancier de la jambe: une oscillation par foulée (2 pas)
+        swing = swing_dps * math.sin(math.pi * cadence_hz * t)
+        return (rng.gauss(0.0, 2.0), swing + rng.gauss(0.0, 2.0), rng.gauss(0.0, 2.0))
+
+    return Trace(name, duration_s, int(cadence_hz * duration_s), accel, gyro)
+
+
+def walking(duration_s=60, cadence_hz=1.8, amplitude=0.35, noise=0.05, seed=1):
+    """Marche normale (~108 pas/min)"""
+    return _gait("walking", duration_s, cadence_hz, amplitude, noise, 60.0, seed)
+
+
+def running(duration_s=60, cadence_hz=2.8, amplitude=0.9, noise=0.1, seed=2):
+    """Course (~170 pas/min), impacts plus forts"""
+    return _gait("running", duration_s, cadence_hz, amplitude, noise, 150.0, seed, harmonic=0.5)
+
+
+def stairs(duration_s=60, cadence_hz=1.4, amplitude=0.45, noise=0.07, seed=3):
+    """Montée d'escaliers: cadence lente, composante basse fréquence"""
+    return _gait("stairs", duration_s, cadence_hz, amplitude, noise, 80.0, seed,
+                 harmonic=0.5, drift=0.1)
+
+
+def idle_vibration(duration_s=60, vibration_hz=12.0, amplitude=0.15, noise=0.05,
+                   bump_every_s=7.0, seed=4):
+    """Immobile sur un support qui vibre (transport), avec quelques chocs: 0 pas"""
+    rng = random.Random(seed)
+
+    def accel(t):
+        v = 1.0 + amplitude * math.sin(2 * math.pi * vibration_hz * t)
+        # Chocs isolés (nids de poule, porte qui claque)
+        dt = t % bump_every_s
+        if dt < 0.08:
+            v += 0.6 * math.sin(math.pi * dt / 0.08)
+        return v + rng.gauss(0.0, noise), rng.gauss(0.0, noise)
+
+    def gyro(t):
+        return (rng.gauss(0.0, 3.0), rng.gauss(0.0, 3.0), rng.gauss(0.0, 3.0))
+
+    return Trace("idle_vibration", duration_s, 0, accel, gyro)
+
+
+def still(duration_s=60, noise=0.004, seed=6):
+    """Posé sur une table (bruit du capteur seulement): 0 pas"""
+    rng = random.Random(seed)
+
+    def accel(t):
+        return 1.0 + rng.gauss(0.0, noise), rng.gauss(0.0, noise)
+
+    def gyro(t):
+        return (rng.gauss(0.0, 0.5), rng.gauss(0.0, 0.5), rng.gauss(0.0, 0.5))
+
+    return Trace("still", duration_s, 0, accel, gyro)
+
+
+def arm_movement(duration_s=60, seed=5):
+    """Assis, gestes des bras (accélérations et rotations fortes): 0 pas"""
+    rng = random.Random(seed)
+
+    def accel(t):
+        gesture = 0.5 * math.sin(2 * math.pi * 1.6 * t) * (1 if int(t / 3) % 2 == 0 else 0)
+        return 1.0 + gesture + rng.gauss(0.0, 0.05), 0.4 * gesture + rng.gauss(0.0, 0.05)
+
+    def gyro(t):
+        w = 200.0 * math.sin(2 * math.pi * 1.6 * t) * (1 if int(t / 3) % 2 == 0 else 0)
+        return (w + rng.gauss(0.0, 3.0), rng.gauss(0.0, 3.0), 0.5 * w)
+
+    return Trace("arm_movement", duration_s, 0, accel, gyro)
+
+
+def standard_traces(duration_s=60):
+    """Jeu de traces étiquetées utilisé par les bancs d'essai"""
+    return [walking(duration_s), running(duration_s), stairs(duration_s),
+            idle_vibration(duration_s), arm_movement(duration_s)]
+
+
+def sequence(*segments, name=None):
+    """
+    Enchaîne des traces (ex: immobile, marche, immobile, course)
+
+    trace.segments donne (début en s, trace) de chaque segment; le nombre
+    de pas est la somme (None si l'un est inconnu).
+    """
+    starts = []
+    t = 0.0
+    for seg in segments:
+        starts.append(t)
+        t += seg.duration_s
+    steps = None if any(seg.steps is None for seg in segments) else sum(seg.steps for seg in segments)
+    trace = Trace(name or "+".join(seg.name for seg in segments), t, steps, None, None)
+
+    def sample(t_s):
+        i = max(0, bisect.bisect_right(starts, t_s) - 1)
+        return segments[i].sample(t_s - starts[i])
+
+    trace.sample = sample
+    trace.segments = list(zip(starts, segments))
+    return trace
+
+
+def from_csv(path, steps=None, name=None):
+    """
+    Trace enregistrée: CSV t_ms,ax,ay,az[,gx,gy,gz] (g et °/s)
+
+    Les valeurs sont tenues entre deux lignes (échantillonneur bloqueur).
+    """
+    times = []
+    rows = []
+    with open(path, newline='') as f:
+        for row in csv.reader(f):
+            if not row or not row[0].strip().lstrip('-').replace('.', '', 1).isdigit():
+                continue  # en-tête / ligne vide
+            values = [float(v) for v in row]
+            times.append(values[0] / 1000)
+            rows.append(values[1:] + [0.0] * (7 - len(values)))
+    if not rows:
+        raise ValueError("trace vide: %s" % path)
+    t0 = times[0]
+    state = {'i': 0}
+
+    def _row(t):
+        i = state['i']
+        if i >= len(times) or times[i] - t0 > t:
+            i = 0
+        while i + 1 < len(times) and times[i + 1] - t0 <= t:
+            i += 1
+        state['i'] = i
+        return rows[i]
+
+    trace = Trace(name or path, times[-1] - t0, steps, None, None, tilt_deg=0.0)
+    trace.sample = lambda t: (tuple(_row(t)[0:3]), tuple(_row(t)[3:6]))
+    return trace
@@ -3,7 +3,7 @@ Détecteur de pas avancé avec algorithmes améliorés
 Utilise Zero-Crossing + Peak Detection + Frequency Analysis
 """
 import time
-import math
+from ring_buffer import RingBuffer, TickWindow
 
 class AdvancedStepDetector:
     def __init__(self, step_length=0.7, user_weight=70):
@@ -13,11 +13,13 @@ class AdvancedStepDetector:
         
         # État de détection
         self.step_count = 0
-        self.step_times = []
+        # 5 derniers pas seulement (mémoire constante)
+        self.step_times = TickWindow(5)
         
-        # Historique pour analyse de fréquence
-        self.accel_history = []
-        self.history_max = 50
+        # Historique |accélération| pour la validation des pics
+        # (seuls les 10 derniers échantillons sont utilisés)
+        self.history_max = 10
+        self.accel_history = RingBuffer(self.history_max)
         
         # Variables pour Zero-Crossing
         self.prev_accel = 1.0
@@ -34,25 +36,25 @@ class AdvancedStepDetector:
         self.start_time = time.ticks_ms()
         self.total_calories = 0.0
         
-    def update(self, magnitude):
+    def update(self, magnitude, now=None):
         """
         Detecte un pas en utilisant plusieurs techniques combinees
         
         Args:
             magnitude: Magnitude de l acceleration (sqrt(x^2 + y^2 + z^2))
+            now: Horodatage ticks_ms de l echantillon (par defaut: maintenant)
             
         Returns:
             bool: True si un pas est detecte
         """
-        now = time.ticks_ms()
+        if now is None:
+            now = time.ticks_ms()
         
         # Normaliser (enlever gravité ~1g)
         normalized = magnitude - 1.0
         
-        # Ajouter à l'historique
-        self.accel_history.append(normalized)
-        if len(self.accel_history) > self.history_max:
-            self.accel_history.pop(0)
+        # Ajouter à l'historique (valeur absolue, seule utilisée)
+        self.accel_history.push(abs(normalized))
         
         step_detected = False
         
@@ -66,7 +68,7 @@ class AdvancedStepDetector:
                 # Vérifie que la fréquence est dans la plage de marche (1.5-2.5 Hz)
                 if self._check_frequency():
                     self.step_count += 1
-                    self.step_times.append(now)
+                    self.step_times.push(now)
                     step_detected = True
                     
                     # Mettre à jour les calories
@@ -89,14 +91,15 @@ class AdvancedStepDetector:
             return False
         
         # Calculer le seuil adaptatif basé sur l'historique récent
-        recent = self.accel_history[-10:]
-        avg = sum(abs(x) for x in recent) / len(recent)
-        std = math.sqrt(sum((abs(x) - avg) ** 2 for x in recent) / len(recent))
+        # (moyenne et écart-type glissants en O(1))
+        recent = self.accel_history
+        avg = recent.mean()
+        std = recent.std()
         
         threshold = max(self.peak_threshold, avg + std)
         
         # Vérifier que le pic était assez grand
-        max_recent = max(abs(x) for x in recent)
+        max_recent = recent.max()
         return max_recent > threshold
     
     def _check_frequency(self):
@@ -105,12 +108,10 @@ class AdvancedStepDetector:
             return True  # Pas assez de données, accepter
         
         # Analyser les 5 derniers pas
-        recent_steps = self.step_times[-5:]
-        if len(recent_steps) < 2:
-            return True
+        recent_steps = self.step_times
         
         # Calculer la fréquence moyenne
-        duration_ms = recent_steps[-1] - recent_steps[0]
+        duration_ms = recent_steps.span()
         if duration_ms <= 0:
             return True
         
@@ -136,7 +137,7 @@ class AdvancedStepDetector:
         
         # Temps écoulé depuis le dernier pas (en heures)
         if len(self.step_times) >= 2:
-            duration_h = (self.step_times[-1] - self.step_times[-2]) / (1000.0 * 3600.0)
+            duration_h = self.step_times.span(1) / (1000.0 * 3600.0)
             # Calories = MET × poids × durée
             calories_increment = MET * self.user_weight * duration_h
             self.total_calories += calories_increment
@@ -150,14 +151,10 @@ class AdvancedStepDetector:
             return 0.0
         
         # Utiliser une fenêtre glissante de 5 pas
-        window_size = min(5, len(self.step_times))
-        recent_times = self.step_times[-window_size:]
-        
-        if len(recent_times) < 2:
-            return 0.0
+        recent_times = self.step_times
         
         # Durée en secondes
-        duration_s = (recent_times[-1] - recent_times[0]) / 1000.0
+        duration_s = recent_times.span() / 1000.0
         
         if duration_s <= 0:
             return 0.0
@@ -193,11 +190,19 @@ class AdvancedStepDetector:
     def reset(self):
         """Réinitialise tous les compteurs"""
         self.step_count = 0
-        self.step_times = []
-        self.accel_history = []
+        self.step_times.reset()
+        self.accel_history.clear()
         self.total_calories = 0.0
         self.start_time = time.ticks_ms()
     
+    def pause(self):
+        """
+        Pause d'activité (capteur mis en veille): la fenêtre des derniers
+        pas est vidée, vitesse et cadence retombent à 0 et la reprise n'est
+        pas jugée sur la cadence d'avant la pause. Le total est conservé.
+        """
+        self.step_times.clear()
+    
     def get_activity_type(self):
         """Détermine le type d'activité en cours"""
         speed_kmh = self.get_speed() * 3.6
@@ -213,16 +218,21 @@ class AdvancedStepDetector:
         else:
             return "Course"
     
+    def get_average_cadence(self):
+        """Cadence moyenne (pas/minute) depuis le premier pas, pauses comprises"""
+        times = self.step_times
+        duration_min = times.elapsed() / (1000.0 * 60.0)
+        if times.total < 2 or duration_min <= 0:
+            return 0.0
+        return (times.total - 1) / duration_min
+    
     def get_cadence(self):
         """Retourne la cadence (pas/minute)"""
         if len(self.step_times) < 2:
             return 0.0
         
-        recent = self.step_times[-5:]
-        if len(recent) < 2:
-            return 0.0
-        
-        duration_min = (recent[-1] - recent[0]) / (1000.0 * 60.0)
+        recent = self.step_times
+        duration_min = recent.span() / (1000.0 * 60.0)
         if duration_min <= 0:
             return 0.0
         
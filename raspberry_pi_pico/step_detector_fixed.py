@@ -0,0 +1,206 @@
+"""
+AdvancedStepDetector en virgule fixe, sur les comptes bruts int16 du MPU
+Sans FPU, chaque flottant de MicroPython est un objet alloué sur le tas:
+le chemin par échantillon (magnitude, normalisation, moyenne, écart-type)
+ne manipule ici que des entiers dans un noyau @micropython.viper
+
+- magnitude: racine carrée entière bit à bit (sans division) des comptes
+  décalés d'un bit, convertie en 1/16 mg par multiplication et décalage
+  (passages par zéro), arrondie au mg pour l'historique
+- historique |accel| (mg, borné à 4095) dans le tableau d'état, somme et
+  somme des carrés entières exactes (pas de dérive, pas de recalcul)
+- pic validé sans racine: max > moyenne + écart-type
+  <=> (n.max - somme)² > n.somme_carrés - somme²  (avec n.max > somme)
+- fréquence, vitesse et calories (une fois par pas) restent ceux
+  d'AdvancedStepDetector
+
+Mêmes pas que la version flottante sur les traces simulées, aux
+échantillons près dont l'accélération est à moins d'une quantification
+de 1 g ou du seuil de pic (tools/check_fixed.py).
+"""
+import time
+from array import array
+import micropython
+from micropython import const
+from step_detector_advanced import AdvancedStepDetector
+
+try:
+    ptr16
+except NameError:
+    # Hors viper (CPython, simulation): annotations seulement, les
+    # tableaux s'indexent directement
+    ptr16 = ptr32 = None
+
+# Comptes décalés avant mise au carré: 3 x (2^15 >> 1)² < 2^30
+_SHIFT = const(1)
+# |accel| maximale retenue (mg): 10 x 4095² et (10 x 4095)² < 2^31
+_MAX_MG = const(4095)
+_HISTORY = const(10)
+_MIN_HISTORY = const(5)
+
+# Tableau d'état array('l'), partagé avec le noyau viper
+_S_K = const(0)           # 1/16 mg = (racine x K) >> 12
+_S_PREV = const(1)        # accélération normalisée précédente (1/16 mg)
+_S_LAST_ZC = const(2)     # dernier passage par zéro (ticks_ms)
+_S_DEBOUNCE = const(3)    # ms
+_S_THRESHOLD = const(4)   # seuil de pic minimal (mg)
+_S_HEAD = const(5)
+_S_COUNT = const(6)
+_S_SUM = const(7)
+_S_SUMSQ = const(8)
+_S_RING = const(9)        # _HISTORY valeurs |accel| (mg)
+_S_SIZE = const(19)
+
+
+@micropython.viper
+def _fixed_update(raw: ptr16, j: int, st: ptr32, now: int) -> int:
+    """
+    Un échantillon (raw[j:j + 3]): historique et passage par zéro
+
+    Returns:
+        int: 1 si pas candidat (passage par zéro hors anti-rebond, pic validé)
+    """
+    ax = int(raw[j])
+    ay = int(raw[j + 1])
+    az = int(raw[j + 2])
+    # ptr16 lit des valeurs non signées
+    if ax > 32767:
+        ax -= 65536
+    if ay > 32767:
+        ay -= 65536
+    if az > 32767:
+        az -= 65536
+    # Décalage d'un bit, arrondi
+    ax = (ax + 1) >> _SHIFT
+    ay = (ay + 1) >> _SHIFT
+    az = (az + 1) >> _SHIFT
+    n = ax * ax + ay * ay + az * az
+
+    # Racine carrée entière, bit à bit: n < 2^30, première puissance de 4
+    # 2^28 (petit entier MicroPython, comme toutes les constantes ici)
+    root = 0
+    bit = 1 << 28
+    while bit > n:
+        bit >>= 2
+    while bit != 0:
+        if n >= root + bit:
+            n -= root + bit
+            root = (root >> 1) + bit
+        else:
+            root >>= 1
+        bit >>= 2
+    # Arrondi au plus proche (reste > racine)
+    if n > root:
+        root += 1
+
+    norm = ((root * st[_S_K] + 2048) >> 12) - 16000
+    a = ((norm if norm >= 0 else -norm) + 8) >> 4
+    if a > _MAX_MG:
+        a = _MAX_MG
+
+    # Historique |accel|: anneau et sommes exactes
+    head = st[_S_HEAD]
+    count = st[_S_COUNT]
+    old = st[_S_RING + head] if count == _HISTORY else 0
+    st[_S_RING + head] = a
+    st[_S_SUM] = st[_S_SUM] + a - old
+    st[_S_SUMSQ] = st[_S_SUMSQ] + a * a - old * old
+    head += 1
+    if head == _HISTORY:
+        head = 0
+    st[_S_HEAD] = head
+    if count < _HISTORY:
+        count += 1
+        st[_S_COUNT] = count
+
+    prev = st[_S_PREV]
+    st[_S_PREV] = norm
+    if prev <= 0 or norm > 0:
+        return 0
+    # Passage par zéro (positif -> négatif), anti-rebond (ticks_diff)
+    dt = ((now - st[_S_LAST_ZC] + 0x20000000) & 0x3FFFFFFF) - 0x20000000
+    if dt <= st[_S_DEBOUNCE]:
+        return 0
+    st[_S_LAST_ZC] = now
+    if count < _MIN_HISTORY:
+        return 0
+    # Pic: max > max(seuil, moyenne + écart-type)
+    m = st[_S_RING]
+    i = 1
+    while i < count:
+        if st[_S_RING + i] > m:
+            m = st[_S_RING + i]
+        i += 1
+    if m <= st[_S_THRESHOLD]:
+        return 0
+    s = st[_S_SUM]
+    d = count * m - s
+    if d <= 0:
+        return 0
+    if d * d > count * st[_S_SUMSQ] - s * s:
+        return 1
+    return 0
+
+
+class FixedStepDetector(AdvancedStepDetector):
+    """
+    AdvancedStepDetector alimenté par les comptes bruts (update_raw)
+
+    Le runtime passe directement son anneau d'échantillons int16; seuls
+    les pas candidats (quelques par seconde) repassent par Python et par
+    des flottants (fréquence, calories).
+    """
+
+    def __init__(self, step_length=0.7, user_weight=70, accel_scale=16384):
+        """
+        Args:
+            accel_scale: comptes par g du MPU (ACCEL_SCALE, puissance de 2)
+        """
+        super().__init__(step_length, user_weight)
+        self.accel_scale = accel_scale
+        self._st = array('l', [0] * _S_SIZE)
+        self._one = array('h', [0, 0, 0])
+        self._reset_state()
+
+    def _reset_state(self):
+        st = self._st
+        for i in range(_S_SIZE):
+            st[i] = 0
+        # (accel_scale >> _SHIFT) comptes décalés par g, puissance de 2:
+        # conversion en mg exacte par multiplication
+        st[_S_K] = (1000 << 16) // (self.accel_scale >> _SHIFT)
+        st[_S_PREV] = 16000  # comme prev_accel = 1.0
+        st[_S_DEBOUNCE] = self.debounce_ms
+        st[_S_THRESHOLD] = int(self.peak_threshold * 1000)
+
+    @micropython.native
+    def update_raw(self, raw, j, now):
+        """
+        Detecte un pas à partir des comptes bruts
+
+        Args:
+            raw: array('h') contenant ax, ay, az aux indices j, j + 1, j + 2
+            now: Horodatage ticks_ms de l'echantillon
+
+        Returns:
+            bool: True si un pas est detecte
+        """
+        if _fixed_update(raw, j, self._st, now) and self._check_frequency():
+            self.step_count += 1
+            self.step_times.push(now)
+            self._update_calories()
+            return True
+        return False
+
+    def update(self, magnitude, now=None):
+        """Compatibilité: magnitude en g (sans les comptes bruts)"""
+        if now is None:
+            now = time.ticks_ms()
+        c = int(magnitude * self.accel_scale)
+        self._one[2] = 32767 if c > 32767 else c
+        return self.update_raw(self._one, 0, now)
+
+    def reset(self):
+        """Réinitialise tous les compteurs"""
+        super().reset()
+        self._reset_state()
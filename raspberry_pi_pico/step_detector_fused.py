@@ -0,0 +1,238 @@
+"""
+Détecteur de pas fusionné accéléromètre + gyroscope
+Filtre complémentaire d'orientation (accélération verticale) + phase du
+balancier de la jambe (vitesse angulaire)
+
+Un pas candidat (passage par zéro de l'accélération verticale, pic
+validé, fréquence plausible comme AdvancedStepDetector) n'est compté que
+si le gyroscope montre un balancier: rotation horizontale d'amplitude
+suffisante dont la phase s'inverse d'un pas au suivant (une oscillation
+de la jambe par foulée de 2 pas). Les gestes des bras (rotation à la
+fréquence des « pas », même phase à chaque pas) et les vibrations (pas
+de rotation) sont rejetés.
+
+Coût: ~40 opérations flottantes et 2 racines carrées par échantillon,
+sans allocation de tampon; budget sur le Pico: BUDGET_US par échantillon
+(micro-benchmark: tools/bench_detectors.py --emit-micro).
+"""
+import math
+import time
+from step_detector_advanced import AdvancedStepDetector
+
+DEG2RAD = math.pi / 180.0
+# Budget de update_imu() sur le Pico à 125 MHz (µs par échantillon):
+# 2 % de la période d'acquisition à 20 Hz
+BUDGET_US = 1000
+# Au-delà, le pas candidat précédent est trop ancien pour juger la phase
+MAX_STEP_MS = 1000
+# Trou d'acquisition (veille, retard): pas de prédiction gyro au-delà
+MAX_DT_S = 0.2
+
+
+class FusedStepDetector(AdvancedStepDetector):
+    """
+    AdvancedStepDetector alimenté par les 6 axes (update_imu)
+
+    uses_gyro: le runtime lui passe accéléromètre et gyroscope, et le
+    gestionnaire d'énergie garde le gyroscope actif. Sans gyroscope,
+    update(magnitude) reste celui d'AdvancedStepDetector.
+    """
+
+    uses_gyro = True
+
+    def __init__(self, step_length=0.7, user_weight=70, alpha=0.02,
+                 swing_min_dps=15.0, axis_rate=0.002):
+        """
+        Args:
+            alpha: poids de l'accéléromètre dans le filtre complémentaire
+                (par échantillon; 0.02 à 20 Hz: constante de temps ~2,5 s)
+            swing_min_dps: amplitude minimale du balancier (°/s)
+            axis_rate: vitesse d'adaptation de l'axe du balancier
+        """
+        super().__init__(step_length, user_weight)
+        self.alpha = alpha
+        self.swing_min = swing_min_dps
+        self.axis_rate = axis_rate
+        self._reset_orientation()
+
+    def _reset_orientation(self):
+        # Direction de la gravité dans le repère du capteur (unitaire)
+        self._gx = 0.0
+        self._gy = 0.0
+        self._gz = 1.0
+        self._prev_t = None
+        # Axe horizontal du balancier (unitaire, suivi en continu)
+        self._ux = 1.0
+        self._uy = 0.0
+        self._uz = 0.0
+        self._reset_swing()
+
+    def _reset_swing(self):
+        # Angle parcouru (°) sur chaque moitié de l'intervalle entre pas
+        # candidats; moitié estimée sur l'intervalle précédent
+        self._last_candidate = None
+        self._before = None
+        self._in_gait = False
+        self._half_ms = 300
+        self._first = 0.0
+        self._second = 0.0
+        # Même mesure sur l'intervalle précédent (°/s)
+        self._prev_first = 0.0
+        self._prev_second = 0.0
+
+    def update_imu(self, ax, ay, az, wx, wy, wz, now=None):
+        """
+        Detecte un pas à partir d'un échantillon 6 axes
+
+        Args:
+            ax, ay, az: accélération (g)
+            wx, wy, wz: vitesse angulaire (°/s)
+            now: Horodatage ticks_ms de l'echantillon (par defaut: maintenant)
+
+        Returns:
+            bool: True si un pas est detecte
+        """
+        if now is None:
+            now = time.ticks_ms()
+        gx = self._gx
+        gy = self._gy
+        gz = self._gz
+        prev = self._prev_t
+        self._prev_t = now
+        if prev is None:
+            # Premier échantillon: la gravité est l'accélération mesurée
+            gx, gy, gz = ax, ay, az
+            dt = 0.0
+        else:
+            dt = time.ticks_diff(now, prev) / 1000.0
+            if dt > MAX_DT_S:
+                dt = 0.0
+            # Prédiction: le capteur tourne de w.dt, la gravité (fixe dans
+            # le monde) tourne de -w.dt dans son repère: g -= (w x g).dt
+            r = dt * DEG2RAD
+            cx = wy * gz - wz * gy
+            cy = wz * gx - wx * gz
+            cz = wx * gy - wy * gx
+            gx -= r * cx
+            gy -= r * cy
+            gz -= r * cz
+            # Correction lente par l'accéléromètre (dérive du gyroscope)
+            a = self.alpha
+            gx += a * (ax - gx)
+            gy += a * (ay - gy)
+            gz += a * (az - gz)
+        n = math.sqrt(gx * gx + gy * gy + gz * gz)
+        if n > 0:
+            gx /= n
+            gy /= n
+            gz /= n
+        self._gx = gx
+        self._gy = gy
+        self._gz = gz
+
+        # Accélération verticale dynamique (gravité retirée)
+        vertical = ax * gx + ay * gy + az * gz - 1.0
+
+        # Rotation horizontale projetée sur l'axe du balancier; l'axe suit
+        # la direction dominante (itération de puissance, signe aligné)
+        wv = wx * gx + wy * gy + wz * gz
+        hx = wx - wv * gx
+        hy = wy - wv * gy
+        hz = wz - wv * gz
+        ux = self._ux
+        uy = self._uy
+        uz = self._uz
+        swing = hx * ux + hy * uy + hz * uz
+        k = self.axis_rate if swing >= 0 else -self.axis_rate
+        ux += k * hx
+        uy += k * hy
+        uz += k * hz
+        n = math.sqrt(ux * ux + uy * uy + uz * uz)
+        if n > 0:
+            self._ux = ux / n
+            self._uy = uy / n
+            self._uz = uz / n
+        last = self._last_candidate
+        if last is not None and time.ticks_diff(now, last) < self._half_ms:
+            self._first += swing * dt
+        else:
+            self._second += swing * dt
+
+        self.accel_history.push(abs(vertical))
+
+        step_detected = False
+        if self._detect_zero_crossing(vertical, now):
+            # La phase est mise à jour à chaque candidat, même rejeté
+            before = self._before
+            previous = self._last_candidate
+            swing_ok = self._swing_phase(now)
+            if swing_ok and self._validate_peak(vertical, now) and self._check_frequency():
+                if not self._in_gait:
+                    # Reprise confirmée: compter aussi les pas qui ont
+                    # servi de référence (le premier n'a pas d'intervalle)
+                    if before is not None and time.ticks_diff(previous, before) <= MAX_STEP_MS:
+                        self.step_count += 1
+                        self.step_times.push(before)
+                    self.step_count += 1
+                    self.step_times.push(previous)
+                    self._in_gait = True
+                self.step_count += 1
+                self.step_times.push(now)
+                step_detected = True
+                self._update_calories()
+            elif not swing_ok:
+                self._in_gait = False
+
+        self.prev_accel = vertical
+        return step_detected
+
+    def _swing_phase(self, now):
+        """
+        Vérifie le balancier entre deux pas candidats
+
+        Signature de l'intervalle: angle parcouru sur chaque moitié,
+        ramené en °/s. Le balancier (une oscillation par foulée) change
+        de signe d'un pas au suivant quelle que soit sa phase au moment
+        du pas; une rotation à la fréquence des pas garde la même
+        signature, le bruit n'atteint pas l'amplitude minimale.
+        Il faut deux intervalles pour juger: les pas qui servent de
+        référence à une reprise sont comptés à sa confirmation (update_imu).
+        """
+        last = self._last_candidate
+        self._before = last
+        self._last_candidate = now
+        first = self._first
+        second = self._second
+        self._first = 0.0
+        self._second = 0.0
+        prev_first = self._prev_first
+        prev_second = self._prev_second
+        period_ms = 0 if last is None else time.ticks_diff(now, last)
+        if 0 < period_ms <= MAX_STEP_MS:
+            first = first * 1000.0 / period_ms
+            second = second * 1000.0 / period_ms
+            self._half_ms = period_ms // 2
+        else:
+            # Reprise après un arrêt: pas d'intervalle à comparer
+            first = second = 0.0
+        self._prev_first = first
+        self._prev_second = second
+        min2 = self.swing_min * self.swing_min
+        amp2 = first * first + second * second
+        prev2 = prev_first * prev_first + prev_second * prev_second
+        if amp2 < min2 or prev2 < min2:
+            return False
+        # Balancier régulier: amplitudes voisines (rapport < 2), signes opposés
+        if amp2 > 4 * prev2 or prev2 > 4 * amp2:
+            return False
+        return first * prev_first + second * prev_second < 0
+
+    def reset(self):
+        """Réinitialise tous les compteurs et l'orientation"""
+        super().reset()
+        self._reset_orientation()
+
+    def pause(self):
+        """Pause d'activité: fenêtre des pas et phase du balancier oubliées"""
+        super().pause()
+        self._reset_swing()
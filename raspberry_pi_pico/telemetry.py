@@ -0,0 +1,434 @@
+"""
+Trames de télémétrie envoyées au téléphone
+Format binaire compact (struct.pack_into dans un tampon préalloué)
+avec repli sur le JSON historique (délimité par '\n'), trames delta
+et filtre d'envoi « sur changement »
+"""
+import json
+import struct
+import time
+
+# Formats négociés par le téléphone (écriture sur la caractéristique RX)
+FORMAT_JSON = 0
+FORMAT_BINARY = 1
+FORMAT_DELTA = 2
+
+# Commande RX: [CMD_SET_FORMAT, format]
+CMD_SET_FORMAT = 0x01
+
+# Trame v1 (little-endian, 31 octets):
+#   version u8 | seq u8 | steps u32 | speed u16 (cm/s) | distance u32 (cm)
+#   calories u16 (0.1 kcal) | cadence u16 (0.1 pas/min) | activity u8
+#   temp i16 (0.01 °C) | accel 3×i16 (brut, 16384/g) | gyro 3×i16 (brut, 131/°/s)
+# Le premier octet (0x01) ne peut pas être confondu avec le '{' du JSON.
+# Avec un MTU par défaut (23) la trame est découpée en 2 notifications:
+# le récepteur la réassemble grâce à sa longueur fixe FRAME_SIZE.
+FRAME_VERSION = 1
+_FRAME_FMT = '<BBIHIHHBh6h'
+FRAME_SIZE = struct.calcsize(_FRAME_FMT)
+
+ACCEL_SCALE = 16384.0
+GYRO_SCALE = 131.0
+
+# Trame delta v2 (FORMAT_DELTA, longueur variable, little-endian):
+#   version u8 (0x02) | seq u8 | base u8 | mask u16 | écarts
+# base est le seq de la trame complète v1 acquittée par le téléphone
+# (commande ACK_SNAPSHOT, voir commands.py). Le bit i de mask indique que
+# le champ FIELDS[i] a changé; son écart à la référence suit, en varint
+# zigzag. accel/gyro sont comparés à 2^DELTA_RAW_SHIFT LSB près (0,004 g,
+# 0,5 °/s). Chaque trame ne dépend que de la référence: une trame perdue
+# n'altère pas les suivantes. Les trames v1 et v2 partagent le compteur seq.
+DELTA_VERSION = 2
+DELTA_HEADER_SIZE = 5
+DELTA_RAW_SHIFT = 6
+
+# Champs des trames en unités entières (ordre de la trame v1)
+FIELDS = ("steps", "speed", "distance", "calories", "cadence", "activity",
+          "temp", "ax", "ay", "az", "gx", "gy", "gz")
+_RAW_FIRST = 7
+
+# Seuils par défaut du mode « sur changement » (index dans FIELDS -> écart
+# en unités de la trame): vitesse 0,1 m/s, cadence 5 pas/min, activité,
+# température 0,5 °C. Les pas déclenchent l'envoi à chaque pas détecté;
+# accel/gyro (échantillons instantanés) ne déclenchent rien par défaut.
+DEFAULT_DELTAS = {1: 10, 4: 50, 5: 1, 6: 50}
+
+# Types d'activité (index = code envoyé dans la trame)
+ACTIVITIES = ("Immobile", "Marche lente", "Marche", "Marche rapide", "Course")
+
+# Caractéristiques GATT par groupe de métriques (ble_pedometer.py), valeurs
+# fixes little-endian lues ou notifiées séparément, unités de la trame v1:
+#   pas:        steps u32
+#   activité:   speed u16 | distance u32 | calories u16 | cadence u16 | activity u8
+#   mouvement:  temp i16 | accel 3×i16 | gyro 3×i16
+GROUP_STEPS = 0
+GROUP_ACTIVITY = 1
+GROUP_MOTION = 2
+GROUP_FMTS = ('<I', '<HIHHB', '<h6h')
+# Champs de chaque groupe (tranche de FIELDS)
+GROUP_FIELDS = ((0, 1), (1, 6), (6, 13))
+
+# RSC Measurement (0x2A53, profil Running Speed and Cadence du Bluetooth SIG):
+#   flags u8 | speed u16 (1/256 m/s) | cadence u8 (pas/min)
+#   | stride u16 (cm, entre deux appuis) | distance totale u32 (dm)
+RSC_FMT = '<BHBHI'
+RSC_STRIDE_PRESENT = 0x01
+RSC_DISTANCE_PRESENT = 0x02
+RSC_RUNNING = 0x04
+# RSC Feature (0x2A54): longueur de foulée, distance, statut marche / course
+RSC_FEATURES = 0x0007
+
+
+def activity_code(name):
+    """Code numérique d'un type d'activité (Marche si inconnu)"""
+    try:
+        return ACTIVITIES.index(name)
+    except ValueError:
+        return 2
+
+
+def _u16(v):
+    v = int(round(v))
+    return 0 if v < 0 else 0xFFFF if v > 0xFFFF else v
+
+
+def _u32(v):
+    v = int(round(v))
+    return 0 if v < 0 else 0xFFFFFFFF if v > 0xFFFFFFFF else v
+
+
+def _i16(v):
+    v = int(round(v))
+    return -32768 if v < -32768 else 32767 if v > 32767 else v
+
+
+def scaled(steps, speed, distance, calories, cadence, activity,
+           temp, ax, ay, az, gx, gy, gz):
+    """
+    Returns:
+        tuple: valeurs entières de la trame v1 (ordre de FIELDS)
+    """
+    return (_u32(steps), _u16(speed * 100), _u32(distance * 100),
+            _u16(calories * 10), _u16(cadence * 10), activity,
+            _i16(temp * 100), ax, ay, az, gx, gy, gz)
+
+
+class TelemetryEncoder:
+    """Encode les métriques dans un tampon réutilisé (pas d'allocation de trame)"""
+    
+    def __init__(self):
+        self.buf = bytearray(FRAME_SIZE)
+        self.seq = 0
+    
+    def encode(self, steps, speed, distance, calories, cadence, activity,
+               temp, ax, ay, az, gx, gy, gz):
+        """
+        Args:
+            activity: code d'activité (index dans ACTIVITIES)
+            ax..gz: valeurs brutes int16 du MPU
+            
+        Returns:
+            bytearray: la trame (toujours le même tampon)
+        """
+        return self.pack(scaled(steps, speed, distance, calories, cadence, activity,
+                                temp, ax, ay, az, gx, gy, gz))
+    
+    def pack(self, values):
+        """Trame v1 à partir des valeurs entières (scaled())"""
+        struct.pack_into(_FRAME_FMT, self.buf, 0, FRAME_VERSION, self.seq, *values)
+        self.seq = (self.seq + 1) & 0xFF
+        return self.buf
+
+
+def pack_group(buf, group, values):
+    """Valeur de la caractéristique d'un groupe (values: scaled())"""
+    first, last = GROUP_FIELDS[group]
+    struct.pack_into(GROUP_FMTS[group], buf, 0, *values[first:last])
+
+
+def pack_rsc(buf, values, stride_cm):
+    """
+    RSC Measurement à partir des valeurs entières (scaled())
+
+    Args:
+        stride_cm: longueur de pas du profil (cm)
+    """
+    flags = RSC_STRIDE_PRESENT | RSC_DISTANCE_PRESENT
+    if values[5] == len(ACTIVITIES) - 1:
+        flags |= RSC_RUNNING
+    cadence = (values[4] + 5) // 10
+    struct.pack_into(RSC_FMT, buf, 0, flags, _u16(values[1] * 256 // 100),
+                     0xFF if cadence > 0xFF else cadence, _u16(stride_cm), values[2] // 10)
+
+
+class DeltaEncoder:
+    """
+    Trames delta par rapport à la dernière trame complète acquittée
+    
+    Tant qu'aucune référence n'est acquittée, ou quand les écarts
+    dépassent rebase_size octets (distance et pas qui augmentent), une
+    trame complète v1 part à la place; le téléphone l'acquitte (ack) et
+    elle devient la nouvelle référence.
+    """
+    
+    def __init__(self, rebase_size=24):
+        self.full = TelemetryEncoder()
+        self.rebase_size = rebase_size
+        # Pire cas: 13 varints de 5 octets
+        self.buf = bytearray(DELTA_HEADER_SIZE + 5 * len(FIELDS))
+        self.base = None
+        self.base_seq = 0
+        self._pending = None  # (seq, valeurs) trame complète non acquittée
+        self.keyframes = 0
+        self.deltas = 0
+    
+    def reset(self):
+        """Nouvelle connexion: plus de référence"""
+        self.base = None
+        self._pending = None
+    
+    def ack(self, seq):
+        """
+        Acquittement d'une trame complète par le téléphone
+        
+        Returns:
+            bool: True si seq était la trame complète en attente
+        """
+        pending = self._pending
+        if pending is None or pending[0] != seq:
+            return False
+        self.base_seq, self.base = pending
+        self._pending = None
+        return True
+    
+    def encode(self, values):
+        """
+        Args:
+            values: valeurs entières (scaled())
+            
+        Returns:
+            trame delta (memoryview) ou complète v1 (bytearray), tampons réutilisés
+        """
+        if self.base is not None:
+            n = self._encode_delta(values)
+            if n:
+                return memoryview(self.buf)[:n]
+        seq = self.full.seq
+        self._pending = (seq, values)
+        self.keyframes += 1
+        return self.full.pack(values)
+    
+    def _encode_delta(self, values):
+        buf = self.buf
+        base = self.base
+        limit = self.rebase_size
+        mask = 0
+        n = DELTA_HEADER_SIZE
+        for i in range(len(FIELDS)):
+            if i < _RAW_FIRST:
+                d = values[i] - base[i]
+            else:
+                d = (values[i] >> DELTA_RAW_SHIFT) - (base[i] >> DELTA_RAW_SHIFT)
+            if not d:
+                continue
+            mask |= 1 << i
+            z = d + d if d > 0 else -d - d - 1
+            while True:
+                if n >= limit:
+                    return 0
+                if z < 0x80:
+                    buf[n] = z
+                    n += 1
+                    break
+                buf[n] = (z & 0x7F) | 0x80
+                z >>= 7
+                n += 1
+        buf[0] = DELTA_VERSION
+        buf[1] = self.full.seq
+        buf[2] = self.base_seq
+        buf[3] = mask & 0xFF
+        buf[4] = mask >> 8
+        self.full.seq = (self.full.seq + 1) & 0xFF
+        self.deltas += 1
+        return n
+
+
+class ChangeFilter:
+    """
+    Décide de l'envoi en mode « sur changement »
+    
+    Envoi quand un pas a été détecté depuis le dernier envoi (step(),
+    branché sur on_step du runtime), quand un champ s'écarte de la
+    dernière valeur envoyée d'au moins son seuil, ou au battement de cœur
+    (heartbeat_ms) pour que le téléphone sache le lien vivant.
+    Désactivé (enabled = False), tout est envoyé: mode périodique.
+    """
+    
+    def __init__(self, deltas=None, heartbeat_ms=5000, enabled=True):
+        self.deltas = dict(DEFAULT_DELTAS if deltas is None else deltas)
+        self.heartbeat_ms = heartbeat_ms
+        self.enabled = enabled
+        self._step = False
+        self._last = None
+        self._last_ms = 0
+        self.suppressed = 0
+    
+    def step(self, runtime=None):
+        """Pas détecté (valeur de retour de update(), via on_step)"""
+        self._step = True
+    
+    def reset(self):
+        """Le prochain appel à due() renvoie True"""
+        self._last = None
+    
+    def due(self, values, now=None):
+        """
+        Args:
+            values: valeurs entières (scaled())
+            
+        Returns:
+            bool: True si la télémétrie doit partir maintenant
+        """
+        last = self._last
+        if not self.enabled or last is None or self._step or values[0] != last[0]:
+            return True
+        if now is None:
+            now = time.ticks_ms()
+        if time.ticks_diff(now, self._last_ms) >= self.heartbeat_ms:
+            return True
+        for i, delta in self.deltas.items():
+            if abs(values[i] - last[i]) >= delta:
+                return True
+        self.suppressed += 1
+        return False
+    
+    def sent(self, values, now=None):
+        """Mémorise les valeurs envoyées"""
+        self._last = values
+        self._last_ms = time.ticks_ms() if now is None else now
+        self._step = False
+
+
+def encode_json(steps, speed, distance, calories, cadence, activity,
+                temp, ax, ay, az, gx, gy, gz):
+    """Message JSON historique (format attendu par l'application Flutter)"""
+    return json.dumps({
+        "steps": steps,
+        "speed": round(speed, 2),
+        "distance": round(distance, 2),
+        "calories": round(calories, 1),
+        "cadence": round(cadence, 1),
+        "activity": ACTIVITIES[activity],
+        "temp": round(temp, 1),
+        "accel": {
+            "x": round(ax / ACCEL_SCALE, 2),
+            "y": round(ay / ACCEL_SCALE, 2),
+            "z": round(az / ACCEL_SCALE, 2)
+        },
+        "gyro": {
+            "x": round(gx / GYRO_SCALE, 2),
+            "y": round(gy / GYRO_SCALE, 2),
+            "z": round(gz / GYRO_SCALE, 2)
+        }
+    }) + "\n"
+
+
+def decode_values(frame):
+    """
+    Valeurs entières d'une trame v1 (référence des trames delta)
+    
+    Returns:
+        tuple: (seq, valeurs dans l'ordre de FIELDS)
+    """
+    if len(frame) < FRAME_SIZE or frame[0] != FRAME_VERSION:
+        raise ValueError("trame de télémétrie invalide")
+    fields = struct.unpack_from(_FRAME_FMT, frame, 0)
+    return fields[1], fields[2:]
+
+
+def decode_delta(frame, base):
+    """
+    Décodeur de référence d'une trame delta (côté hôte / tests)
+    
+    Args:
+        base: valeurs de la trame complète de référence (decode_values)
+        
+    Returns:
+        tuple: (seq, base_seq, valeurs dans l'ordre de FIELDS, longueur lue)
+    """
+    if len(frame) < DELTA_HEADER_SIZE or frame[0] != DELTA_VERSION:
+        raise ValueError("trame delta invalide")
+    seq, base_seq = frame[1], frame[2]
+    mask = frame[3] | (frame[4] << 8)
+    values = list(base)
+    n = DELTA_HEADER_SIZE
+    for i in range(len(FIELDS)):
+        if not mask & (1 << i):
+            continue
+        z = shift = 0
+        while True:
+            b = frame[n]
+            n += 1
+            z |= (b & 0x7F) << shift
+            shift += 7
+            if b < 0x80:
+                break
+        d = z >> 1 if not z & 1 else -(z >> 1) - 1
+        if i < _RAW_FIRST:
+            values[i] = base[i] + d
+        else:
+            values[i] = ((base[i] >> DELTA_RAW_SHIFT) + d) << DELTA_RAW_SHIFT
+    return seq, base_seq, tuple(values), n
+
+
+def decode(frame):
+    """
+    Décodeur de référence (côté hôte / tests)
+    
+    Returns:
+        dict: mêmes clés que le message JSON, plus 'seq'
+    """
+    seq, values = decode_values(frame)
+    return values_dict(seq, values)
+
+
+def values_dict(seq, values):
+    """Valeurs entières -> dict aux clés du message JSON, plus 'seq'"""
+    (steps, speed, distance, calories, cadence, activity, temp,
+     ax, ay, az, gx, gy, gz) = values
+    return {
+        "seq": seq,
+        "steps": steps,
+        "speed": speed / 100,
+        "distance": distance / 100,
+        "calories": calories / 10,
+        "cadence": cadence / 10,
+        "activity": ACTIVITIES[activity] if activity < len(ACTIVITIES) else "Marche",
+        "temp": temp / 100,
+        "accel": {"x": ax / ACCEL_SCALE, "y": ay / ACCEL_SCALE, "z": az / ACCEL_SCALE},
+        "gyro": {"x": gx / GYRO_SCALE, "y": gy / GYRO_SCALE, "z": gz / GYRO_SCALE},
+    }
+
+
+def decode_rsc(data):
+    """
+    Décodeur de référence d'une RSC Measurement (côté hôte / tests)
+
+    Returns:
+        dict: speed (m/s), cadence (pas/min), running, stride (m) et
+        distance (m) si présents
+    """
+    flags, speed, cadence = struct.unpack_from('<BHB', data, 0)
+    out = {'speed': speed / 256, 'cadence': cadence, 'running': bool(flags & RSC_RUNNING)}
+    n = 4
+    if flags & RSC_STRIDE_PRESENT:
+        out['stride'] = struct.unpack_from('<H', data, n)[0] / 100
+        n += 2
+    if flags & RSC_DISTANCE_PRESENT:
+        out['distance'] = struct.unpack_from('<I', data, n)[0] / 10
+    return out
+
+
+def decode_group(group, data):
+    """Valeurs entières d'une caractéristique de groupe (ordre de FIELDS)"""
+    return struct.unpack_from(GROUP_FMTS[group], data, 0)
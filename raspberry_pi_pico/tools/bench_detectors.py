@@ -0,0 +1,299 @@
+"""
+Banc d'essai des détecteurs de pas (CPython)
+Rejoue des traces étiquetées dans chaque détecteur et mesure:
+- débit (échantillons/s) et latence de update() (p50/p90/p99/max);
+  les détecteurs 6 axes (uses_gyro) reçoivent accel + gyro par update_imu(),
+  le détecteur en virgule fixe les comptes bruts int16 par update_raw()
+- mémoire (pic tracemalloc, octets conservés par échantillon)
+- erreur sur le nombre de pas, faux positifs et pas manqués
+
+Utilisation (depuis la racine du dépôt):
+    python raspberry_pi_pico/tools/bench_detectors.py
+    python raspberry_pi_pico/tools/bench_detectors.py --csv marche.csv --steps 412
+    python raspberry_pi_pico/tools/bench_detectors.py --emit-micro bench_device.py
+
+Le script émis avec --emit-micro se copie sur le Pico (ampy put) avec
+step_detector.py, step_detector_advanced.py, step_detector_fused.py,
+step_detector_fixed.py et ring_buffer.py, et mesure le coût de update()
+sur le matériel (ticks_us, gc.mem_alloc), comparé au budget du détecteur
+fusionné (BUDGET_US).
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+from array import array
+
+FIRMWARE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if FIRMWARE_DIR not in sys.path:
+    sys.path.insert(0, FIRMWARE_DIR)
+
+import sim  # noqa: E402  time.ticks_* pour les détecteurs
+from sim import traces  # noqa: E402
+
+sim.install()
+
+from step_detector import StepDetector  # noqa: E402
+from step_detector_advanced import AdvancedStepDetector  # noqa: E402
+from step_detector_fixed import FixedStepDetector  # noqa: E402
+from step_detector_fused import FusedStepDetector  # noqa: E402
+
+# Détecteurs comparés: nom -> fabrique (ajouter ici les nouveaux détecteurs)
+DETECTORS = {
+    'simple': lambda: StepDetector(step_length=0.7),
+    'advanced': lambda: AdvancedStepDetector(step_length=0.7),
+    'fused': lambda: FusedStepDetector(step_length=0.7),
+    'fixed': lambda: FixedStepDetector(step_length=0.7),
+}
+
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def _feed(detector, samples):
+    """
+    Entrées du détecteur, préparées hors mesure: (update, arguments)
+
+    samples: (t_ms, ax, ay, az, gx, gy, gz) en g et °/s
+    """
+    if hasattr(detector, 'update_raw'):
+        # Comptes bruts int16, comme l'anneau du runtime
+        raw = array('h', [max(-32768, min(32767, int(round(v * traces.ACCEL_SCALE))))
+                          for s in samples for v in s[1:4]])
+        return detector.update_raw, [(raw, 3 * i, s[0]) for i, s in enumerate(samples)]
+    if getattr(detector, 'uses_gyro', False):
+        return detector.update_imu, [(ax, ay, az, gx, gy, gz, t)
+                                     for t, ax, ay, az, gx, gy, gz in samples]
+    return detector.update, [(math.sqrt(ax * ax + ay * ay + az * az), t)
+                             for t, ax, ay, az, _, _, _ in samples]
+
+
+def replay(factory, samples):
+    """
+    Rejoue une trace dans un détecteur neuf
+
+    Returns:
+        tuple: (pas détectés, latences update() en ns)
+    """
+    detector = factory()
+    update, inputs = _feed(detector, samples)
+    clock = time.perf_counter_ns
+    latencies = [0] * len(inputs)
+    for i, args in enumerate(inputs):
+        t0 = clock()
+        update(*args)
+        latencies[i] = clock() - t0
+    # step_count: un détecteur peut compter plusieurs pas d'un coup
+    return detector.step_count, latencies
+
+
+def measure_memory(factory, samples):
+    """
+    Mémoire pendant un rejeu (passe séparée: tracemalloc ralentit)
+
+    Returns:
+        tuple: (pic en octets, octets conservés par échantillon)
+    """
+    detector = factory()
+    update, inputs = _feed(detector, samples)
+    tracemalloc.start()
+    try:
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for args in inputs:
+            update(*args)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - base, (current - base) / max(1, len(samples))
+
+
+def bench(trace, name, factory, rate_hz, samples=None):
+    """samples: échantillons déjà tirés de la trace (mêmes entrées pour chaque détecteur)"""
+    if samples is None:
+        samples = list(trace.samples(rate_hz))
+    steps, latencies = replay(factory, samples)
+    latencies.sort()
+    total_s = sum(latencies) / 1e9
+    peak, retained = measure_memory(factory, samples)
+    truth = trace.steps
+    result = {
+        'trace': trace.name,
+        'detector': name,
+        'samples': len(samples),
+        'samples_per_s': len(samples) / total_s if total_s else 0.0,
+        'p50_us': _percentile(latencies, 50) / 1000,
+        'p90_us': _percentile(latencies, 90) / 1000,
+        'p99_us': _percentile(latencies, 99) / 1000,
+        'max_us': latencies[-1] / 1000 if latencies else 0.0,
+        'peak_bytes': peak,
+        'retained_bytes_per_sample': retained,
+        'steps': steps,
+        'truth': truth,
+    }
+    if truth is not None:
+        # Comptage: les pas en trop sont des faux positifs, en moins des manqués
+        result['error_pct'] = 100.0 * (steps - truth) / truth if truth else None
+        result['false_positives'] = max(0, steps - truth)
+        result['missed'] = max(0, truth - steps)
+    return result
+
+
+def print_table(results):
+    header = ("%-15s %-9s %9s %8s %8s %8s %8s %7s %7s %9s %6s %6s" %
+              ("trace", "détecteur", "éch/s", "p50 µs", "p99 µs", "max µs",
+               "pic o", "o/éch", "pas", "réel", "err %", "FP"))
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        err = r.get('error_pct')
+        print("%-15s %-9s %9.0f %8.2f %8.2f %8.2f %8d %7.2f %7d %9s %6s %6s" % (
+            r['trace'], r['detector'], r['samples_per_s'], r['p50_us'], r['p99_us'],
+            r['max_us'], r['peak_bytes'], r['retained_bytes_per_sample'], r['steps'],
+            '-' if r['truth'] is None else r['truth'],
+            '-' if err is None else "%+.1f" % err,
+            r.get('false_positives', '-')))
+    # Coût moyen par échantillon, toutes traces, relatif au détecteur avancé
+    cost = {}
+    for r in results:
+        n, total = cost.get(r['detector'], (0, 0.0))
+        cost[r['detector']] = (n + r['samples'], total + r['samples'] / r['samples_per_s'])
+    ref = cost.get('advanced')
+    print()
+    for name, (n, total) in sorted(cost.items()):
+        print("%-9s %6.2f µs/éch%s" % (name, 1e6 * total / n,
+              "  (x%.1f avancé)" % ((total / n) / (ref[1] / ref[0])) if ref else ""))
+
+
+# ---------- Micro-benchmark MicroPython ----------
+
+_MICRO_TEMPLATE = '''"""
+Micro-benchmark des détecteurs de pas sur le Pico (généré par
+tools/bench_detectors.py --emit-micro, ne pas modifier)
+Copier avec step_detector.py, step_detector_advanced.py,
+step_detector_fused.py, step_detector_fixed.py et ring_buffer.py
+"""
+import gc
+import math
+import time
+from array import array
+
+from step_detector import StepDetector
+from step_detector_advanced import AdvancedStepDetector
+from step_detector_fused import FusedStepDetector, BUDGET_US
+from step_detector_fixed import FixedStepDetector
+
+# Trace %(trace)s à %(rate)d Hz (%(truth)s pas réels): accel x, y, z en
+# milli-g et gyro x, y, z en 0,1 °/s, entrelacés
+RATE_MS = %(period)d
+ACC_MG = array('h', %(acc)r)
+GYR_DDPS = array('h', %(gyr)r)
+
+
+def bench(name, detector):
+    n = len(ACC_MG) // 3
+    fused = getattr(detector, 'uses_gyro', False)
+    # Entrées préparées hors mesure
+    if hasattr(detector, 'update_raw'):
+        # Comptes bruts int16 (±2 g: 16384 par g)
+        raw = array('h', [v * 16384 // 1000 for v in ACC_MG])
+        inputs = [(raw, 3 * i) for i in range(n)]
+        update = detector.update_raw
+    elif fused:
+        inputs = [(ACC_MG[3 * i] / 1000, ACC_MG[3 * i + 1] / 1000, ACC_MG[3 * i + 2] / 1000,
+                   GYR_DDPS[3 * i] / 10, GYR_DDPS[3 * i + 1] / 10, GYR_DDPS[3 * i + 2] / 10)
+                  for i in range(n)]
+        update = detector.update_imu
+    else:
+        inputs = [(math.sqrt(ACC_MG[3 * i] ** 2 + ACC_MG[3 * i + 1] ** 2 +
+                             ACC_MG[3 * i + 2] ** 2) / 1000,) for i in range(n)]
+        update = detector.update
+    lat = array('l', [0] * n)
+    t = 0
+    gc.collect()
+    gc.disable()
+    before = gc.mem_alloc()
+    for i in range(n):
+        args = inputs[i]
+        t0 = time.ticks_us()
+        update(*args, t)
+        lat[i] = time.ticks_diff(time.ticks_us(), t0)
+        t += RATE_MS
+    allocated = gc.mem_alloc() - before
+    gc.enable()
+    total = 0
+    for v in lat:
+        total += v
+    s = sorted(lat)
+    print("%%-9s %%6d éch  %%7.1f µs moy  p50 %%5d  p99 %%5d  max %%5d  %%6.1f o/éch  %%d pas%%s" %% (
+        name, n, total / n, s[n // 2], s[(n * 99) // 100], s[-1], allocated / n,
+        detector.step_count,
+        ("  budget %%d µs: %%s" %% (BUDGET_US, "OK" if s[(n * 99) // 100] <= BUDGET_US else "DÉPASSÉ"))
+        if fused else ""))
+
+
+print("Fréquence CPU:", __import__('machine').freq())
+bench("simple", StepDetector())
+bench("advanced", AdvancedStepDetector())
+bench("fused", FusedStepDetector())
+bench("fixed", FixedStepDetector())
+'''
+
+
+def emit_micro(path, trace, rate_hz):
+    """Écrit le micro-benchmark MicroPython avec la trace embarquée"""
+    acc = []
+    gyr = []
+    for _, ax, ay, az, gx, gy, gz in trace.samples(rate_hz):
+        acc.extend(int(round(v * 1000)) for v in (ax, ay, az))
+        gyr.extend(int(round(v * 10)) for v in (gx, gy, gz))
+    with open(path, 'w') as f:
+        f.write(_MICRO_TEMPLATE % {
+            'trace': trace.name, 'rate': rate_hz, 'truth': trace.steps,
+            'period': int(1000 / rate_hz), 'acc': acc, 'gyr': gyr,
+        })
+    print("Micro-benchmark écrit: %s (%d échantillons)" % (path, len(acc) // 3))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai des détecteurs de pas")
+    parser.add_argument('--duration', type=float, default=60, help="durée des traces synthétiques (s)")
+    parser.add_argument('--rate', type=int, default=20, help="fréquence d'échantillonnage (Hz)")
+    parser.add_argument('--csv', action='append', default=[], help="trace enregistrée t_ms,ax,ay,az[,gx,gy,gz]")
+    parser.add_argument('--steps', type=int, action='append', default=[], help="nombre de pas réel de chaque --csv")
+    parser.add_argument('--detector', action='append', choices=sorted(DETECTORS), help="détecteur(s) à mesurer")
+    parser.add_argument('--json', help="écrire les résultats dans ce fichier JSON")
+    parser.add_argument('--emit-micro', metavar='PATH', help="écrire le micro-benchmark MicroPython")
+    args = parser.parse_args(argv)
+
+    if args.emit_micro:
+        emit_micro(args.emit_micro, traces.walking(min(args.duration, 30)), args.rate)
+        return 0
+
+    all_traces = traces.standard_traces(args.duration)
+    for i, path in enumerate(args.csv):
+        steps = args.steps[i] if i < len(args.steps) else None
+        all_traces.append(traces.from_csv(path, steps=steps, name=os.path.basename(path)))
+
+    results = []
+    for trace in all_traces:
+        samples = list(trace.samples(args.rate))
+        for name in args.detector or sorted(DETECTORS):
+            results.append(bench(trace, name, DETECTORS[name], args.rate, samples))
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
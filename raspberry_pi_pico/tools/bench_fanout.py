@@ -0,0 +1,166 @@
+"""
+Banc d'essai de la diffusion BLE vers plusieurs téléphones (CPython, simulateur)
+Exécute main_bluetooth.py non modifié avec 1 à 4 centraux simulés et
+mesure, en temps processeur réel de l'hôte, le temps passé par tour dans:
+- publish(): encodage (une fois) et mise en file pour chaque client
+- pump(): notifications vers la pile BLE, à tour de rôle
+
+Les téléphones ont chacun leur rythme et leurs abonnements: --mixed
+donne au 2e un rythme de 2 s, au 3e les pas seulement (caractéristique
+GATT, 4 octets), au 4e un rythme de 1 s; sinon tous reçoivent le JSON
+toutes les 500 ms. Meilleur de --repeat essais (bruit de l'hôte).
+
+Utilisation (depuis la racine du dépôt):
+    python raspberry_pi_pico/tools/bench_fanout.py
+    python raspberry_pi_pico/tools/bench_fanout.py --mixed --duration 120
+
+Le temps processeur de l'hôte n'est qu'un ordre de grandeur de celui du
+Pico; sur la carte, GET_PERF (étapes format, file et radio) donne la
+même mesure.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import struct
+import sys
+import time
+
+FIRMWARE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if FIRMWARE_DIR not in sys.path:
+    sys.path.insert(0, FIRMWARE_DIR)
+
+from sim import traces  # noqa: E402
+from sim.runner import Simulation  # noqa: E402
+
+import commands  # noqa: E402
+import runtime  # noqa: E402
+
+SCRIPT = os.path.join(FIRMWARE_DIR, 'main_bluetooth.py')
+STEPS_UUID = "A5F00002-6C2B-4B1E-8D7E-3C9B5E1F2A40"
+
+
+class _Timed(runtime.PedometerRuntime):
+    """PedometerRuntime qui chronomètre publish() et pump() (perf_counter)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.publish_s = []
+        self.pump_s = []
+        publish = self.publish
+        pump = self.ble.pump
+
+        def timed_publish(rt):
+            t = time.perf_counter()
+            publish(rt)
+            self.publish_s.append(time.perf_counter() - t)
+
+        def timed_pump(*args):
+            t = time.perf_counter()
+            done = pump(*args)
+            self.pump_s.append(time.perf_counter() - t)
+            return done
+
+        self.publish = timed_publish
+        self.ble.pump = timed_pump
+
+
+def _setup(s, phone, k, mixed):
+    """Commandes envoyées par le k-ième téléphone après sa connexion"""
+    t = 1000 + 10 * k
+    s.at(t, phone.connect)
+    s.at(t + 50, phone.exchange_mtu)
+    s.at(t + 100, lambda: phone.write(struct.pack('<BBH', commands.CMD_SET_PUBLISH,
+                                                  commands.PUBLISH_PERIODIC, 5)))
+    if not mixed:
+        return
+    if k == 1:
+        s.at(t + 150, lambda: phone.write(struct.pack('<BH', commands.CMD_SET_RATE, 2000)))
+    elif k == 2:
+        s.at(t + 150, lambda: phone.write(bytes((commands.CMD_SUBSCRIBE, 0))))
+        s.at(t + 200, lambda: phone.subscribe(STEPS_UUID))
+    elif k == 3:
+        s.at(t + 150, lambda: phone.write(struct.pack('<BH', commands.CMD_SET_RATE, 1000)))
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run(trace, centrals, duration_s, mixed=False):
+    """
+    Returns:
+        dict: temps par tour de publish() et pump() (µs), octets reçus par téléphone
+    """
+    saved = runtime.PedometerRuntime
+    runtime.PedometerRuntime = _Timed
+    try:
+        with Simulation(trace=trace) as s:
+            phones = [s.central() for _ in range(centrals)]
+            for k, phone in enumerate(phones):
+                _setup(s, phone, k, mixed)
+            with contextlib.redirect_stdout(io.StringIO()):
+                scope = s.run_script(SCRIPT, duration_s)
+            rt = scope['runtime']
+            received = [sum(len(d) for _, d in phone.received) for phone in phones]
+            notifications = sum(len(phone.received) for phone in phones)
+    finally:
+        runtime.PedometerRuntime = saved
+    # Régime établi: après les connexions
+    publish_us = [t * 1e6 for t in rt.publish_s[4:]]
+    pump_us = [t * 1e6 for t in rt.pump_s[100:]]
+    return {
+        'centrals': centrals, 'mixed': mixed,
+        'publish_mean_us': sum(publish_us) / max(1, len(publish_us)),
+        'publish_p99_us': _percentile(publish_us, 0.99),
+        'pump_mean_us': sum(pump_us) / max(1, len(pump_us)),
+        'pump_p99_us': _percentile(pump_us, 0.99),
+        # Temps de boucle occupé par le BLE, par seconde de fonctionnement
+        'busy_ms_per_s': (sum(rt.publish_s) + sum(rt.pump_s)) * 1000 / duration_s,
+        'notifications': notifications,
+        'bytes_per_central': received,
+        'steps': rt.detector.step_count,
+    }
+
+
+def print_table(results):
+    base = results[0]['busy_ms_per_s'] if results else 0
+    print("%-8s %12s %12s %12s %12s %10s %8s  %s" % (
+        "clients", "publish moy", "publish p99", "pump moy", "pump p99", "ms/s", "×1",
+        "octets reçus par client"))
+    for r in results:
+        print("%-8d %10.0fµs %10.0fµs %10.0fµs %10.0fµs %10.2f %8.2f  %s" % (
+            r['centrals'], r['publish_mean_us'], r['publish_p99_us'], r['pump_mean_us'],
+            r['pump_p99_us'], r['busy_ms_per_s'],
+            r['busy_ms_per_s'] / base if base else 0, r['bytes_per_central']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diffusion BLE vers 1 à 4 téléphones")
+    parser.add_argument('--duration', type=float, default=60, help="durée simulée (s)")
+    parser.add_argument('--max-centrals', type=int, default=4)
+    parser.add_argument('--mixed', action='store_true',
+                        help="rythmes et abonnements différents par téléphone")
+    parser.add_argument('--repeat', type=int, default=3, help="essais par nombre de clients")
+    parser.add_argument('--json', help="écrire les résultats dans ce fichier JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    for n in range(1, args.max_centrals + 1):
+        runs = [run(traces.walking(args.duration), n, args.duration, args.mixed)
+                for _ in range(args.repeat)]
+        results.append(min(runs, key=lambda r: r['busy_ms_per_s']))
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
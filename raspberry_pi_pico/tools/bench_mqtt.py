@@ -0,0 +1,203 @@
+"""
+Banc d'essai de l'envoi MQTT en lots (CPython, sockets réelles)
+Une flotte de --devices MqttPublisher publie vers le broker local
+(tools/mqtt_broker.py); le broker tombe pendant --outage secondes puis
+redémarre sur le même port. Rapporte, par rapport aux échantillons pris
+par les appareils:
+- échantillons reçus, perdus, en double (seq de chaque lot)
+- lots gardés en RAM / versés sur la flash pendant la coupure
+- étalement des reconnexions (attente doublée et aléa) et temps de
+  rattrapage des lots en attente après le redémarrage
+- octets par échantillon sur le réseau, comparés à un message JSON de
+  télémétrie publié chaque seconde
+
+Le temps est accéléré (--speed): à 10, un « échantillon par seconde »
+est pris toutes les 100 ms et les durées du firmware (lot, attente de
+reconnexion, keepalive) sont divisées d'autant.
+
+Utilisation (depuis la racine du dépôt):
+    python raspberry_pi_pico/tools/bench_mqtt.py
+    python raspberry_pi_pico/tools/bench_mqtt.py --devices 50 --format binary
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+FIRMWARE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+for _path in (FIRMWARE_DIR, TOOLS_DIR):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+from sim import clock  # noqa: E402
+
+# time.ticks_ms() en temps réel (cadences et keepalive du publieur)
+clock.install(clock.RealClock())
+
+import mqtt_broker  # noqa: E402
+import mqtt_publisher  # noqa: E402
+import telemetry  # noqa: E402
+
+FORMATS = {'binary': mqtt_publisher.FORMAT_BINARY, 'json': mqtt_publisher.FORMAT_JSON}
+
+
+def _values(i):
+    """Échantillon i d'un appareil (marche régulière)"""
+    return telemetry.scaled(2 * i, 1.3, 1.4 * i, 0.08 * i, 112.0, 2, 24.5,
+                            120, -340, 16200, 15, -8, 3)
+
+
+def _baseline_bytes(device_id):
+    """Un message JSON de télémétrie par seconde (encode_json), PUBLISH compris"""
+    payload = telemetry.encode_json(1234, 1.3, 864.0, 49.4, 112.0, 2, 24.5,
+                                    120, -340, 16200, 15, -8, 3).encode()
+    topic = "devices/%s/telemetry" % device_id
+    return len(mqtt_publisher.publish_header(topic, len(payload))) + len(payload)
+
+
+async def _bench(devices, fmt, speed, batch_s, duration_s, outage_at_s, outage_s, ram_batches):
+    received = {}   # appareil -> [(seq, nombre, instant)]
+
+    def on_publish(client_id, topic, payload, t):
+        batch = mqtt_publisher.decode_batch(payload)
+        received.setdefault(client_id, []).append((batch['seq'], len(batch['samples']), t))
+
+    broker = mqtt_broker.Broker(on_publish=on_publish)
+    port = await broker.start('127.0.0.1', 0)
+    start = time.perf_counter()
+
+    with tempfile.TemporaryDirectory() as spool_dir:
+        publishers = []
+        for k in range(devices):
+            p = mqtt_publisher.MqttPublisher(
+                "pico-%03d" % k, '127.0.0.1', port, sample_ms=1000 // speed,
+                batch_ms=int(batch_s * 1000) // speed, fmt=fmt,
+                keepalive_s=max(1, 60 // speed), ram_batches=ram_batches,
+                spool=os.path.join(spool_dir, "spool-%03d.bin" % k),
+                backoff_ms=(1000 // speed, 60000 // speed))
+            counter = [0]
+
+            def sample(counter=counter):
+                counter[0] += 1
+                return _values(counter[0])
+
+            p.start(sample)
+            publishers.append(p)
+
+        await asyncio.sleep(outage_at_s)
+        await broker.stop(abort=True)
+        down = time.perf_counter()
+        await asyncio.sleep(outage_s)
+        during = [p.stats() for p in publishers]
+        backlog = [p.batches for p in publishers]
+        await broker.start('127.0.0.1', port)
+        up = time.perf_counter()
+        await asyncio.sleep(max(0, duration_s - outage_at_s - outage_s))
+        for p in publishers:
+            await p.stop()
+        await asyncio.sleep(0.2)
+        final = [p.stats() for p in publishers]
+        await broker.stop()
+
+    samples = sum(s['samples'] for s in final)
+    unique = duplicates = 0
+    catch_up = []
+    for p, stats, n_backlog in zip(publishers, final, backlog):
+        batches = received.get(p.device_id, [])
+        seen = set()
+        for seq, n, _ in batches:
+            for i in range(seq, seq + n):
+                if i in seen:
+                    duplicates += 1
+                else:
+                    seen.add(i)
+        unique += len(seen)
+        # Rattrapage: réception du dernier lot fermé avant le redémarrage
+        firsts = {}
+        for seq, n, t in batches:
+            firsts.setdefault(seq, t)
+        times = sorted(firsts.values())
+        if len(times) >= n_backlog:
+            catch_up.append(times[n_backlog - 1] - up)
+    reconnects = sorted(t - up for _, t in broker.connects if t > up)
+    payload_bytes = broker.bytes
+    return {
+        'devices': devices, 'format': fmt, 'speed': speed, 'batch_s': batch_s,
+        'duration_s': duration_s, 'outage_s': outage_s,
+        'samples': samples, 'received': unique, 'lost': samples - unique,
+        'duplicates': duplicates,
+        'ram_batches_max': max(s['pending'] for s in during),
+        'spooled': sum(s['spooled'] for s in final),
+        'spool_bytes_max': max(s['spool_bytes'] for s in during),
+        'dropped_batches': sum(s['lost'] for s in final),
+        'disconnects': sum(s['disconnects'] for s in final),
+        'reconnect_first_s': reconnects[0] if reconnects else None,
+        'reconnect_last_s': reconnects[-1] if reconnects else None,
+        'catch_up_max_s': max(catch_up) if len(catch_up) == devices else None,
+        'outage_detected_s': down - start,
+        'bytes_per_sample': payload_bytes / max(1, unique),
+        'baseline_bytes_per_sample': _baseline_bytes("pico-000"),
+    }
+
+
+def run(devices=20, fmt=mqtt_publisher.FORMAT_JSON, speed=10, batch_s=10, duration_s=12,
+        outage_at_s=3, outage_s=4, ram_batches=2):
+    """
+    Durées en secondes réelles (accélérées de speed par rapport au firmware)
+
+    Returns:
+        dict: échantillons reçus / perdus, mise en attente, reconnexions, octets
+    """
+    return asyncio.run(_bench(devices, fmt, speed, batch_s, duration_s, outage_at_s,
+                              outage_s, ram_batches))
+
+
+def print_report(r):
+    name = 'json' if r['format'] == mqtt_publisher.FORMAT_JSON else 'binaire'
+    k = r['speed']
+    print("%d appareils, lots %s de %g s, coupure du broker de %g s (temps x%d)" %
+          (r['devices'], name, r['batch_s'], r['outage_s'] * k, k))
+    print("  échantillons: %d pris, %d reçus, %d perdus, %d en double" %
+          (r['samples'], r['received'], r['lost'], r['duplicates']))
+    print("  pendant la coupure: %d lots en RAM au plus, %d octets sur la flash au plus; "
+          "%d lots versés sur la flash, %d lots perdus (attente pleine)" %
+          (r['ram_batches_max'], r['spool_bytes_max'], r['spooled'], r['dropped_batches']))
+    if r['reconnect_first_s'] is not None:
+        print("  reconnexions après le redémarrage: de %.1f à %.1f s (firmware)" %
+              (r['reconnect_first_s'] * k, r['reconnect_last_s'] * k))
+    if r['catch_up_max_s'] is not None:
+        print("  lots en attente tous publiés %.1f s (firmware) après le redémarrage" %
+              (r['catch_up_max_s'] * k))
+    print("  réseau: %.1f octets par échantillon (JSON à la seconde: %d)" %
+          (r['bytes_per_sample'], r['baseline_bytes_per_sample']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flotte MQTT, lots et coupure du broker")
+    parser.add_argument('--devices', type=int, default=20)
+    parser.add_argument('--format', choices=sorted(FORMATS), default='json')
+    parser.add_argument('--batch', type=float, default=10, help="cadence des lots (s, firmware)")
+    parser.add_argument('--speed', type=int, default=10, help="accélération du temps")
+    parser.add_argument('--duration', type=float, default=12, help="durée réelle (s)")
+    parser.add_argument('--outage', type=float, default=4, help="coupure réelle du broker (s)")
+    parser.add_argument('--ram-batches', type=int, default=2,
+                        help="lots en RAM avant la flash (2: la coupure passe par la flash)")
+    parser.add_argument('--json', help="écrire les résultats dans ce fichier JSON")
+    args = parser.parse_args(argv)
+
+    r = run(args.devices, FORMATS[args.format], args.speed, args.batch, args.duration,
+            min(3, args.duration / 4), args.outage, args.ram_batches)
+    print_report(r)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(r, f, indent=2)
+    return 1 if r['lost'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""
+Banc d'essai du gestionnaire d'énergie (CPython, simulateur)
+Exécute main_bluetooth.py non modifié sur des scénarios enchaînant repos,
+marche et course, avec puis sans gestion d'énergie, et rapporte:
+- temps passé actif / en course / en veille, veilles et réveils
+- consommation moyenne estimée du MPU et de la carte (power.py)
+- latence de réveil et du premier pas après chaque reprise d'activité,
+  et pas détectés (avec / sans gestion, nombre réel)
+
+Utilisation (depuis la racine du dépôt):
+    python raspberry_pi_pico/tools/bench_power.py
+    python raspberry_pi_pico/tools/bench_power.py --scenario day --detector simple
+    python raspberry_pi_pico/tools/bench_power.py --gyro-standby
+
+Sans gestion: même firmware, PowerManager qui ne met jamais le capteur en
+veille et garde le gyroscope (référence « toujours actif »).
+--gyro-standby: gyroscope arrêté s'il ne sert pas au détecteur
+(GYRO_STANDBY = True dans main_bluetooth.py).
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+FIRMWARE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if FIRMWARE_DIR not in sys.path:
+    sys.path.insert(0, FIRMWARE_DIR)
+
+from sim import traces  # noqa: E402
+from sim.runner import Simulation  # noqa: E402
+
+import commands  # noqa: E402
+import power  # noqa: E402
+
+SCRIPT = os.path.join(FIRMWARE_DIR, 'main_bluetooth.py')
+
+SCENARIOS = {
+    'day': lambda: traces.sequence(traces.still(120), traces.walking(120), traces.still(120),
+                                   traces.running(60), traces.still(120), name="day"),
+    'walking': lambda: traces.walking(300),
+    'transport': lambda: traces.sequence(traces.still(60), traces.idle_vibration(180),
+                                         traces.walking(60), name="transport"),
+}
+
+DETECTORS = {'simple': commands.DETECTOR_SIMPLE, 'advanced': commands.DETECTOR_ADVANCED,
+             'fused': commands.DETECTOR_FUSED, 'fixed': commands.DETECTOR_FIXED}
+
+
+class _Recording(power.PowerManager):
+    """PowerManager qui note les instants de réveil et de chaque pas détecté"""
+
+    always_on = False
+    gyro_standby = False
+
+    def __init__(self, mpu, ble=None, **kwargs):
+        kwargs['gyro_standby'] = self.gyro_standby
+        if self.always_on:
+            kwargs.update(idle_ms=1 << 29, gyro=True)
+        super().__init__(mpu, ble, **kwargs)
+        self.wake_times = []
+        self.step_times = []
+        self._hooked = False
+
+    def update(self, rt):
+        if not self._hooked:
+            on_step = rt.on_step
+
+            def hook(runtime):
+                self.step_times.append(time.ticks_ms())
+                if on_step is not None:
+                    on_step(runtime)
+
+            rt.on_step = hook
+            self._hooked = True
+        super().update(rt)
+
+    def _wake(self, rt, now):
+        super()._wake(rt, now)
+        self.wake_times.append(now)
+
+
+class _AlwaysOn(_Recording):
+    always_on = True
+
+
+def run(trace, detector, always_on=False):
+    """
+    Returns:
+        dict: statistiques du gestionnaire, instants de réveil et de pas (ms)
+    """
+    cls = _AlwaysOn if always_on else _Recording
+    saved = power.PowerManager
+    power.PowerManager = cls
+    try:
+        with Simulation(trace=trace) as s:
+            phone = s.central()
+            s.at(1000, phone.connect)
+            s.at(1200, lambda: phone.write(bytes((commands.CMD_SET_DETECTOR, detector))))
+            with contextlib.redirect_stdout(io.StringIO()):
+                scope = s.run_script(SCRIPT, trace.duration_s)
+    finally:
+        power.PowerManager = saved
+    pm = scope['power']
+    result = pm.stats()
+    result['wake_times'] = pm.wake_times
+    result['step_times'] = pm.step_times
+    result['steps'] = scope['runtime'].detector.step_count
+    return result
+
+
+def _first_after(times, t0):
+    for t in times:
+        if t >= t0:
+            return t - t0
+    return None
+
+
+def resumes(trace):
+    """Instants (ms) où l'activité reprend après un segment sans pas"""
+    out = []
+    segments = getattr(trace, 'segments', [(0.0, trace)])
+    for (start, seg), (_, prev) in zip(segments[1:], segments[:-1]):
+        if seg.steps and not prev.steps:
+            out.append(int(start * 1000))
+    return out
+
+
+def bench(name, detector):
+    # Une trace par essai: le bruit des traces est tiré au fil des échantillons
+    trace = SCENARIOS[name]()
+    managed = run(trace, DETECTORS[detector])
+    always = run(SCENARIOS[name](), DETECTORS[detector], always_on=True)
+    latencies = []
+    for t0 in resumes(trace):
+        latencies.append({
+            't_s': t0 / 1000,
+            'wake_ms': _first_after(managed['wake_times'], t0),
+            'first_step_ms': _first_after(managed['step_times'], t0),
+            'first_step_always_on_ms': _first_after(always['step_times'], t0),
+        })
+    return {
+        'scenario': name, 'detector': detector, 'duration_s': trace.duration_s,
+        'true_steps': trace.steps, 'steps': managed['steps'], 'steps_always_on': always['steps'],
+        'active_s': managed['active_ms'] / 1000, 'running_s': managed['running_ms'] / 1000,
+        'idle_s': managed['idle_ms'] / 1000, 'sleeps': managed['sleeps'], 'wakes': managed['wakes'],
+        'sensor_ua': managed['sensor_ua'], 'sensor_always_on_ua': always['sensor_ua'],
+        'board_ua': managed['board_ua'], 'board_always_on_ua': always['board_ua'],
+        'resumes': latencies,
+    }
+
+
+def _ms(v):
+    return "-" if v is None else "%d" % v
+
+
+def print_report(results):
+    for r in results:
+        print("%s (%s, %.0f s): actif %.0f s, course %.0f s, veille %.0f s, %d veilles / %d réveils" %
+              (r['scenario'], r['detector'], r['duration_s'], r['active_s'], r['running_s'],
+               r['idle_s'], r['sleeps'], r['wakes']))
+        print("  MPU: %.0f µA (toujours actif: %.0f µA, %.0f%%)   carte: %.1f mA (%.1f mA)" %
+              (r['sensor_ua'], r['sensor_always_on_ua'],
+               100 * (r['sensor_ua'] / r['sensor_always_on_ua'] - 1),
+               r['board_ua'] / 1000, r['board_always_on_ua'] / 1000))
+        print("  pas: %d (toujours actif: %d, réels: %s)" %
+              (r['steps'], r['steps_always_on'], r['true_steps']))
+        for lat in r['resumes']:
+            print("  reprise à %.0f s: réveil %s ms, 1er pas %s ms (toujours actif: %s ms)" %
+                  (lat['t_s'], _ms(lat['wake_ms']), _ms(lat['first_step_ms']),
+                   _ms(lat['first_step_always_on_ms'])))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consommation estimée et latence de réveil")
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS))
+    parser.add_argument('--detector', choices=sorted(DETECTORS), default='advanced')
+    parser.add_argument('--gyro-standby', action='store_true',
+                        help="gyroscope arrêté s'il ne sert pas au détecteur")
+    parser.add_argument('--json', help="écrire les résultats dans ce fichier JSON")
+    args = parser.parse_args(argv)
+
+    _Recording.gyro_standby = args.gyro_standby
+    results = [bench(name, args.detector) for name in args.scenario or list(SCENARIOS)]
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
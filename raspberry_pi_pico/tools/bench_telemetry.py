@@ -0,0 +1,183 @@
+"""
+Banc d'essai de la télémétrie BLE (CPython, simulateur)
+Exécute main_bluetooth.py non modifié avec un téléphone simulé, pour
+chaque mode de publication et chaque trace, et mesure les octets émis
+par la radio, ramenés à une heure:
+- periodic-json / periodic-binary: instantané complet toutes les 500 ms
+- change-*: envoi sur pas, sur changement notable ou au battement (5 s)
+- change-delta: trames delta acquittées (ACK_SNAPSHOT) par le téléphone
+
+Utilisation (depuis la racine du dépôt):
+    python raspberry_pi_pico/tools/bench_telemetry.py
+    python raspberry_pi_pico/tools/bench_telemetry.py --duration 600 --heartbeat 10
+
+Octets sur l'air = charge utile + en-têtes par paquet (préambule, adresse
+d'accès, en-tête LL, L2CAP, ATT, CRC: PACKET_OVERHEAD), téléphone -> Pico
+compris (commandes et acquittements).
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import struct
+import sys
+import time
+
+FIRMWARE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if FIRMWARE_DIR not in sys.path:
+    sys.path.insert(0, FIRMWARE_DIR)
+
+from sim import traces  # noqa: E402
+from sim.central import UART_RX, VirtualCentral  # noqa: E402
+from sim.runner import Simulation  # noqa: E402
+
+import commands  # noqa: E402
+import telemetry  # noqa: E402
+
+SCRIPT = os.path.join(FIRMWARE_DIR, 'main_bluetooth.py')
+
+# Préambule 1 + adresse d'accès 4 + en-tête LL 2 + L2CAP 4 + ATT 3 + CRC 3
+PACKET_OVERHEAD = 17
+
+# Modes comparés: nom -> (mode de publication, format de télémétrie)
+MODES = {
+    'periodic-json': (commands.PUBLISH_PERIODIC, telemetry.FORMAT_JSON),
+    'periodic-binary': (commands.PUBLISH_PERIODIC, telemetry.FORMAT_BINARY),
+    'change-json': (commands.PUBLISH_ON_CHANGE, telemetry.FORMAT_JSON),
+    'change-binary': (commands.PUBLISH_ON_CHANGE, telemetry.FORMAT_BINARY),
+    'change-delta': (commands.PUBLISH_ON_CHANGE, telemetry.FORMAT_DELTA),
+}
+
+TRACES = {
+    'walking': traces.walking,
+    'idle': traces.idle_vibration,
+}
+
+
+class Phone(VirtualCentral):
+    """
+    Téléphone qui décode la télémétrie comme l'application et acquitte
+    les trames complètes en mode delta (MTU 247: un message par notification)
+    """
+
+    def __init__(self, sim, ble, mtu=247, ack_delay_ms=30):
+        super().__init__(ble, mtu=mtu)
+        self.sim = sim
+        self.ack_delay_ms = ack_delay_ms
+        self.acking = False
+        self.state = None       # dernières valeurs entières reconstruites
+        self._base = {}         # seq -> valeurs des trames complètes reçues
+        self.messages = 0
+        self.tx_bytes = 0       # téléphone -> Pico
+        self.tx_packets = 0
+
+    def write(self, data, uuid=UART_RX):
+        self.tx_bytes += len(data)
+        self.tx_packets += 1
+        super().write(data, uuid)
+
+    def _on_notify(self, value_handle, data):
+        super()._on_notify(value_handle, data)
+        kind = data[0]
+        if kind == ord('{'):
+            msg = json.loads(data)
+            self.state = telemetry.scaled(msg['steps'], msg['speed'], msg['distance'],
+                                          msg['calories'], msg['cadence'],
+                                          telemetry.activity_code(msg['activity']), msg['temp'],
+                                          0, 0, 0, 0, 0, 0)
+        elif kind == telemetry.FRAME_VERSION:
+            seq, self.state = telemetry.decode_values(data)
+            self._base[seq] = self.state
+            if self.acking:
+                now_ms = self.sim.clock.now_us // 1000
+                self.sim.at(now_ms + self.ack_delay_ms,
+                            lambda: self.connected and self.write(
+                                bytes((commands.CMD_ACK_SNAPSHOT, seq))))
+        elif kind == telemetry.DELTA_VERSION:
+            self.state = telemetry.decode_delta(data, self._base[data[2]])[2]
+        else:
+            return  # acquittement de commande, page d'historique
+        self.messages += 1
+
+
+def run(trace, mode, duration_s, heartbeat_s):
+    """
+    Returns:
+        dict: messages, paquets et octets sur l'air (dans chaque sens), pas
+    """
+    publish_mode, fmt = MODES[mode]
+    with Simulation(trace=trace) as s:
+        phone = Phone(s, s.ble)
+        s.centrals.append(phone)
+        s.at(1000, phone.connect)
+        s.at(1050, phone.exchange_mtu)
+        s.at(1100, lambda: phone.write(struct.pack('<BBH', commands.CMD_SET_PUBLISH,
+                                                   publish_mode, heartbeat_s)))
+        s.at(1150, lambda: phone.write(bytes((telemetry.CMD_SET_FORMAT, fmt))))
+        phone.acking = fmt == telemetry.FORMAT_DELTA
+        with contextlib.redirect_stdout(io.StringIO()):
+            scope = s.run_script(SCRIPT, duration_s)
+        sent = scope['change']._last
+        rx = [data for _, data in phone.received]
+    # Seule la fenêtre connectée compte (t >= 1,2 s)
+    hours = (duration_s - 1.2) / 3600
+    rx_bytes = sum(len(d) for d in rx)
+    air = rx_bytes + phone.tx_bytes + PACKET_OVERHEAD * (len(rx) + phone.tx_packets)
+    return {
+        'trace': trace.name, 'mode': mode, 'messages': phone.messages,
+        'notifications': len(rx), 'payload_bytes': rx_bytes, 'phone_bytes': phone.tx_bytes,
+        'air_bytes_per_hour': air / hours,
+        'messages_per_hour': phone.messages / hours,
+        'steps': sent[0] if sent else 0,
+        'decoded_steps': phone.state[0] if phone.state else 0,
+    }
+
+
+def print_table(results):
+    header = ("trace", "mode", "messages/h", "octets/h", "réduction", "pas", "décodés")
+    rows = []
+    reference = {}
+    for r in results:
+        if r['mode'] == 'periodic-json':
+            reference[r['trace']] = r['air_bytes_per_hour']
+    for r in results:
+        ref = reference.get(r['trace'])
+        rows.append((r['trace'], r['mode'], "%.0f" % r['messages_per_hour'],
+                     "%.0f" % r['air_bytes_per_hour'],
+                     "%.1f%%" % (100 * (1 - r['air_bytes_per_hour'] / ref)) if ref else "-",
+                     str(r['steps']), str(r['decoded_steps'])))
+    widths = [max(len(h), *(len(row[i]) for row in rows)) for i, h in enumerate(header)]
+    print("  ".join(h.ljust(w) for h, w in zip(header, widths)))
+    for row in rows:
+        print("  ".join(c.ljust(w) for c, w in zip(row, widths)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Octets BLE par heure selon le mode de publication")
+    parser.add_argument('--duration', type=float, default=300, help="temps virtuel par essai (s)")
+    parser.add_argument('--heartbeat', type=int, default=5, help="battement du mode sur changement (s)")
+    parser.add_argument('--trace', action='append', choices=sorted(TRACES), help="trace(s) à rejouer")
+    parser.add_argument('--mode', action='append', choices=list(MODES), help="mode(s) à mesurer")
+    parser.add_argument('--json', help="écrire les résultats dans ce fichier JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    for trace_name in args.trace or list(TRACES):
+        for mode in args.mode or list(MODES):
+            t0 = time.perf_counter()
+            r = run(TRACES[trace_name](args.duration), mode, args.duration, args.heartbeat)
+            print("[INFO] %s / %s: %.1f s" % (trace_name, mode, time.perf_counter() - t0),
+                  file=sys.stderr)
+            results.append(r)
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    # Le téléphone doit retrouver exactement le dernier total envoyé
+    return 0 if all(r['steps'] == r['decoded_steps'] for r in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""
+Banc d'essai du serveur WebSocket de télémétrie (CPython, sockets réelles)
+Démarre ws_server.WebSocketServer sur la boucle locale avec 50 clients
+WebSocket, diffuse des trames de télémétrie à --rate Hz et mesure:
+- latence de diffusion: de broadcast() à la réception par chaque client,
+  et jusqu'au dernier client (diffusion complète) pour chaque trame
+- coût de broadcast() (encodage une fois, copie dans chaque file)
+- déconnexion des clients lents (--slow, lisent une trame par seconde)
+  et muets (--stalled, ne lisent plus rien après 1 s, ni pong)
+
+Les clients et le serveur partagent la même boucle asyncio: la latence
+comprend la lecture des autres clients (ordre de grandeur, pas celle du
+Pico). Les tampons d'envoi du serveur sont réduits à quelques ko, comme
+ceux de lwIP sur le Pico W, pour qu'un client lent remplisse sa file.
+
+Utilisation (depuis la racine du dépôt):
+    python raspberry_pi_pico/tools/bench_ws.py
+    python raspberry_pi_pico/tools/bench_ws.py --format json --slow 5 --stalled 5
+    python raspberry_pi_pico/tools/bench_ws.py --format json --slow 5 --timeout 60000
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import socket
+import struct
+import sys
+import time
+
+FIRMWARE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if FIRMWARE_DIR not in sys.path:
+    sys.path.insert(0, FIRMWARE_DIR)
+
+from sim import clock  # noqa: E402
+
+# time.ticks_ms() en temps réel (maintien de connexion du serveur)
+clock.install(clock.RealClock())
+
+import telemetry  # noqa: E402
+import ws_server  # noqa: E402
+
+# Tampons d'envoi du serveur (octets): quelques ko comme lwIP sur le Pico W
+SND_BUF = 4096
+WRITE_HIGH = 1024
+RCV_BUF = 4096
+
+FORMATS = {'binary': telemetry.FORMAT_BINARY, 'json': telemetry.FORMAT_JSON}
+
+
+class _SmallBuffers(ws_server.WebSocketServer):
+    """
+    Serveur dont les sockets acceptées ont des tampons d'envoi réduits,
+    qui note les déconnexions forcées (raison, instant)
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.start_s = time.perf_counter()
+        self.evictions = []
+
+    def _evict(self, c, reason):
+        self.evictions.append((reason, time.perf_counter() - self.start_s))
+        super()._evict(c, reason)
+
+    async def _accept(self, reader, writer):
+        sock = writer.get_extra_info('socket')
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SND_BUF)
+        writer.transport.set_write_buffer_limits(high=WRITE_HIGH)
+        await super()._accept(reader, writer)
+
+
+class _Client:
+    """Client WebSocket minimal: réception, pong, horodatage des trames"""
+
+    def __init__(self, mode, fmt, sent):
+        self.mode = mode        # 'normal', 'slow' ou 'stalled'
+        self.format = fmt
+        self.sent = sent        # numéro de trame -> instant de broadcast()
+        self.latencies = []     # (numéro, secondes)
+        self.closed = None      # code de fermeture reçu du serveur
+        self.pings = 0
+
+    async def connect(self, port):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RCV_BUF)
+        sock.setblocking(False)
+        await asyncio.get_running_loop().sock_connect(sock, ('127.0.0.1', port))
+        # Petit tampon de lecture: un client lent n'absorbe pas le flux
+        self.reader, self.writer = await asyncio.open_connection(sock=sock, limit=RCV_BUF // 2)
+        key = base64.b64encode(os.urandom(16))
+        name = 'json' if self.format == telemetry.FORMAT_JSON else 'binary'
+        self.writer.write(b"GET /ws?format=%s HTTP/1.1\r\nHost: pico\r\nUpgrade: websocket\r\n"
+                          b"Connection: Upgrade\r\nSec-WebSocket-Key: %s\r\n"
+                          b"Sec-WebSocket-Version: 13\r\n\r\n" % (name.encode(), key))
+        response = await self.reader.readuntil(b"\r\n\r\n")
+        if not response.startswith(b"HTTP/1.1 101") or ws_server.accept_key(key) not in response:
+            raise RuntimeError("mise à niveau refusée: %r" % response.split(b"\r\n")[0])
+
+    def _send(self, opcode, payload=b""):
+        mask = os.urandom(4)
+        data = bytes(b ^ mask[i & 3] for i, b in enumerate(payload))
+        self.writer.write(bytes((0x80 | opcode, 0x80 | len(payload))) + mask + data)
+
+    async def run(self):
+        reader = self.reader
+        start = time.perf_counter()
+        try:
+            while True:
+                if self.mode == 'stalled' and time.perf_counter() - start > 1:
+                    # Plus de lecture: le serveur doit le déconnecter
+                    await asyncio.sleep(3600)
+                head = await reader.readexactly(2)
+                n = head[1] & 0x7F
+                if n == 126:
+                    n = struct.unpack('>H', await reader.readexactly(2))[0]
+                payload = await reader.readexactly(n)
+                opcode = head[0] & 0x0F
+                if opcode == ws_server.OP_PING:
+                    self.pings += 1
+                    self._send(ws_server.OP_PONG, payload)
+                elif opcode == ws_server.OP_CLOSE:
+                    self.closed = struct.unpack('>H', payload[:2])[0] if n >= 2 else 0
+                    return
+                else:
+                    t = time.perf_counter()
+                    if opcode == ws_server.OP_BINARY:
+                        i = telemetry.decode_values(payload)[1][0]
+                    else:
+                        i = json.loads(payload)['steps']
+                    self.latencies.append((i, t - self.sent[i]))
+                    if self.mode == 'slow':
+                        await asyncio.sleep(1)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.writer.close()
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def _bench(clients, fmt, rate, duration_s, slow, stalled, timeout_ms):
+    server = _SmallBuffers(port=0, max_clients=clients, ping_ms=1000, timeout_ms=timeout_ms)
+    listener = await server.start('127.0.0.1')
+    port = listener.sockets[0].getsockname()[1]
+
+    sent = {}
+    modes = ['slow'] * slow + ['stalled'] * stalled
+    modes += ['normal'] * (clients - len(modes))
+    peers = [_Client(mode, fmt, sent) for mode in modes]
+    for peer in peers:
+        await peer.connect(port)
+    tasks = [asyncio.create_task(peer.run()) for peer in peers]
+    await asyncio.sleep(0.1)
+
+    encoder = telemetry.TelemetryEncoder()
+    cost = []
+    period = 1 / rate
+    frames = int(duration_s * rate)
+    next_t = time.perf_counter()
+    for i in range(frames):
+        values = telemetry.scaled(i, 1.2, i * 0.7, i * 0.04, 110.0, 2, 24.5,
+                                  120, -340, 16200, 15, -8, 3)
+        t = time.perf_counter()
+        sent[i] = t
+        if fmt == telemetry.FORMAT_BINARY:
+            server.broadcast(encoder.pack(values), fmt)
+        else:
+            server.broadcast(telemetry.encode_json(i, 1.2, i * 0.7, i * 0.04, 110.0, 2, 24.5,
+                                                   120, -340, 16200, 15, -8, 3), fmt)
+        cost.append(time.perf_counter() - t)
+        next_t += period
+        await asyncio.sleep(max(0, next_t - time.perf_counter()))
+    await asyncio.sleep(0.5)
+
+    stats = server.stats()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await server.stop()
+
+    normal = [p for p in peers if p.mode == 'normal']
+    delivery = [lat for p in normal for _, lat in p.latencies]
+    # Diffusion complète: la trame i a atteint tous les clients normaux
+    last = {}
+    count = {}
+    for p in normal:
+        for i, lat in p.latencies:
+            last[i] = max(last.get(i, 0), lat)
+            count[i] = count.get(i, 0) + 1
+    complete = [lat for i, lat in last.items() if count[i] == len(normal)]
+    return {
+        'clients': clients, 'format': fmt, 'rate_hz': rate, 'frames': frames,
+        'received_min': min(len(p.latencies) for p in normal) if normal else 0,
+        'delivery_p50_ms': _percentile(delivery, 0.5) * 1000,
+        'delivery_p99_ms': _percentile(delivery, 0.99) * 1000,
+        'delivery_max_ms': max(delivery, default=0) * 1000,
+        'fanout_p50_ms': _percentile(complete, 0.5) * 1000,
+        'fanout_p99_ms': _percentile(complete, 0.99) * 1000,
+        'broadcast_mean_us': sum(cost) / len(cost) * 1e6,
+        'broadcast_p99_us': _percentile(cost, 0.99) * 1e6,
+        'normal_closed': sum(1 for p in normal if p.closed is not None),
+        'evictions': server.evictions,
+        'pings': min((p.pings for p in normal), default=0),
+        'server': stats,
+    }
+
+
+def run(clients=50, fmt=telemetry.FORMAT_BINARY, rate=20, duration_s=10, slow=0, stalled=0,
+        timeout_ms=3000):
+    """
+    Returns:
+        dict: latences (ms), coût de broadcast() (µs), clients déconnectés
+    """
+    return asyncio.run(_bench(clients, fmt, rate, duration_s, slow, stalled, timeout_ms))
+
+
+def print_report(r):
+    name = 'json' if r['format'] == telemetry.FORMAT_JSON else 'binaire'
+    print("%d clients, %s, %d Hz, %d trames" % (r['clients'], name, r['rate_hz'], r['frames']))
+    print("  réception par client: p50 %.2f ms, p99 %.2f ms, max %.2f ms" %
+          (r['delivery_p50_ms'], r['delivery_p99_ms'], r['delivery_max_ms']))
+    print("  diffusion complète:   p50 %.2f ms, p99 %.2f ms" %
+          (r['fanout_p50_ms'], r['fanout_p99_ms']))
+    print("  broadcast(): %.0f µs en moyenne, p99 %.0f µs" %
+          (r['broadcast_mean_us'], r['broadcast_p99_us']))
+    print("  trames reçues (client normal le moins servi): %d / %d, pings: %d" %
+          (r['received_min'], r['frames'], r['pings']))
+    st = r['server']
+    print("  serveur: %d envoyées, %d rejetées, %d déconnexions forcées" %
+          (st['sent'], st['dropped'], st['evicted']))
+    reasons = {}
+    for reason, t in r['evictions']:
+        reasons.setdefault(reason, []).append(t)
+    for reason, times in sorted(reasons.items()):
+        print("  déconnectés (%s): %d, entre %.1f et %.1f s" %
+              (reason, len(times), min(times), max(times)))
+    print("  clients normaux fermés par le serveur: %d" % r['normal_closed'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diffusion WebSocket vers N clients locaux")
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--format', choices=sorted(FORMATS), default='binary')
+    parser.add_argument('--rate', type=float, default=20, help="trames par seconde")
+    parser.add_argument('--duration', type=float, default=10, help="durée (s)")
+    parser.add_argument('--slow', type=int, default=0, help="clients lents (1 trame/s)")
+    parser.add_argument('--stalled', type=int, default=0, help="clients muets après 1 s")
+    parser.add_argument('--timeout', type=int, default=3000,
+                        help="client muet déconnecté après (ms), ping toutes les secondes")
+    parser.add_argument('--json', help="écrire les résultats dans ce fichier JSON")
+    args = parser.parse_args(argv)
+
+    r = run(args.clients, FORMATS[args.format], args.rate, args.duration,
+            args.slow, args.stalled, args.timeout)
+    print_report(r)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(r, f, indent=2)
+    # Un client normal ne doit jamais être déconnecté
+    return 1 if r['normal_closed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
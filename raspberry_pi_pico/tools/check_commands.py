@@ -0,0 +1,264 @@
+"""
+Vérification du protocole de commandes RX (CPython, simulateur)
+Exécute main_bluetooth.py non modifié avec un téléphone simulé qui
+écrit chaque opcode de commands.py (valeurs valides, hors plage, trop
+courtes, opcode inconnu) et vérifie:
+- les acquittements [0xAC, opcode, status] reçus sur TX, dans l'ordre
+  des écritures (ACK_SNAPSHOT sans réponse)
+- leur effet: format des trames suivantes, GET_STATS (détecteur,
+  fréquence du capteur, clients), GET_PERF, RESET
+- deux téléphones: SET_FORMAT et SET_RATE propres à chacun (trames
+  binaires pour l'un, JSON pour l'autre), publication au rythme du
+  client le plus rapide encore connecté, 500 ms quand le dernier part
+- SET_SENSOR ne change pas le nombre de pas: le runtime décime les
+  échantillons du capteur à la cadence des détecteurs, en lecture
+  périodique, FIFO et DATA_RDY
+
+Utilisation (depuis la racine du dépôt):
+    python raspberry_pi_pico/tools/check_commands.py
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import struct
+import sys
+
+FIRMWARE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if FIRMWARE_DIR not in sys.path:
+    sys.path.insert(0, FIRMWARE_DIR)
+
+from sim import machine, traces  # noqa: E402
+from sim.runner import Simulation  # noqa: E402
+
+import commands  # noqa: E402
+import runtime  # noqa: E402
+import telemetry  # noqa: E402
+
+SCRIPT = os.path.join(FIRMWARE_DIR, 'main_bluetooth.py')
+INT_PIN = 15
+MODES = ('periodic', 'fifo', 'data_ready')
+# Écart de pas toléré avec SET_SENSOR, par rapport à la lecture
+# périodique à 20 Hz sans SET_SENSOR
+STEP_TOLERANCE = 2
+
+OK = commands.STATUS_OK
+UNKNOWN = commands.STATUS_UNKNOWN
+BAD_LENGTH = commands.STATUS_BAD_LENGTH
+BAD_VALUE = commands.STATUS_BAD_VALUE
+
+# (instant ms, commande, statut attendu ou None sans réponse)
+SCRIPT_COMMANDS = (
+    (1200, bytes((commands.CMD_SET_DETECTOR, commands.DETECTOR_ADVANCED)), OK),
+    (1300, bytes((commands.CMD_SET_DETECTOR, 9)), BAD_VALUE),
+    (1400, struct.pack('<BH', commands.CMD_SET_RATE, 50), BAD_VALUE),
+    (1500, bytes((commands.CMD_SET_RATE, 0x01)), BAD_LENGTH),
+    (1600, struct.pack('<BH', commands.CMD_SET_RATE, 500), OK),
+    (1700, struct.pack('<BHB', commands.CMD_SET_SENSOR, 2000, 3), BAD_VALUE),
+    (1800, struct.pack('<BHB', commands.CMD_SET_SENSOR, 100, 3), OK),
+    (1900, struct.pack('<BHH', commands.CMD_SET_PROFILE, 100, 70), BAD_VALUE),
+    (2000, struct.pack('<BHH', commands.CMD_SET_PROFILE, 750, 72), OK),
+    (2100, struct.pack('<BBH', commands.CMD_SET_PUBLISH, 2, 5), BAD_VALUE),
+    (2200, struct.pack('<BBH', commands.CMD_SET_PUBLISH, commands.PUBLISH_PERIODIC, 5), OK),
+    (2300, bytes((commands.CMD_SUBSCRIBE, 0x10)), OK),
+    (2400, bytes((0x7F,)), UNKNOWN),
+    (2500, bytes((commands.CMD_SET_FORMAT, 9)), BAD_VALUE),
+    (2600, bytes((commands.CMD_SET_FORMAT, telemetry.FORMAT_BINARY)), OK),
+    (2700, bytes((commands.CMD_ACK_SNAPSHOT, 0)), None),
+    (2800, struct.pack('<BI', commands.CMD_SYNC, 0), OK),
+    (25000, bytes((commands.CMD_GET_PERF, 99)), BAD_VALUE),
+    (25100, bytes((commands.CMD_GET_PERF, 0)), OK),
+    (25200, bytes((commands.CMD_GET_STATS,)), OK),
+    (25300, bytes((commands.CMD_RESET,)), OK),
+    (25400, bytes((commands.CMD_GET_STATS,)), OK),
+)
+
+# Deux téléphones: A passe en binaire et ralentit à 2 s, B arrive (JSON,
+# 500 ms par défaut) puis repart, enfin A se déconnecte. (instant ms,
+# téléphone, action, publish_ms attendue par GET_STATS); à la fin, plus
+# de client: 500 ms
+RATE_MS = 2000
+STATS = bytes((commands.CMD_GET_STATS,))
+STATS_ACK = bytes((commands.ACK_MARKER, commands.CMD_GET_STATS))
+RATE_SCRIPT = (
+    (1000, 'a', 'connect', None),
+    (1050, 'a', 'exchange_mtu', None),
+    (1100, 'a', bytes((commands.CMD_SET_FORMAT, telemetry.FORMAT_BINARY)), None),
+    (1200, 'a', struct.pack('<BH', commands.CMD_SET_RATE, RATE_MS), None),
+    (1300, 'a', STATS, RATE_MS),
+    (3000, 'b', 'connect', None),
+    (3050, 'b', 'exchange_mtu', None),
+    (3200, 'b', STATS, 500),
+    (4000, 'b', 'disconnect', None),
+    (4200, 'a', STATS, RATE_MS),
+    (5000, 'a', 'disconnect', None),
+)
+
+
+def _runtime_class(mode):
+    """PedometerRuntime dont le pilote MPU est passé en mode FIFO ou DATA_RDY"""
+
+    class _Acquisition(runtime.PedometerRuntime):
+        def __init__(self, mpu, *args, **kwargs):
+            super().__init__(mpu, *args, **kwargs)
+            if mode == 'fifo':
+                mpu.enable_fifo()
+            elif mode == 'data_ready':
+                mpu.start_data_ready(machine.Pin(INT_PIN, machine.Pin.IN))
+
+    return _Acquisition
+
+
+def run(mode='periodic', sensor=True, seconds=30):
+    """
+    Rejoue la marche avec les commandes de SCRIPT_COMMANDS (sans
+    SET_SENSOR si sensor est faux)
+
+    Returns:
+        tuple: (acquittements décodés, notifications TX, runtime)
+    """
+    saved = runtime.PedometerRuntime
+    runtime.PedometerRuntime = _runtime_class(mode)
+    try:
+        with Simulation(trace=traces.walking(seconds),
+                        int_pin=INT_PIN if mode == 'data_ready' else None) as s:
+            phone = s.central()
+            s.at(1000, phone.connect)
+            s.at(1050, phone.exchange_mtu)
+            for t, command, _ in SCRIPT_COMMANDS:
+                if sensor or command[0] != commands.CMD_SET_SENSOR:
+                    s.at(t, lambda command=command: phone.write(command))
+            with contextlib.redirect_stdout(io.StringIO()):
+                scope = s.run_script(SCRIPT, seconds)
+    finally:
+        runtime.PedometerRuntime = saved
+    tx = phone.handle("6E400003-B5A3-F393-E0A9-E50E24DCCA9E")
+    received = [data for h, data in phone.received if h == tx]
+    acks = [commands.decode_ack(data) for data in received if data[0] == commands.ACK_MARKER]
+    return acks, received, scope['runtime']
+
+
+def check_protocol(acks, received):
+    """
+    Returns:
+        list: erreurs constatées
+    """
+    errors = []
+    expected = [(c[0], status) for _, c, status in SCRIPT_COMMANDS if status is not None]
+    got = [(a['opcode'], a['status']) for a in acks]
+    if got != expected:
+        errors.append("acquittements %r, attendus %r" % (got, expected))
+        return errors
+
+    stats = [a for a in acks if a['opcode'] == commands.CMD_GET_STATS]
+    before, after = stats
+    if before['detector'] != commands.DETECTOR_ADVANCED:
+        errors.append("GET_STATS: détecteur %d" % before['detector'])
+    if before['odr_hz'] != 100:
+        errors.append("GET_STATS: capteur à %d Hz" % before['odr_hz'])
+    if before['connections'] != 1 or before['publish_ms'] != 500:
+        errors.append("GET_STATS: %d clients, publication %d ms" %
+                      (before['connections'], before['publish_ms']))
+    if before['steps'] == 0 or after['steps'] != 0:
+        errors.append("RESET: %d pas avant, %d après" % (before['steps'], after['steps']))
+    perf = [a for a in acks if a['opcode'] == commands.CMD_GET_PERF and a['status'] == OK]
+    if not perf or perf[0]['count'] == 0:
+        errors.append("GET_PERF: aucune lecture chronométrée")
+
+    # Après SET_FORMAT binaire: plus de JSON, des trames v1 de 31 octets
+    i = max(k for k, data in enumerate(received) if data[:2] == bytes(
+        (commands.ACK_MARKER, commands.CMD_SET_FORMAT)))
+    later = [data for data in received[i + 1:] if data[0] != commands.ACK_MARKER]
+    frames = [data for data in later
+              if len(data) == telemetry.FRAME_SIZE and data[0] == telemetry.FRAME_VERSION]
+    if not frames or any(data[:1] == b'{' for data in later):
+        errors.append("SET_FORMAT: %d trames binaires après l'acquittement" % len(frames))
+    if not any(data[0] == 0xB5 for data in received):
+        errors.append("SYNC: aucune page d'historique")
+    return errors
+
+
+def check_clients(seconds=6):
+    """
+    Rejoue RATE_SCRIPT: format des trames de chaque téléphone, publish_ms
+    relevée par GET_STATS, puis à l'arrêt
+
+    Returns:
+        list: erreurs constatées
+    """
+    with Simulation(trace=traces.walking(seconds)) as s:
+        phones = {'a': s.central(), 'b': s.central()}
+        for t, name, action, _ in RATE_SCRIPT:
+            phone = phones[name]
+            if isinstance(action, str):
+                s.at(t, getattr(phone, action))
+            else:
+                s.at(t, lambda phone=phone, action=action: phone.write(action))
+        with contextlib.redirect_stdout(io.StringIO()):
+            scope = s.run_script(SCRIPT, seconds)
+    tx = phones['a'].handle("6E400003-B5A3-F393-E0A9-E50E24DCCA9E")
+    got = {name: [commands.decode_ack(data)['publish_ms'] for h, data in phone.received
+                  if h == tx and data[:2] == STATS_ACK]
+           for name, phone in phones.items()}
+    errors = []
+    for name in phones:
+        expected = [e for _, n, action, e in RATE_SCRIPT if n == name and action == STATS]
+        if got[name] != expected:
+            errors.append("GET_STATS %s: publication %r ms, %r attendue" %
+                          (name.upper(), got[name], expected))
+    # A: trames binaires après son SET_FORMAT; B: JSON seulement
+    received = {name: [data for h, data in phone.received
+                       if h == tx and data[0] != commands.ACK_MARKER]
+                for name, phone in phones.items()}
+    binary = {name: sum(len(data) == telemetry.FRAME_SIZE and data[0] == telemetry.FRAME_VERSION
+                        for data in frames)
+              for name, frames in received.items()}
+    json_lines = {name: sum(data[:1] == b'{' for data in frames)
+                  for name, frames in received.items()}
+    if not binary['a'] or json_lines['a'] > 1:
+        errors.append("A (binaire): %d trames binaires, %d lignes JSON" %
+                      (binary['a'], json_lines['a']))
+    if binary['b'] or not json_lines['b']:
+        errors.append("B (JSON): %d trames binaires, %d lignes JSON" %
+                      (binary['b'], json_lines['b']))
+    if scope['runtime'].publish_ms != 500:
+        errors.append("sans client: publication %d ms" % scope['runtime'].publish_ms)
+    return errors
+
+
+def _steps(acks):
+    for a in acks:
+        if a['opcode'] == commands.CMD_GET_STATS and a['status'] == OK:
+            return a['steps']
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Commandes RX et acquittements (simulateur)")
+    parser.add_argument('--duration', type=float, default=30, help="durée de la marche (s)")
+    args = parser.parse_args(argv)
+
+    # Référence: lecture périodique à 20 Hz, capteur à sa fréquence par défaut
+    ref_steps = _steps(run('periodic', sensor=False, seconds=args.duration)[0])
+    failures = 0
+    for mode in MODES:
+        acks, received, rt = run(mode, seconds=args.duration)
+        errors = check_protocol(acks, received)
+        # Pas comptés jusqu'au RESET (premier GET_STATS)
+        steps = _steps(acks)
+        if steps is None or ref_steps is None or abs(steps - ref_steps) > STEP_TOLERANCE:
+            errors.append("SET_SENSOR 100 Hz: %s pas, %s sans" % (steps, ref_steps))
+        failures += bool(errors)
+        print("%-10s %2d acquittements, %s pas (%s sans SET_SENSOR), %d échantillons "
+              "détectés: %s" % (mode, len(acks), steps, ref_steps, rt.samples,
+                                "OK" if not errors else "; ".join(errors)))
+    errors = check_clients()
+    failures += bool(errors)
+    print("2 clients  format et rythme propres à chacun: %s" %
+          ("OK" if not errors else "; ".join(errors)))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Équivalence FixedStepDetector (virgule fixe) / AdvancedStepDetector (CPython)
+Les deux détecteurs reçoivent les mêmes comptes bruts int16 que sur le
+Pico: la version flottante par le chemin du runtime (comptes / ACCEL_SCALE,
+magnitude en g), la version entière par update_raw() sur l'anneau int16.
+Compare les pas, trace par trace, pour plusieurs graines du bruit, à la
+fréquence des détecteurs (20 Hz: le runtime décime les échantillons du
+capteur; --rate pour d'autres fréquences).
+
+La version entière quantifie l'accélération (1/16 mg aux passages par
+zéro, 1 mg pour la validation des pics): un échantillon à moins d'une
+quantification de 1 g ou du seuil peut décaler un pas d'un échantillon.
+Tolérances, par trace:
+- nombre de pas: écart d'au plus STEP_TOLERANCE
+- horodatages: au plus SHIFT_TOLERANCE pas différents + 1 pour 200 pas
+- calories: écart relatif d'au plus CALORIE_TOLERANCE
+Le script échoue (code de sortie 1) si une trace sort d'une tolérance.
+
+Utilisation (depuis la racine du dépôt):
+    python raspberry_pi_pico/tools/check_fixed.py
+    python raspberry_pi_pico/tools/check_fixed.py --duration 600 --seeds 5
+    python raspberry_pi_pico/tools/check_fixed.py --rate 20 --rate 50 --rate 100
+"""
+
+import argparse
+import math
+import os
+import sys
+from array import array
+
+FIRMWARE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if FIRMWARE_DIR not in sys.path:
+    sys.path.insert(0, FIRMWARE_DIR)
+
+import sim  # noqa: E402  time.ticks_*, micropython.viper
+from sim import traces  # noqa: E402
+
+sim.install()
+
+from step_detector_advanced import AdvancedStepDetector  # noqa: E402
+from step_detector_fixed import FixedStepDetector  # noqa: E402
+
+STEP_TOLERANCE = 1
+SHIFT_TOLERANCE = 2
+CALORIE_TOLERANCE = 0.01
+
+TRACES = {
+    'walking': traces.walking,
+    'running': traces.running,
+    'stairs': traces.stairs,
+    'idle_vibration': traces.idle_vibration,
+    'arm_movement': traces.arm_movement,
+}
+
+
+def raw_samples(trace, rate_hz):
+    """Comptes bruts (t_ms, anneau int16 ax, ay, az entrelacés) comme le runtime"""
+    n = int(trace.duration_s * rate_hz)
+    times = []
+    raw = array('h', [0] * (3 * n))
+    for i in range(n):
+        t_us = i * 1000000 // rate_hz
+        ax, ay, az, _, _, _, _ = trace(t_us)
+        times.append(t_us // 1000)
+        raw[3 * i] = ax
+        raw[3 * i + 1] = ay
+        raw[3 * i + 2] = az
+    return times, raw
+
+
+def compare(trace, rate_hz, scale=traces.ACCEL_SCALE):
+    """
+    Returns:
+        dict: pas des deux détecteurs et horodatages qui diffèrent
+    """
+    times, raw = raw_samples(trace, rate_hz)
+    ref = AdvancedStepDetector()
+    fixed = FixedStepDetector(accel_scale=int(scale))
+    ref_steps = []
+    fixed_steps = []
+    for i, t in enumerate(times):
+        j = 3 * i
+        x = raw[j] / scale
+        y = raw[j + 1] / scale
+        z = raw[j + 2] / scale
+        if ref.update(math.sqrt(x * x + y * y + z * z), t):
+            ref_steps.append(t)
+        if fixed.update_raw(raw, j, t):
+            fixed_steps.append(t)
+    return {
+        'trace': trace.name, 'rate_hz': rate_hz, 'samples': len(times),
+        'steps': len(ref_steps), 'fixed_steps': len(fixed_steps),
+        'diff': sorted(set(ref_steps) ^ set(fixed_steps)),
+        'calories': ref.get_calories(), 'fixed_calories': fixed.get_calories(),
+    }
+
+
+def violations(r):
+    """
+    Returns:
+        list: tolérances dépassées par le rejeu r (vide si équivalent)
+    """
+    out = []
+    if abs(r['fixed_steps'] - r['steps']) > STEP_TOLERANCE:
+        out.append("%+d pas" % (r['fixed_steps'] - r['steps']))
+    if len(r['diff']) > SHIFT_TOLERANCE + r['steps'] // 200:
+        out.append("%d horodatages différents" % len(r['diff']))
+    if abs(r['fixed_calories'] - r['calories']) > CALORIE_TOLERANCE * max(r['calories'], 1.0):
+        out.append("calories %.2f / %.2f" % (r['fixed_calories'], r['calories']))
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Équivalence virgule fixe / flottants")
+    parser.add_argument('--duration', type=float, default=120, help="durée de chaque trace (s)")
+    parser.add_argument('--seeds', type=int, default=3, help="graines du bruit par trace")
+    parser.add_argument('--rate', type=int, action='append',
+                        help="fréquence(s) d'échantillonnage (Hz, 20 par défaut)")
+    args = parser.parse_args(argv)
+
+    failures = []
+    runs = identical = 0
+    for name, make in TRACES.items():
+        for seed in range(1, args.seeds + 1):
+            for rate in args.rate or (20,):
+                r = compare(make(args.duration, seed=seed), rate)
+                runs += 1
+                errors = violations(r)
+                if not r['diff'] and r['calories'] == r['fixed_calories']:
+                    identical += 1
+                    status = "identique"
+                elif not errors:
+                    status = "%d écart(s) tolérés: %s ms" % (len(r['diff']), r['diff'][:5])
+                else:
+                    failures.append((name, seed, rate))
+                    status = "HORS TOLÉRANCE: %s" % ", ".join(errors)
+                print("%-15s graine %d %4d Hz: %5d pas / %5d  %s" % (
+                    name, seed, rate, r['steps'], r['fixed_steps'], status))
+    print("%d/%d rejeux identiques, %d hors tolérance" % (identical, runs, len(failures)))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
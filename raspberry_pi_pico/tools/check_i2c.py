@@ -0,0 +1,128 @@
+"""
+Vérification de la lecture en rafale des pilotes MPU (CPython, bus simulé)
+read_all_raw() et get_all_data() doivent lire les 14 registres de données
+(ACCEL_XOUT_H..GYRO_ZOUT_L) en un seul appel readfrom_mem_into() sur le
+bus, sans autre transaction, et rendre l'échantillon écrit dans les
+registres du capteur simulé. read_fifo() vide une FIFO pleine en une
+lecture de FIFO_R_W sans dépasser sa taille (1024 octets sur MPU6050,
+512 sur MPU6500/MPU9250). Vérifié pour mpu6050.py et mpu_universal.py,
+avec les trois WHO_AM_I reconnus (MPU6050, MPU6500, MPU9250).
+
+Utilisation (depuis la racine du dépôt):
+    python raspberry_pi_pico/tools/check_i2c.py
+"""
+
+import importlib
+import os
+import sys
+
+FIRMWARE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if FIRMWARE_DIR not in sys.path:
+    sys.path.insert(0, FIRMWARE_DIR)
+
+import sim  # noqa: E402  machine, micropython, time.sleep()
+from sim.i2c import FakeI2C, FakeMPUDevice  # noqa: E402
+
+sim.install()
+
+MODULES = ('mpu6050', 'mpu_universal')
+WHO_AM_I = (0x68, 0x70, 0x71)
+SAMPLE = (1200, -3400, 16100, -2500, 150, -80, 30)
+
+
+class _RecordingI2C(FakeI2C):
+    """FakeI2C qui note chaque appel: (méthode, registre, octets)"""
+
+    def __init__(self, devices=None):
+        super().__init__(devices)
+        self.calls = []
+
+    def readfrom_mem(self, addr, memaddr, nbytes):
+        self.calls.append(('readfrom_mem', memaddr, nbytes))
+        return super().readfrom_mem(addr, memaddr, nbytes)
+
+    def readfrom_mem_into(self, addr, memaddr, buf):
+        self.calls.append(('readfrom_mem_into', memaddr, len(buf)))
+        super().readfrom_mem_into(addr, memaddr, buf)
+
+    def writeto_mem(self, addr, memaddr, buf):
+        self.calls.append(('writeto_mem', memaddr, len(buf)))
+        super().writeto_mem(addr, memaddr, buf)
+
+
+def check(module_name, who_am_i):
+    """
+    Returns:
+        list: erreurs constatées (vide si la lecture en rafale est correcte)
+    """
+    module = importlib.import_module(module_name)
+    device = FakeMPUDevice(who_am_i=who_am_i)
+    bus = _RecordingI2C({0x68: device})
+    mpu = module.MPU6050(bus)
+    device.set_raw(*SAMPLE)
+    burst = [('readfrom_mem_into', device.ACCEL_XOUT_H, 14)]
+    errors = []
+
+    bus.calls = []
+    raw = mpu.read_all_raw()
+    if bus.calls != burst:
+        errors.append("read_all_raw(): %r" % bus.calls)
+    if tuple(raw) != SAMPLE:
+        errors.append("read_all_raw() = %r, attendu %r" % (tuple(raw), SAMPLE))
+
+    bus.calls = []
+    data = mpu.get_all_data()
+    if bus.calls != burst:
+        errors.append("get_all_data(): %r" % bus.calls)
+    if abs(data['accel']['z'] - SAMPLE[2] / mpu.ACCEL_SCALE) > 1e-9:
+        errors.append("get_all_data() accel z = %r" % data['accel']['z'])
+    if abs(data['gyro']['x'] - SAMPLE[4] / mpu.GYRO_SCALE) > 1e-9:
+        errors.append("get_all_data() gyro x = %r" % data['gyro']['x'])
+    return errors
+
+
+def check_fifo(module_name, who_am_i):
+    """
+    Returns:
+        list: erreurs constatées (vide si la FIFO pleine est lue d'un coup)
+    """
+    module = importlib.import_module(module_name)
+    device = FakeMPUDevice(who_am_i=who_am_i)
+    bus = _RecordingI2C({0x68: device})
+    mpu = module.MPU6050(bus)
+    mpu.enable_fifo()
+    frames = device.fifo_size // mpu.FIFO_FRAME_SIZE
+    for i in range(frames):
+        device.set_raw(i, -i, 16384, 0, 2 * i, 0, -2 * i)
+        device.sample()
+    errors = []
+    if len(mpu._fifo_buf) > device.fifo_size:
+        errors.append("tampon FIFO de %d octets, FIFO de %d" % (len(mpu._fifo_buf),
+                                                               device.fifo_size))
+
+    bus.calls = []
+    n = mpu.read_fifo()
+    reads = [c for c in bus.calls if c[1] == device.FIFO_R_W]
+    if n != frames or reads != [('readfrom_mem_into', device.FIFO_R_W, frames * 12)]:
+        errors.append("read_fifo(): %d trames sur %d, %r" % (n, frames, reads))
+    values = [f[1:] for f in mpu.fifo_frames(n)]
+    if values != [(i, -i, 16384, 2 * i, 0, -2 * i) for i in range(n)]:
+        errors.append("fifo_frames(): trames altérées")
+    return errors
+
+
+def main(argv=None):
+    failures = 0
+    for name in MODULES:
+        for who_am_i in WHO_AM_I:
+            errors = check(name, who_am_i)
+            fifo_errors = check_fifo(name, who_am_i)
+            failures += bool(errors) + bool(fifo_errors)
+            print("%-14s WHO_AM_I 0x%02X: %s, FIFO %s" % (
+                name, who_am_i, "1 transaction" if not errors else "; ".join(errors),
+                "vidée d'un coup" if not fifo_errors else "; ".join(fifo_errors)))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
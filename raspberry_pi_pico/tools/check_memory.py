@@ -0,0 +1,171 @@
+"""
+Vérification de la mémoire des détecteurs sur une longue journée (CPython)
+Rejoue 24 h à 20 Hz dans chaque détecteur: chaque heure, 50 min de
+marche puis 10 min posé, avec pause() après IDLE_MS de repos comme le
+gestionnaire d'énergie (mise en veille). Vérifie:
+- plus de MIN_STEPS pas comptés
+- mémoire tenue par le code des détecteurs (tracemalloc, allocations
+  de step_detector*.py et ring_buffer.py encore vivantes) constante: pas
+  plus de MEMORY_TOLERANCE octets de plus qu'après la première heure
+- agrégats de step_times (TickWindow) conservés à travers les pauses:
+  un horodatage par pas compté, premier pas inchangé, cadence moyenne
+  sur toute la journée (get_average_cadence)
+
+Utilisation (depuis la racine du dépôt):
+    python raspberry_pi_pico/tools/check_memory.py
+    python raspberry_pi_pico/tools/check_memory.py --detector advanced --hours 2
+"""
+
+import argparse
+import gc
+import math
+import os
+import sys
+import tracemalloc
+from array import array
+
+FIRMWARE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if FIRMWARE_DIR not in sys.path:
+    sys.path.insert(0, FIRMWARE_DIR)
+
+import sim  # noqa: E402  time.ticks_* pour les détecteurs
+from sim import traces  # noqa: E402
+
+sim.install()
+
+from step_detector_advanced import AdvancedStepDetector  # noqa: E402
+from step_detector_fixed import FixedStepDetector  # noqa: E402
+from step_detector_fused import FusedStepDetector  # noqa: E402
+
+# Détecteurs qui comptent la marche des traces (le simple en manque la
+# plupart, voir tools/bench_detectors.py)
+DETECTORS = {
+    'advanced': lambda: AdvancedStepDetector(step_length=0.7),
+    'fused': lambda: FusedStepDetector(step_length=0.7),
+    'fixed': lambda: FixedStepDetector(step_length=0.7),
+}
+RATE_HZ = 20
+WALK_S = 3000
+REST_S = 600
+# Mise en veille du gestionnaire d'énergie (power.PowerManager idle_ms)
+IDLE_MS = 30000
+# Sur 24 h (20 h de marche): pas attendus au minimum
+MIN_STEPS = 100000
+# Croissance tolérée de la mémoire des détecteurs après la première heure
+MEMORY_TOLERANCE = 256
+# Allocations comptées: celles du code des détecteurs (pas celles des traces)
+_DETECTOR_FILTERS = [tracemalloc.Filter(True, os.path.join(FIRMWARE_DIR, pattern))
+                     for pattern in ('step_detector*.py', 'ring_buffer.py')]
+
+
+def _updater(detector):
+    """update(t_ms, ax, ay, az, gx, gy, gz) selon l'entrée du détecteur"""
+    if hasattr(detector, 'update_raw'):
+        # Comptes bruts int16, comme l'anneau du runtime
+        raw = array('h', (0, 0, 0))
+        scale = traces.ACCEL_SCALE
+
+        def update(t, ax, ay, az, gx, gy, gz):
+            for i, v in enumerate((ax, ay, az)):
+                raw[i] = max(-32768, min(32767, int(round(v * scale))))
+            detector.update_raw(raw, 0, t)
+        return update
+    if getattr(detector, 'uses_gyro', False):
+        def update(t, ax, ay, az, gx, gy, gz):
+            detector.update_imu(ax, ay, az, gx, gy, gz, t)
+        return update
+
+    def update(t, ax, ay, az, gx, gy, gz):
+        detector.update(math.sqrt(ax * ax + ay * ay + az * az), t)
+    return update
+
+
+def _detector_bytes():
+    gc.collect()
+    snapshot = tracemalloc.take_snapshot().filter_traces(_DETECTOR_FILTERS)
+    return sum(stat.size for stat in snapshot.statistics('filename'))
+
+
+def replay(factory, hours):
+    """
+    Returns:
+        dict: pas, mémoire des détecteurs après la première heure et au
+        plus haut ensuite, agrégats de step_times
+    """
+    tracemalloc.start()
+    try:
+        detector = factory()
+        update = _updater(detector)
+        first_step = None
+        memory = []
+        offset_ms = 0
+        for hour in range(hours):
+            segments = (traces.walking(WALK_S, seed=hour + 1),
+                        traces.still(REST_S, seed=1000 + hour))
+            for k, trace in enumerate(segments):
+                for t, ax, ay, az, gx, gy, gz in trace.samples(RATE_HZ):
+                    if k and t == IDLE_MS:
+                        detector.pause()
+                    update(offset_ms + t, ax, ay, az, gx, gy, gz)
+                    if first_step is None and detector.step_count:
+                        first_step = detector.step_times.first
+                offset_ms += int(trace.duration_s * 1000)
+            memory.append(_detector_bytes())
+    finally:
+        tracemalloc.stop()
+    times = detector.step_times
+    return {
+        'steps': detector.step_count,
+        'memory_base': memory[0],
+        'memory_max': max(memory[1:]) if len(memory) > 1 else memory[0],
+        'pushes': times.total,
+        'first': times.first,
+        'first_step': first_step,
+        'cadence': detector.get_average_cadence(),
+    }
+
+
+def violations(r, hours):
+    """
+    Returns:
+        list: écarts aux critères du docstring du module
+    """
+    errors = []
+    min_steps = MIN_STEPS * hours // 24
+    if r['steps'] < min_steps:
+        errors.append("%d pas, au moins %d attendus" % (r['steps'], min_steps))
+    growth = r['memory_max'] - r['memory_base']
+    if growth > MEMORY_TOLERANCE:
+        errors.append("mémoire +%d octets après la première heure" % growth)
+    if r['pushes'] != r['steps'] or r['first'] != r['first_step']:
+        errors.append("step_times: %d horodatages pour %d pas, premier %s au lieu de %s" %
+                      (r['pushes'], r['steps'], r['first'], r['first_step']))
+    # Cadence moyenne du premier au dernier pas, pauses comprises
+    expected = 60.0 * r['steps'] / (hours * (WALK_S + REST_S) - REST_S)
+    if not 0.9 * expected <= r['cadence'] <= 1.1 * expected:
+        errors.append("cadence moyenne %.1f pas/min, %.1f attendue" % (r['cadence'], expected))
+    return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mémoire des détecteurs sur 24 h de rejeu")
+    parser.add_argument('--detector', choices=sorted(DETECTORS), action='append',
+                        help="détecteur à vérifier (répétable, défaut: tous)")
+    parser.add_argument('--hours', type=int, default=24)
+    args = parser.parse_args(argv)
+
+    failures = 0
+    for name in args.detector or sorted(DETECTORS):
+        r = replay(DETECTORS[name], args.hours)
+        errors = violations(r, args.hours)
+        failures += bool(errors)
+        print("%-9s %6d pas en %d h, mémoire %d o après 1 h, %+d o ensuite, "
+              "cadence moyenne %.1f pas/min: %s" % (
+                  name, r['steps'], args.hours, r['memory_base'],
+                  r['memory_max'] - r['memory_base'], r['cadence'],
+                  "OK" if not errors else "; ".join(errors)))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
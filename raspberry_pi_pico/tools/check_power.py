@@ -0,0 +1,145 @@
+"""
+Vérification du gestionnaire d'énergie (CPython, simulateur)
+Exécute main_bluetooth.py non modifié (ADAPTIVE_POWER) sur un scénario
+qui passe par tous les états de power.py: marche (actif, 50 Hz), course
+(100 Hz), repos (veille, mode cycle) puis reprise (réveil), en lecture
+périodique, FIFO et DATA_RDY, et vérifie:
+- nombre de pas identique, à STEP_TOLERANCE près, à celui du même
+  scénario et du même mode avec le capteur à fréquence fixe: le
+  changement de fréquence du capteur ne change pas la cadence des
+  détecteurs (décimation du runtime); entre modes, à 1 % près de la
+  lecture périodique (phase des échantillons différente)
+- champs gyro de la télémétrie JSON non nuls en mouvement (gyroscope
+  allumé par défaut, GYRO_STANDBY = False)
+
+Utilisation (depuis la racine du dépôt):
+    python raspberry_pi_pico/tools/check_power.py
+    python raspberry_pi_pico/tools/check_power.py --detector fixed
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+
+FIRMWARE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if FIRMWARE_DIR not in sys.path:
+    sys.path.insert(0, FIRMWARE_DIR)
+
+from sim import machine, traces  # noqa: E402
+from sim.runner import Simulation  # noqa: E402
+
+import commands  # noqa: E402
+import power  # noqa: E402
+import runtime  # noqa: E402
+
+SCRIPT = os.path.join(FIRMWARE_DIR, 'main_bluetooth.py')
+INT_PIN = 15
+MODES = ('periodic', 'fifo', 'data_ready')
+# Détecteurs qui distinguent la course (état « course » du gestionnaire)
+DETECTORS = {'advanced': commands.DETECTOR_ADVANCED, 'fused': commands.DETECTOR_FUSED,
+             'fixed': commands.DETECTOR_FIXED}
+# Écart de pas toléré par rapport à la référence à fréquence fixe (même mode)
+STEP_TOLERANCE = 2
+
+
+def scenario():
+    """Nouvelle trace à chaque essai (le bruit est tiré au fil des échantillons)"""
+    return traces.sequence(traces.walking(60), traces.running(60), traces.walking(30),
+                           traces.still(45), traces.walking(60), name="states")
+
+
+class _FixedRate(power.PowerManager):
+    """Référence: capteur à active_odr, y compris en course"""
+
+    def __init__(self, mpu, ble=None, **kwargs):
+        super().__init__(mpu, ble, **kwargs)
+        self.running_odr = self.active_odr
+
+
+def _runtime_class(mode):
+    """PedometerRuntime dont le pilote MPU est passé en mode FIFO ou DATA_RDY"""
+
+    class _Acquisition(runtime.PedometerRuntime):
+        def __init__(self, mpu, *args, **kwargs):
+            super().__init__(mpu, *args, **kwargs)
+            if mode == 'fifo':
+                mpu.enable_fifo()
+            elif mode == 'data_ready':
+                mpu.start_data_ready(machine.Pin(INT_PIN, machine.Pin.IN))
+
+    return _Acquisition
+
+
+def run(detector, mode='periodic', fixed_rate=False):
+    """
+    Returns:
+        dict: pas, états traversés, champs gyro reçus par le téléphone
+    """
+    trace = scenario()
+    saved = power.PowerManager, runtime.PedometerRuntime
+    if fixed_rate:
+        power.PowerManager = _FixedRate
+    runtime.PedometerRuntime = _runtime_class(mode)
+    try:
+        with Simulation(trace=trace, int_pin=INT_PIN if mode == 'data_ready' else None) as s:
+            phone = s.central()
+            s.at(1000, phone.connect)
+            s.at(1050, phone.exchange_mtu)
+            s.at(1200, lambda: phone.write(bytes((commands.CMD_SET_DETECTOR, detector))))
+            with contextlib.redirect_stdout(io.StringIO()):
+                scope = s.run_script(SCRIPT, trace.duration_s)
+    finally:
+        power.PowerManager, runtime.PedometerRuntime = saved
+    pm = scope['power']
+    lines = phone.lines()
+    return {
+        'steps': scope['runtime'].detector.step_count,
+        'odr': pm.active_odr,
+        'running_ms': pm.state_ms[power.STATE_RUNNING],
+        'sleeps': pm.sleeps, 'wakes': pm.wakes,
+        'lines': len(lines),
+        'gyro_lines': sum(1 for m in lines if m['gyro']['x'] or m['gyro']['y']
+                          or m['gyro']['z']),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pas et gyroscope à travers les états d'énergie")
+    parser.add_argument('--detector', choices=sorted(DETECTORS), default='advanced')
+    args = parser.parse_args(argv)
+
+    trace = scenario()
+    detector = DETECTORS[args.detector]
+    print("%s, %.0f s, %d pas réels" % (trace.name, trace.duration_s, trace.steps))
+    base = None
+    failures = 0
+    for mode in MODES:
+        ref = run(detector, mode, fixed_rate=True)
+        r = run(detector, mode)
+        if base is None:
+            base = ref['steps']
+        errors = []
+        if abs(r['steps'] - ref['steps']) > STEP_TOLERANCE:
+            errors.append("%d pas, %d à fréquence fixe" % (r['steps'], ref['steps']))
+        # Entre modes d'acquisition, la phase des échantillons diffère
+        if abs(r['steps'] - base) > STEP_TOLERANCE + base // 100:
+            errors.append("%d pas, %d en lecture périodique" % (r['steps'], base))
+        if not r['running_ms'] or not r['sleeps'] or not r['wakes']:
+            errors.append("états non traversés (course %d ms, %d veilles, %d réveils)" %
+                          (r['running_ms'], r['sleeps'], r['wakes']))
+        if r['gyro_lines'] < r['lines'] // 2:
+            errors.append("gyro à 0 dans %d messages JSON sur %d" %
+                          (r['lines'] - r['gyro_lines'], r['lines']))
+        failures += bool(errors)
+        print("%-10s %4d pas (%d Hz fixe: %d), course %3.0f s, %d veilles / %d réveils, "
+              "gyro dans %d/%d messages: %s" % (
+                  mode, r['steps'], ref['odr'], ref['steps'], r['running_ms'] / 1000,
+                  r['sleeps'], r['wakes'], r['gyro_lines'], r['lines'],
+                  "OK" if not errors else "; ".join(errors)))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""
+Broker MQTT minimal pour les essais en local (CPython, asyncio)
+Remplace un vrai broker (Mosquitto...) sur le PC: le firmware Wi-Fi
+(mqtt_publisher.py) ou tools/bench_mqtt.py publient, l'application ou
+un autre client s'abonne.
+
+MQTT 3.1.1, sous-ensemble: CONNECT, PUBLISH (QoS 0 et 1, relayé en
+QoS 0), SUBSCRIBE / UNSUBSCRIBE (filtres + et #), PINGREQ, DISCONNECT.
+Pas de sessions persistantes, de messages retenus ni d'authentification.
+
+Utilisation (depuis la racine du dépôt):
+    python raspberry_pi_pico/tools/mqtt_broker.py --port 1883 --verbose
+"""
+
+import argparse
+import asyncio
+import struct
+import sys
+import time
+
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+PUBACK = 4
+SUBSCRIBE = 8
+SUBACK = 9
+UNSUBSCRIBE = 10
+UNSUBACK = 11
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+
+
+def topic_matches(pattern, topic):
+    """Filtre d'abonnement (+ un niveau, # la suite) appliqué à un sujet"""
+    p = pattern.split('/')
+    t = topic.split('/')
+    for i, level in enumerate(p):
+        if level == '#':
+            return True
+        if i >= len(t) or (level != '+' and level != t[i]):
+            return False
+    return len(p) == len(t)
+
+
+def _packet(kind, body=b"", flags=0):
+    n = len(body)
+    out = bytearray((kind << 4 | flags,))
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        out.append(b | 0x80 if n else b)
+        if not n:
+            return bytes(out) + body
+
+
+def _string(data, i):
+    n = struct.unpack_from('!H', data, i)[0]
+    return data[i + 2:i + 2 + n].decode(), i + 2 + n
+
+
+class _Session:
+    def __init__(self, writer):
+        self.writer = writer
+        self.client_id = None
+        self.filters = set()
+
+
+class Broker:
+    """
+    Broker en mémoire
+
+    on_publish(client_id, topic, payload, t) est appelé pour chaque
+    PUBLISH reçu (t: time.perf_counter() à la réception).
+    """
+
+    def __init__(self, on_publish=None, verbose=False):
+        self.on_publish = on_publish
+        self.verbose = verbose
+        self._server = None
+        self._sessions = set()
+        self.port = None
+        self.connects = []      # (client_id, time.perf_counter())
+        self.messages = 0
+        self.bytes = 0
+
+    async def start(self, host='127.0.0.1', port=1883):
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self, abort=False):
+        """Ferme l'écoute et les connexions (abort: coupure brutale, comme une panne)"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for s in list(self._sessions):
+            if abort:
+                s.writer.transport.abort()
+            else:
+                s.writer.close()
+        self._sessions.clear()
+
+    def _log(self, *args):
+        if self.verbose:
+            print("[broker]", *args)
+
+    async def _read_packet(self, reader):
+        head = await reader.readexactly(1)
+        n = 0
+        shift = 0
+        while True:
+            b = (await reader.readexactly(1))[0]
+            n |= (b & 0x7F) << shift
+            if b < 0x80:
+                break
+            shift += 7
+        return head[0], await reader.readexactly(n) if n else b""
+
+    async def _handle(self, reader, writer):
+        session = _Session(writer)
+        self._sessions.add(session)
+        try:
+            while True:
+                head, body = await self._read_packet(reader)
+                kind = head >> 4
+                if kind == CONNECT:
+                    proto, i = _string(body, 0)
+                    level, flags, keepalive = struct.unpack_from('!BBH', body, i)
+                    session.client_id, _ = _string(body, i + 4)
+                    self.connects.append((session.client_id, time.perf_counter()))
+                    code = 0 if proto == 'MQTT' and level == 4 else 1
+                    writer.write(_packet(CONNACK, bytes((0, code))))
+                    self._log("CONNECT", session.client_id, "keepalive", keepalive)
+                    if code:
+                        return
+                elif kind == PUBLISH:
+                    qos = (head >> 1) & 3
+                    topic, i = _string(body, 0)
+                    if qos:
+                        packet_id = body[i:i + 2]
+                        i += 2
+                        writer.write(_packet(PUBACK, packet_id))
+                    payload = body[i:]
+                    self.messages += 1
+                    self.bytes += len(body) + 2
+                    self._log("PUBLISH", topic, len(payload), "octets")
+                    if self.on_publish is not None:
+                        self.on_publish(session.client_id, topic, payload, time.perf_counter())
+                    self._route(topic, payload)
+                elif kind == SUBSCRIBE:
+                    packet_id = body[:2]
+                    i = 2
+                    granted = bytearray()
+                    while i < len(body):
+                        pattern, i = _string(body, i)
+                        i += 1
+                        session.filters.add(pattern)
+                        granted.append(0)
+                    writer.write(_packet(SUBACK, packet_id + bytes(granted)))
+                    self._log("SUBSCRIBE", session.client_id, sorted(session.filters))
+                elif kind == UNSUBSCRIBE:
+                    i = 2
+                    while i < len(body):
+                        pattern, i = _string(body, i)
+                        session.filters.discard(pattern)
+                    writer.write(_packet(UNSUBACK, body[:2]))
+                elif kind == PINGREQ:
+                    writer.write(_packet(PINGRESP))
+                elif kind == DISCONNECT:
+                    return
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._sessions.discard(session)
+            writer.close()
+
+    def _route(self, topic, payload):
+        message = None
+        for s in self._sessions:
+            if any(topic_matches(f, topic) for f in s.filters):
+                if message is None:
+                    t = topic.encode()
+                    message = _packet(PUBLISH, struct.pack('!H', len(t)) + t + payload)
+                s.writer.write(message)
+
+
+async def _serve(port, verbose):
+    broker = Broker(verbose=verbose)
+    await broker.start('0.0.0.0', port)
+    print("Broker MQTT sur le port %d" % broker.port)
+    await asyncio.Event().wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Broker MQTT minimal (essais en local)")
+    parser.add_argument('--port', type=int, default=1883)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve(args.port, args.verbose))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
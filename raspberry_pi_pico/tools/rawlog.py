@@ -0,0 +1,289 @@
+"""
+Lecture des journaux bruts du capteur (côté serveur, NumPy)
+
+Format CSV (une ligne par échantillon, en-tête facultatif):
+    t_ms,ax,ay,az[,gx,gy,gz]
+- t_ms: horodatage en ms (ticks_ms du Pico ou temps absolu)
+- ax, ay, az: accélération en g; gx, gy, gz: vitesse angulaire en °/s
+
+Format binaire de l'enregistreur embarqué (raw_recorder.py, fichiers .bin):
+en-tête (16 octets en v1; 32 en v2, avec numéro de démarrage et heure)
+puis trames '>I6h' (ticks_ms, accel et gyro int16 bruts), lues par memmap
+sans copie.
+
+Nom de fichier: <appareil>_<suffixe>.csv|.bin (ex: pico-07_2026-10-18.csv,
+e6613810632c2a2b_000042.bin); les fichiers d'un même appareil sont
+traités dans l'ordre des noms.
+
+Temps des échantillons (LogClock, partagé par les fichiers d'un appareil):
+ms depuis 1970 quand l'heure est connue (CSV en temps absolu, en-tête v2
+avec l'horloge réglée), sinon ticks_ms déroulés (ms depuis le démarrage)
+au sein d'une session: fichiers d'un même démarrage (en-tête v2), ou un
+seul fichier (CSV en ticks_ms, en-tête v1).
+"""
+
+import os
+import struct
+
+import numpy as np
+
+DEVICE_SEP = '_'
+
+
+def device_id(path):
+    """Identifiant de l'appareil d'après le nom du fichier"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return stem.split(DEVICE_SEP, 1)[0]
+
+
+def _parse_csv_block(lines, ncols):
+    data = np.fromstring(','.join(lines), sep=',')
+    if len(data) % ncols:
+        raise ValueError("ligne incomplète (attendu %d colonnes)" % ncols)
+    return data.reshape(-1, ncols)
+
+
+def iter_csv(path, chunk_rows=1 << 20, clock=None):
+    """
+    Lit un journal CSV par blocs (mémoire bornée)
+
+    Args:
+        clock: LogClock de l'appareil (par défaut, propre au fichier)
+
+    Yields:
+        tuple: (t_ms int64, accel float64 (n, 3), gyro float64 (n, 3) ou None)
+    """
+    if clock is None:
+        clock = LogClock()
+    clock.start_csv(path)
+    ncols = None
+    lines = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or not (line[0].isdigit() or line[0] == '-'):
+                continue  # en-tête, commentaire, ligne vide
+            if ncols is None:
+                ncols = line.count(',') + 1
+                if ncols not in (4, 7):
+                    raise ValueError("%s: %d colonnes (attendu 4 ou 7)" % (path, ncols))
+            lines.append(line)
+            if len(lines) >= chunk_rows:
+                yield _split(_parse_csv_block(lines, ncols), clock)
+                lines = []
+    if lines:
+        yield _split(_parse_csv_block(lines, ncols), clock)
+
+
+def _split(block, clock):
+    t = clock.csv_times(block[:, 0].astype(np.int64))
+    accel = block[:, 1:4]
+    gyro = block[:, 4:7] if block.shape[1] == 7 else None
+    return t, accel, gyro
+
+
+# ---------- Format binaire (raw_recorder.py) ----------
+
+BIN_MAGIC = b'PRAW'
+# Par version: format et taille de l'en-tête
+BIN_HEADER_FMT = {1: '>4sBBHHHI', 2: '>4sBBHHHIIII4x'}
+BIN_HEADER_SIZE = {1: 16, 2: 32}
+BIN_FRAME_DTYPE = np.dtype([('t', '>u4'), ('ax', '>i2'), ('ay', '>i2'), ('az', '>i2'),
+                            ('gx', '>i2'), ('gy', '>i2'), ('gz', '>i2')])
+TICKS_PERIOD = 1 << 30
+
+
+def read_bin(path):
+    """
+    Ouvre un journal binaire en memmap
+
+    En-tête v1 (sans numéro de démarrage ni heure): boot et epoch_s à None.
+    epoch_s vaut aussi None quand l'horloge du Pico n'était pas réglée;
+    sinon epoch_ticks est le ticks_ms de cet instant.
+
+    Returns:
+        tuple: (en-tête dict, trames np.memmap de BIN_FRAME_DTYPE)
+    """
+    size = max(BIN_HEADER_SIZE.values())
+    with open(path, 'rb') as f:
+        raw = f.read(size)
+    version = raw[4] if len(raw) > 4 else None
+    if raw[:4] != BIN_MAGIC or version not in BIN_HEADER_FMT:
+        raise ValueError("%s: pas un journal brut PRAW v1 ou v2" % path)
+    header_size = BIN_HEADER_SIZE[version]
+    if len(raw) < header_size:
+        raise ValueError("%s: en-tête tronqué" % path)
+    fields = struct.unpack(BIN_HEADER_FMT[version], raw[:header_size])
+    _, _, frame_size, accel_lsb, gyro_lsb10, sample_ms, seq = fields[:7]
+    if frame_size != BIN_FRAME_DTYPE.itemsize:
+        raise ValueError("%s: trames de %d octets" % (path, frame_size))
+    boot, epoch_s, epoch_ticks = fields[7:] if version >= 2 else (None, 0, 0)
+    header = {'version': version, 'accel_lsb': accel_lsb, 'gyro_lsb': gyro_lsb10 / 10.0,
+              'sample_ms': sample_ms, 'seq': seq, 'boot': boot,
+              'epoch_s': epoch_s or None, 'epoch_ticks': epoch_ticks}
+    # Une trame partielle en fin de fichier (coupure d'alimentation) est ignorée
+    n = (os.path.getsize(path) - header_size) // frame_size
+    if n <= 0:
+        return header, np.zeros(0, dtype=BIN_FRAME_DTYPE)
+    return header, np.memmap(path, dtype=BIN_FRAME_DTYPE, mode='r',
+                             offset=header_size, shape=(n,))
+
+
+def unwrap_ticks(ticks, base=0, prev=None):
+    """
+    ticks_ms bouclant sur 2^30 -> temps monotone int64 en ms
+
+    Chaque tick garde sa valeur, plus 2^30 par rebouclage depuis le
+    premier (ms depuis le démarrage du Pico si base part de 0 au premier
+    fichier du démarrage), pas le temps écoulé depuis le premier échantillon.
+
+    Returns:
+        tuple: (temps déroulés, base, dernier tick) à repasser au bloc suivant
+    """
+    t = ticks.astype(np.int64) & (TICKS_PERIOD - 1)
+    if not len(t):
+        return t, base, prev
+    first = t[0] if prev is None else prev
+    steps = np.diff(np.concatenate(([first], t)))
+    wraps = np.cumsum(steps < -(TICKS_PERIOD // 2)) * TICKS_PERIOD
+    out = t + base + wraps
+    return out, base + int(wraps[-1]), int(t[-1])
+
+
+class LogClock:
+    """
+    Temps des échantillons d'un appareil, fichier après fichier (dans l'ordre)
+
+    session identifie la base de temps du fichier en cours: None pour un
+    temps absolu (ms depuis 1970, comparable d'un démarrage à l'autre),
+    sinon le numéro de démarrage (en-tête v2) ou le nom du fichier (CSV en
+    ticks_ms, en-tête v1). sessions compte les changements de base de
+    temps (nouveau démarrage): les pas d'avant n'ont plus de lien avec
+    les suivants.
+    """
+
+    def __init__(self):
+        self.session = None
+        self.sessions = 0
+        self._boot = None
+        self._base = 0
+        self._prev = None
+        self._offset = None     # ms ajoutées aux ticks déroulés (heure connue)
+        self._epoch = None      # heure de l'en-tête du fichier, pas encore appliquée
+        self._csv_path = None
+
+    def _new_session(self, boot):
+        self._boot = boot
+        self._base = 0
+        self._prev = None
+        self._offset = None
+        self.sessions += 1
+
+    def start_bin(self, path, header):
+        """Nouveau fichier binaire (en-tête de read_bin)"""
+        boot = header['boot']
+        if boot is None or boot != self._boot:
+            # En-tête v1 (démarrage inconnu) ou nouveau démarrage: ticks à 0
+            self._new_session(boot)
+        epoch_s = header['epoch_s']
+        # Heure à la seconde: celle du premier fichier qui la porte vaut
+        # pour tout le démarrage (pas de saut d'un fichier au suivant)
+        self._epoch = None
+        if epoch_s is not None and self._offset is None:
+            self._epoch = (epoch_s * 1000, header['epoch_ticks'])
+        if self._epoch is not None or self._offset is not None:
+            self.session = None
+        else:
+            self.session = boot if boot is not None else os.path.basename(path)
+
+    def bin_times(self, ticks):
+        """ticks_ms bruts d'un bloc -> temps déroulés (absolus si l'heure est connue)"""
+        t, self._base, self._prev = unwrap_ticks(ticks, self._base, self._prev)
+        if self._epoch is not None and len(t):
+            # Heure de l'en-tête (à la seconde), prise à l'instant epoch_ticks
+            epoch_ms, epoch_ticks = self._epoch
+            first = int(t[0])
+            self._offset = epoch_ms - first + _ticks_diff(first, epoch_ticks)
+            self._epoch = None
+        return t if self._offset is None else t + self._offset
+
+    def start_csv(self, path):
+        """Nouveau fichier CSV: temps absolu ou ticks_ms d'après ses valeurs"""
+        self._csv_path = path
+
+    def csv_times(self, t):
+        """Temps d'un bloc CSV, inchangés"""
+        if self._csv_path is not None and len(t):
+            # Au-delà de 2^30 ms, ce ne sont pas des ticks_ms: temps absolu
+            if t[0] < TICKS_PERIOD:
+                self._new_session(None)
+                self.session = os.path.basename(self._csv_path)
+            elif self.session is not None or not self.sessions:
+                self._new_session(None)
+                self.session = None
+            self._csv_path = None
+        return t
+
+
+def _ticks_diff(a, b):
+    """time.ticks_diff de MicroPython (ticks sur 2^30)"""
+    half = TICKS_PERIOD // 2
+    return ((a - b + half) & (TICKS_PERIOD - 1)) - half
+
+
+def iter_bin(path, chunk_rows=1 << 20, clock=None):
+    """Lit un journal binaire par blocs, mêmes sorties qu'iter_csv"""
+    header, frames = read_bin(path)
+    if clock is None:
+        clock = LogClock()
+    clock.start_bin(path, header)
+    accel_scale = float(header['accel_lsb'])
+    gyro_scale = header['gyro_lsb']
+    for start in range(0, len(frames), chunk_rows):
+        block = frames[start:start + chunk_rows]
+        t = clock.bin_times(block['t'])
+        accel = np.stack((block['ax'], block['ay'], block['az']), axis=1) / accel_scale
+        gyro = np.stack((block['gx'], block['gy'], block['gz']), axis=1) / gyro_scale
+        yield t, accel, gyro
+
+
+def iter_log(path, chunk_rows=1 << 20, clock=None):
+    """
+    Lit un journal brut selon son extension (voir READERS)
+
+    Args:
+        clock: LogClock partagé par les fichiers d'un appareil, lus dans
+            l'ordre (continuité des ticks_ms d'un fichier au suivant)
+    """
+    ext = os.path.splitext(path)[1].lower()
+    reader = READERS.get(ext)
+    if reader is None:
+        raise ValueError("format de journal inconnu: %s" % path)
+    return reader(path, chunk_rows, clock)
+
+
+def magnitude(accel):
+    """|accel| en g, comme le firmware (sqrt(x² + y² + z²))"""
+    x = accel[:, 0]
+    y = accel[:, 1]
+    z = accel[:, 2]
+    return np.sqrt(x * x + y * y + z * z)
+
+
+def write_csv(path, t_ms, accel, gyro=None):
+    """Écrit un journal CSV (traces simulées, exports)"""
+    cols = [np.asarray(t_ms).reshape(-1, 1), np.asarray(accel)]
+    header = "t_ms,ax,ay,az"
+    if gyro is not None:
+        cols.append(np.asarray(gyro))
+        header += ",gx,gy,gz"
+    data = np.hstack(cols)
+    fmt = ['%d'] + ['%.5f'] * (data.shape[1] - 1)
+    np.savetxt(path, data, delimiter=',', fmt=fmt, header=header, comments='')
+
+
+# Lecteurs par extension de fichier
+READERS = {
+    '.csv': iter_csv,
+    '.bin': iter_bin,
+}
@@ -0,0 +1,249 @@
+"""
+Retraitement en masse des journaux bruts d'une flotte de Pico
+Un processus par appareil (pool), détecteur au choix, agrégats par minute
+
+Utilisation (depuis la racine du dépôt):
+    python raspberry_pi_pico/tools/reprocess.py logs/*.csv -o minutes.csv
+    python raspberry_pi_pico/tools/reprocess.py logs/ --devices devices.json -j 8
+
+devices.json donne les paramètres de chaque utilisateur:
+    {"pico-07": {"step_length": 0.72, "user_weight": 64}, ...}
+
+Sortie CSV, une ligne par appareil et par minute, écrite au fil des appareils
+terminés:
+    device,session,minute_ms,samples,steps,distance_m,calories,activity
+minute_ms est en ms depuis 1970 quand l'heure est connue (session vide),
+sinon depuis le démarrage du Pico: session donne alors le numéro de
+démarrage (journaux binaires v2) ou le fichier (voir rawlog.LogClock).
+Le débit (échantillons/s) est affiché sur stderr.
+"""
+
+import argparse
+import bisect
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+FIRMWARE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if FIRMWARE_DIR not in sys.path:
+    sys.path.insert(0, FIRMWARE_DIR)
+
+import numpy as np  # noqa: E402
+
+import rawlog  # noqa: E402
+import telemetry  # noqa: E402
+from step_batch import AdvancedStepBatch  # noqa: E402
+
+MINUTE_MS = 60000
+DEFAULT_STEP_LENGTH = 0.7
+DEFAULT_USER_WEIGHT = 70
+
+# Seuils de vitesse (km/h) d'AdvancedStepDetector.get_activity_type,
+# dans l'ordre de telemetry.ACTIVITIES
+_ACTIVITY_LIMITS_KMH = (0.5, 3.2, 4.8, 6.4)
+
+
+def activity_type(speed):
+    return telemetry.ACTIVITIES[bisect.bisect_right(_ACTIVITY_LIMITS_KMH, speed * 3.6)]
+
+
+# ---------- Détecteurs ----------
+
+class _StreamRunner:
+    """Détecteur embarqué rejoué échantillon par échantillon"""
+
+    def __init__(self, detector):
+        self.detector = detector
+
+    def process(self, t, mag):
+        d = self.detector
+        index, times, speed, calories = [], [], [], []
+        advanced = hasattr(d, 'get_calories')
+        for i, (now, m) in enumerate(zip(t.tolist(), mag.tolist())):
+            if d.update(m, now):
+                index.append(i)
+                times.append(now)
+                speed.append(d.get_speed())
+                # StepDetector: même estimation que runtime.metrics()
+                calories.append(d.get_calories() if advanced else d.step_count * 0.04)
+        return {
+            'step_index': np.array(index, dtype=np.int64),
+            'step_time': np.array(times, dtype=np.int64),
+            'speed': np.array(speed, dtype=np.float64),
+            'calories': np.array(calories, dtype=np.float64),
+        }
+
+
+def _make_detector(name, step_length, user_weight):
+    if name == 'advanced':
+        return AdvancedStepBatch(step_length=step_length, user_weight=user_weight)
+    # Détecteurs embarqués: time.ticks_* fournis par le simulateur
+    import sim
+    sim.install()
+    if name == 'advanced-stream':
+        from step_detector_advanced import AdvancedStepDetector
+        return _StreamRunner(AdvancedStepDetector(step_length=step_length, user_weight=user_weight))
+    from step_detector import StepDetector
+    return _StreamRunner(StepDetector(step_length=step_length))
+
+
+DETECTORS = ('advanced', 'advanced-stream', 'simple')
+
+
+# ---------- Traitement d'un appareil (processus du pool) ----------
+
+class MinuteAggregator:
+    """
+    Agrégats par minute d'un appareil, alimentés bloc par bloc
+
+    Minutes repérées par (session, minute_ms): deux démarrages dont les
+    ticks_ms se recouvrent ne se mélangent pas.
+    """
+
+    def __init__(self, step_length):
+        self.step_length = step_length
+        # (session, minute_ms) -> [échantillons, pas, calories, vitesse du dernier pas]
+        self.minutes = {}
+        self.calories = 0.0
+        self._order = {}    # session -> rang d'apparition (ordre des fichiers)
+
+    def restart(self):
+        """Nouveau détecteur (nouvelle session): calories cumulées à 0"""
+        self.calories = 0.0
+
+    def add(self, session, t, result):
+        minutes = self.minutes
+        self._order.setdefault(session, len(self._order))
+        sample_min, sample_counts = np.unique(t // MINUTE_MS, return_counts=True)
+        for m, n in zip(sample_min.tolist(), sample_counts.tolist()):
+            entry = minutes.get((session, m * MINUTE_MS))
+            if entry is None:
+                minutes[(session, m * MINUTE_MS)] = [n, 0, 0.0, 0.0]
+            else:
+                entry[0] += n
+        if not len(result['step_time']):
+            return
+        step_min = result['step_time'] // MINUTE_MS
+        # Dernier pas de chaque minute (step_time croissant)
+        last = np.nonzero(np.append(step_min[1:] != step_min[:-1], True))[0]
+        first = np.append(0, last[:-1] + 1)
+        for f, l in zip(first.tolist(), last.tolist()):
+            entry = minutes[(session, int(step_min[l]) * MINUTE_MS)]
+            cal = float(result['calories'][l])
+            entry[1] += l - f + 1
+            entry[2] += cal - self.calories
+            entry[3] = float(result['speed'][l])
+            self.calories = cal
+
+    def rows(self, device):
+        # Sessions dans l'ordre des fichiers, minutes croissantes
+        order = self._order
+        for key in sorted(self.minutes, key=lambda k: (order[k[0]], k[1])):
+            session, minute = key
+            samples, steps, calories, speed = self.minutes[key]
+            yield (device, '' if session is None else session, minute, samples, steps,
+                   round(steps * self.step_length, 2), round(calories, 3),
+                   activity_type(speed) if steps else telemetry.ACTIVITIES[0])
+
+
+def process_device(job):
+    """
+    Traite tous les fichiers d'un appareil, dans l'ordre
+
+    Returns:
+        tuple: (device, lignes par minute, échantillons, durée en s)
+    """
+    device, paths, detector_name, params = job
+    t0 = time.perf_counter()
+    step_length = params.get('step_length', DEFAULT_STEP_LENGTH)
+    user_weight = params.get('user_weight', DEFAULT_USER_WEIGHT)
+    clock = rawlog.LogClock()
+    detector = None
+    sessions = 0
+    agg = MinuteAggregator(step_length)
+    samples = 0
+    for path in paths:
+        for t, accel, _ in rawlog.iter_log(path, clock=clock):
+            if detector is None or clock.sessions != sessions:
+                # Nouveau démarrage: détecteur neuf, comme le firmware
+                sessions = clock.sessions
+                detector = _make_detector(detector_name, step_length, user_weight)
+                agg.restart()
+            agg.add(clock.session, t, detector.process(t, rawlog.magnitude(accel)))
+            samples += len(t)
+    return device, list(agg.rows(device)), samples, time.perf_counter() - t0
+
+
+# ---------- CLI ----------
+
+def collect_files(inputs):
+    """Fichiers journaux (dossiers parcourus récursivement), groupés par appareil"""
+    files = []
+    for p in inputs:
+        if os.path.isdir(p):
+            for root, _, names in os.walk(p):
+                files.extend(os.path.join(root, n) for n in names
+                             if os.path.splitext(n)[1].lower() in rawlog.READERS)
+        else:
+            files.append(p)
+    devices = {}
+    for path in sorted(files, key=os.path.basename):
+        devices.setdefault(rawlog.device_id(path), []).append(path)
+    return devices
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Retraitement des journaux bruts par appareil")
+    parser.add_argument('inputs', nargs='+', help="fichiers ou dossiers de journaux")
+    parser.add_argument('-o', '--out', help="CSV des agrégats par minute (défaut: stdout)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help="processus")
+    parser.add_argument('--detector', choices=DETECTORS, default='advanced')
+    parser.add_argument('--devices', help="JSON des paramètres par appareil (step_length, user_weight)")
+    args = parser.parse_args(argv)
+
+    params = {}
+    if args.devices:
+        with open(args.devices) as f:
+            params = json.load(f)
+    devices = collect_files(args.inputs)
+    if not devices:
+        parser.error("aucun journal trouvé")
+    # Les plus gros appareils d'abord: meilleure répartition sur le pool
+    jobs = sorted(((dev, paths, args.detector, params.get(dev, {}))
+                   for dev, paths in devices.items()),
+                  key=lambda job: -sum(os.path.getsize(p) for p in job[1]))
+
+    out = open(args.out, 'w', newline='') if args.out else sys.stdout
+    writer = csv.writer(out)
+    writer.writerow(('device', 'session', 'minute_ms', 'samples', 'steps', 'distance_m',
+                     'calories', 'activity'))
+    total = 0
+    busy = 0.0
+    t0 = time.perf_counter()
+    try:
+        with multiprocessing.Pool(min(args.jobs, len(jobs))) as pool:
+            for device, rows, samples, elapsed in pool.imap_unordered(process_device, jobs):
+                writer.writerows(rows)
+                out.flush()
+                total += samples
+                busy += elapsed
+                print("[INFO] %s: %d échantillons en %.2f s (%.0f éch/s)" %
+                      (device, samples, elapsed, samples / elapsed if elapsed else 0.0),
+                      file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    wall = time.perf_counter() - t0
+    print("[INFO] %d appareils, %d échantillons en %.2f s: %.0f éch/s "
+          "(%d processus, efficacité %.0f%%)" %
+          (len(jobs), total, wall, total / wall if wall else 0.0, args.jobs,
+           100.0 * busy / (wall * min(args.jobs, len(jobs))) if wall else 0.0),
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,331 @@
+"""
+AdvancedStepDetector par lots (NumPy), pour le retraitement hors ligne
+Mêmes pas, vitesses, cadences et calories que le détecteur embarqué,
+au bit près, sur des tableaux d'horodatages et de magnitudes
+
+- historique |accel|: stockage float32 et sommes glissantes reproduites
+  par cumsum (mêmes additions, dans le même ordre, que RingBuffer.push,
+  y compris le recalcul exact à chaque tour complet)
+- passages par zéro: détectés en vectoriel, puis seuls les candidats
+  (quelques par seconde) passent dans une boucle séquentielle pour
+  l'anti-rebond, la fréquence et les calories, qui dépendent des pas
+  précédents
+
+Utilisation:
+    batch = AdvancedStepBatch(step_length=0.7, user_weight=70)
+    result = batch.process(t_ms, magnitudes)   # appelable par blocs
+    result['step_index'], result['speed'], batch.total_calories
+
+    python raspberry_pi_pico/tools/step_batch.py   # contrôle de conformité
+"""
+
+import os
+import sys
+
+import numpy as np
+
+# Comme MicroPython: les ticks bouclent sur 2^30
+_TICKS_PERIOD = 1 << 30
+_TICKS_MAX = _TICKS_PERIOD - 1
+_TICKS_HALF = _TICKS_PERIOD // 2
+
+
+def ticks_diff(ticks1, ticks2):
+    return ((ticks1 - ticks2 + _TICKS_HALF) & _TICKS_MAX) - _TICKS_HALF
+
+
+class AdvancedStepBatch:
+    """
+    Équivalent par lots d'AdvancedStepDetector
+
+    L'état est conservé entre deux appels à process(): traiter un
+    enregistrement en plusieurs blocs donne le même résultat qu'en un seul.
+    """
+
+    # Paramètres d'AdvancedStepDetector
+    HISTORY_MAX = 10
+    PEAK_THRESHOLD = 0.3
+    DEBOUNCE_MS = 250
+    WINDOW = 5
+
+    def __init__(self, step_length=0.7, user_weight=70):
+        self.step_length = step_length
+        self.user_weight = user_weight
+        self.step_count = 0
+        self.total_calories = 0.0
+
+        # Historique (RingBuffer): nombre d'ajouts, sommes, derniers float32
+        self._pushes = 0
+        self._sum = 0.0
+        self._sumsq = 0.0
+        self._history = np.zeros(0, dtype=np.float32)
+
+        # Passages par zéro et derniers pas (TickWindow)
+        self._prev_accel = 1.0
+        self._last_zero_crossing = 0
+        self._step_times = []
+
+    # ---------- Historique vectorisé ----------
+
+    def _running_sums(self, v):
+        """
+        Somme et somme des carrés de l'historique après chaque ajout
+
+        RingBuffer.push ajoute (v - old) à la somme (old = valeur écrasée,
+        0.0 tant que le tampon n'est pas plein) et la recalcule de zéro
+        quand la tête revient à 0 après un tour complet (ajouts 2C, 3C...).
+        Les ajouts sont regroupés par tour (lignes de C valeurs): un cumsum
+        par ligne partant de la valeur de début de ligne reproduit
+        exactement les additions séquentielles en double précision.
+        """
+        cap = self.HISTORY_MAX
+        n = len(v)
+        p = self._pushes
+        offset = p % cap                     # position dans la ligne courante
+        first_push = p - offset + 1          # numéro du 1er ajout de la ligne
+        rows = (offset + n + cap - 1) // cap
+        size = rows * cap
+
+        # Valeurs écrasées: ajouts k - C (0.0 pour les C premiers ajouts)
+        hist = self._history.astype(np.float64)
+        prefix = np.concatenate((np.zeros(cap - len(hist)), hist))
+        v64 = v.astype(np.float64)
+        ext = np.concatenate((prefix, v64))
+        old = ext[:n]
+
+        d = np.zeros(size)
+        d[offset:offset + n] = v64 - old
+        e = np.zeros(size)
+        e[offset:offset + n] = v64 * v64 - old * old
+
+        # Recalcul exact en fin de ligne: somme séquentielle de la ligne
+        g = np.zeros(size)
+        g[:offset] = prefix[cap - offset:]
+        g[offset:offset + n] = v64
+        g = g.reshape(rows, cap)
+        resync = np.cumsum(g, axis=1)[:, -1]
+        resync_sq = np.cumsum(g * g, axis=1)[:, -1]
+        row_end = first_push - 1 + cap * np.arange(1, rows + 1)
+        is_resync = row_end >= 2 * cap
+
+        sums = []
+        for base0, steps, resyncs in ((self._sum, d, resync), (self._sumsq, e, resync_sq)):
+            m = np.empty((rows, cap + 1))
+            m[:, 1:] = steps.reshape(rows, cap)
+            m[0, 0] = base0
+            m[1:, 0] = resyncs[:-1]
+            if rows > 1 and not is_resync[0]:
+                # Premier tour de l'historique: pas de recalcul en fin de ligne
+                m[1, 0] = np.cumsum(m[0])[-1]
+            c = np.cumsum(m, axis=1)[:, 1:]
+            c[is_resync, -1] = resyncs[is_resync]
+            sums.append(c.reshape(-1)[offset:offset + n])
+
+        self._pushes = p + n
+        self._sum = float(sums[0][-1])
+        self._sumsq = float(sums[1][-1])
+        self._history = ext[-cap:].astype(np.float32)[-min(cap, p + n):]
+        return sums[0], sums[1], ext
+
+    # ---------- Traitement ----------
+
+    def process(self, timestamps, magnitudes):
+        """
+        Args:
+            timestamps: horodatages ticks_ms (entiers) des échantillons
+            magnitudes: |accélération| en g
+
+        Returns:
+            dict de tableaux, une entrée par pas détecté:
+            step_index (indice dans ce bloc), step_time, speed (m/s),
+            cadence (pas/min), calories (cumul)
+        """
+        t = np.asarray(timestamps, dtype=np.int64)
+        normalized = np.asarray(magnitudes, dtype=np.float64) - 1.0
+        n = len(normalized)
+        cap = self.HISTORY_MAX
+        if n == 0:
+            return self._result([], [], [], [], [])
+
+        # Historique: |normalized| stocké en float32 comme array('f')
+        v = np.abs(normalized).astype(np.float32)
+        pushes_before = self._pushes
+        sums, sumsqs, ext = self._running_sums(v)
+
+        # Passages par zéro (positif -> négatif), vectorisés
+        prev = np.empty(n)
+        prev[:1] = self._prev_accel
+        prev[1:] = normalized[:-1]
+        candidates = np.nonzero((prev > 0) & (normalized <= 0))[0]
+        if n:
+            self._prev_accel = float(normalized[-1])
+
+        # Validation des pics aux candidats seulement (moyenne, écart-type, max)
+        count = np.minimum(pushes_before + 1 + candidates, cap)
+        valid = count >= 5
+        avg = sums[candidates] / count
+        var = sumsqs[candidates] / count - avg * avg
+        std = np.sqrt(np.where(var > 0.0, var, 0.0))
+        threshold = np.maximum(self.PEAK_THRESHOLD, avg + std)
+        windows = np.lib.stride_tricks.sliding_window_view(ext, cap)[1:]
+        filled = np.arange(cap) >= cap - count[:, None]
+        max_recent = np.where(filled, windows[candidates], -np.inf).max(axis=1) if len(candidates) else np.zeros(0)
+        valid &= max_recent > threshold
+
+        # Boucle séquentielle sur les candidats (anti-rebond, fréquence, calories)
+        out_index, out_time, out_speed, out_cadence, out_cal = [], [], [], [], []
+        times = t.tolist()
+        for i, ok in zip(candidates.tolist(), valid.tolist()):
+            now = times[i]
+            if ticks_diff(now, self._last_zero_crossing) <= self.DEBOUNCE_MS:
+                continue
+            self._last_zero_crossing = now
+            if not ok or not self._check_frequency():
+                continue
+            self.step_count += 1
+            self._step_times.append(now)
+            if len(self._step_times) > self.WINDOW:
+                del self._step_times[0]
+            self._update_calories()
+            out_index.append(i)
+            out_time.append(now)
+            out_speed.append(self.get_speed())
+            out_cadence.append(self.get_cadence())
+            out_cal.append(self.total_calories)
+
+        return self._result(out_index, out_time, out_speed, out_cadence, out_cal)
+
+    @staticmethod
+    def _result(index, times, speed, cadence, calories):
+        return {
+            'step_index': np.array(index, dtype=np.int64),
+            'step_time': np.array(times, dtype=np.int64),
+            'speed': np.array(speed, dtype=np.float64),
+            'cadence': np.array(cadence, dtype=np.float64),
+            'calories': np.array(calories, dtype=np.float64),
+        }
+
+    # ---------- Estimateurs (mêmes calculs que le détecteur embarqué) ----------
+
+    def _span(self, k=None):
+        st = self._step_times
+        if k is None:
+            k = len(st) - 1
+        return ticks_diff(st[-1], st[-1 - k])
+
+    def _check_frequency(self):
+        if len(self._step_times) < 3:
+            return True
+        duration_ms = self._span()
+        if duration_ms <= 0:
+            return True
+        frequency = (len(self._step_times) - 1) / (duration_ms / 1000.0)
+        return 1.0 <= frequency <= 4.0
+
+    def _update_calories(self):
+        speed_kmh = self.get_speed() * 3.6
+        if speed_kmh < 3.2:
+            MET = 2.0
+        elif speed_kmh < 4.8:
+            MET = 3.5
+        elif speed_kmh < 6.4:
+            MET = 5.0
+        else:
+            MET = 8.0
+        if len(self._step_times) >= 2:
+            duration_h = self._span(1) / (1000.0 * 3600.0)
+            self.total_calories += MET * self.user_weight * duration_h
+
+    def get_speed(self):
+        if len(self._step_times) < 2:
+            return 0.0
+        duration_s = self._span() / 1000.0
+        if duration_s <= 0:
+            return 0.0
+        steps = len(self._step_times) - 1
+        speed = steps * self.step_length / duration_s
+        cadence = steps / duration_s
+        if cadence > 2.5:
+            speed *= 1.15
+        elif cadence < 1.5:
+            speed *= 0.95
+        return speed
+
+    def get_cadence(self):
+        if len(self._step_times) < 2:
+            return 0.0
+        duration_min = self._span() / (1000.0 * 60.0)
+        if duration_min <= 0:
+            return 0.0
+        return (len(self._step_times) - 1) / duration_min
+
+    def get_distance(self):
+        return self.step_count * self.step_length
+
+    def get_calories(self):
+        return self.total_calories
+
+
+# ---------- Conformité avec le détecteur embarqué ----------
+
+def check_conformance(timestamps, magnitudes, step_length=0.7, user_weight=70, chunk=None):
+    """
+    Compare AdvancedStepBatch et AdvancedStepDetector (rejoué échantillon
+    par échantillon) sur la même entrée
+
+    Returns:
+        list: différences (vide si identiques au bit près)
+    """
+    firmware_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if firmware_dir not in sys.path:
+        sys.path.insert(0, firmware_dir)
+    import sim
+    sim.install()
+    try:
+        from step_detector_advanced import AdvancedStepDetector
+        detector = AdvancedStepDetector(step_length=step_length, user_weight=user_weight)
+        expected = []
+        for i, (t, m) in enumerate(zip(timestamps, magnitudes)):
+            if detector.update(float(m), int(t)):
+                expected.append((i, int(t), detector.get_speed(),
+                                 detector.get_cadence(), detector.get_calories()))
+    finally:
+        sim.uninstall()
+
+    batch = AdvancedStepBatch(step_length=step_length, user_weight=user_weight)
+    got = []
+    chunk = chunk or len(timestamps) or 1
+    for start in range(0, len(timestamps), chunk):
+        r = batch.process(timestamps[start:start + chunk], magnitudes[start:start + chunk])
+        for j in range(len(r['step_index'])):
+            got.append((start + int(r['step_index'][j]), int(r['step_time'][j]),
+                        float(r['speed'][j]), float(r['cadence'][j]), float(r['calories'][j])))
+
+    diffs = []
+    if len(expected) != len(got):
+        diffs.append(("step_count", len(expected), len(got)))
+    for a, b in zip(expected, got):
+        if a != b:
+            diffs.append(a + b)
+    return diffs
+
+
+def main():
+    firmware_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if firmware_dir not in sys.path:
+        sys.path.insert(0, firmware_dir)
+    from sim import traces
+    ok = True
+    for trace in traces.standard_traces(600):
+        samples = list(trace.magnitudes(20))
+        t = np.array([s[0] for s in samples])
+        m = np.array([s[1] for s in samples])
+        for chunk in (None, 997):
+            diffs = check_conformance(t, m, chunk=chunk)
+            print("%-15s bloc %-5s %s" % (trace.name, chunk or '-', "identique" if not diffs else diffs[:3]))
+            ok &= not diffs
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
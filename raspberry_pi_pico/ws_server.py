@@ -0,0 +1,367 @@
+"""
+Serveur WebSocket asyncio pour la télémétrie Wi-Fi (main_updated.py)
+Plusieurs clients simultanés, chacun avec sa file d'envoi préallouée
+(send_queue.py), son format et un maintien de connexion ping/pong
+
+- broadcast() ne bloque pas: la trame WebSocket est construite une fois
+  par format puis copiée dans la file de chaque client; une tâche par
+  client l'écrit sur la socket à son rythme
+- formats: JSON historique (trame texte) ou trame binaire v1 de
+  telemetry.py, la même qu'en BLE (trame binaire de 31 octets)
+- un client trop lent (evict_drops trames rejetées, file pleine, sans
+  l'avoir vidée entre-temps) ou muet (rien reçu, pong compris, depuis
+  timeout_ms) est déconnecté
+
+Le client choisit son format à la connexion (ws://[IP]/ws?format=binary)
+ou à tout moment avec le message binaire [CMD_SET_FORMAT, format] de
+telemetry.py, comme en BLE.
+
+Fonctionne sous MicroPython et CPython (tools/bench_ws.py).
+"""
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+import binascii
+import hashlib
+import time
+
+import telemetry
+from send_queue import SendQueue
+
+_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# Opcodes (RFC 6455)
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+CLOSE_NORMAL = 1000
+CLOSE_GOING_AWAY = 1001
+CLOSE_TOO_BIG = 1009
+
+# Formats demandés dans l'URL (?format=...)
+FORMATS = {b"json": telemetry.FORMAT_JSON, b"binary": telemetry.FORMAT_BINARY}
+
+# Messages des clients (pong, commandes): une trame courte, non fragmentée
+_MAX_RX = 125
+_PING = b"\x89\x00"
+
+
+def accept_key(key):
+    """Sec-WebSocket-Accept pour la clé Sec-WebSocket-Key du client"""
+    return binascii.b2a_base64(hashlib.sha1(key + _GUID).digest()).strip()
+
+
+def frame_header(buf, opcode, n):
+    """
+    En-tête d'une trame serveur (finale, non masquée) au début de buf
+
+    Returns:
+        int: taille de l'en-tête (2 octets, 4 au-delà de 125 octets)
+    """
+    buf[0] = 0x80 | opcode
+    if n < 126:
+        buf[1] = n
+        return 2
+    buf[1] = 126
+    buf[2] = n >> 8
+    buf[3] = n & 0xFF
+    return 4
+
+
+def close_frame(code):
+    return bytes((0x80 | OP_CLOSE, 2, code >> 8, code & 0xFF))
+
+
+class _Client:
+    """État d'une connexion: file d'envoi, format, retard, dernier message reçu"""
+
+    def __init__(self, reader, writer, fmt, depth, max_size):
+        self.reader = reader
+        self.writer = writer
+        self.format = fmt
+        self.queue = SendQueue(depth, max_size)
+        self.ready = asyncio.Event()   # messages en file
+        self.done = asyncio.Event()    # connexion à fermer
+        self.lag = 0                   # trames rejetées depuis la dernière file vidée
+        self.rx_ms = time.ticks_ms()
+        self.reason = None
+
+
+class WebSocketServer:
+    """
+    Serveur de télémétrie, à démarrer dans la boucle asyncio du firmware
+
+    Usage:
+        ws = WebSocketServer(port=80)
+        await ws.start()
+        ...
+        ws.broadcast(encoder.pack(values), telemetry.FORMAT_BINARY)
+    """
+
+    def __init__(self, port=80, path="/ws", max_clients=4, queue_depth=4, max_frame=320,
+                 ping_ms=10000, timeout_ms=30000, evict_drops=8,
+                 default_format=telemetry.FORMAT_JSON):
+        """
+        Args:
+            max_frame: plus grand message (en-tête compris), taille des
+                emplacements des files: max_clients x queue_depth x max_frame
+                octets préalloués au plus
+            evict_drops: trames rejetées (file pleine) avant déconnexion
+            default_format: format des clients qui n'en demandent pas
+        """
+        self.port = port
+        self.path = path.encode()
+        self.max_clients = max_clients
+        self.queue_depth = queue_depth
+        self.max_frame = max_frame
+        self.ping_ms = ping_ms
+        self.timeout_ms = timeout_ms
+        self.evict_drops = evict_drops
+        self.default_format = default_format
+        self._clients = []
+        self._frame = bytearray(max_frame)
+        self._server = None
+        self._keepalive = None
+        # Compteurs (clients fermés compris)
+        self.accepted = 0
+        self.rejected = 0
+        self.evicted = 0
+        self._sent = 0
+        self._dropped = 0
+
+    async def start(self, host="0.0.0.0"):
+        """Écoute sur host:port et lance le maintien de connexion"""
+        self._server = await asyncio.start_server(self._accept, host, self.port)
+        self._keepalive = asyncio.create_task(self._ping_loop())
+        return self._server
+
+    async def stop(self):
+        """Ferme l'écoute et toutes les connexions"""
+        if self._keepalive is not None:
+            self._keepalive.cancel()
+            self._keepalive = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for c in self._clients:
+            self._close(c, "arrêt", CLOSE_GOING_AWAY)
+        # Fin des tâches des clients (fermeture des sockets)
+        while self._clients:
+            await asyncio.sleep(0.01)
+
+    def get_client_count(self):
+        return len(self._clients)
+
+    def clients(self, fmt):
+        """Nombre de clients qui reçoivent le format fmt"""
+        n = 0
+        for c in self._clients:
+            if c.format == fmt:
+                n += 1
+        return n
+
+    def broadcast(self, data, fmt=telemetry.FORMAT_JSON):
+        """
+        Met un message en file pour chaque client du format fmt (sans attendre)
+
+        Args:
+            data: str (trame texte) ou bytes/bytearray (trame binaire),
+                max_frame - 4 octets au plus
+
+        Returns:
+            int: nombre de clients connectés (tous formats)
+        """
+        if isinstance(data, str):
+            data = data.encode()
+            opcode = OP_TEXT
+        else:
+            opcode = OP_BINARY
+        n = len(data)
+        buf = self._frame
+        h = frame_header(buf, opcode, n)
+        if h + n > len(buf):
+            raise ValueError("message trop grand")
+        buf[h:h + n] = data
+        frame = memoryview(buf)[:h + n]
+        for c in self._clients:
+            if c.format == fmt and not c.done.is_set():
+                self._queue(c, frame)
+        return len(self._clients)
+
+    def stats(self):
+        sent = self._sent
+        dropped = self._dropped
+        for c in self._clients:
+            sent += c.queue.sent
+            dropped += c.queue.dropped
+        return {
+            'clients': len(self._clients),
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'evicted': self.evicted,
+            'sent': sent,
+            'dropped': dropped,
+        }
+
+    def _queue(self, c, frame):
+        q = c.queue
+        dropped = q.dropped
+        q.put(frame)
+        c.ready.set()
+        if q.dropped != dropped:
+            c.lag += 1
+            if c.lag >= self.evict_drops:
+                self._evict(c, "lent")
+
+    def _evict(self, c, reason):
+        self.evicted += 1
+        self._close(c, reason, CLOSE_GOING_AWAY)
+
+    def _close(self, c, reason, code=None):
+        """Termine la connexion (la tâche _accept du client fait le ménage)"""
+        if c.done.is_set():
+            return
+        c.reason = reason
+        if code is not None:
+            try:
+                c.writer.write(close_frame(code))
+            except OSError:
+                pass
+        c.done.set()
+
+    async def _accept(self, reader, writer):
+        c = None
+        try:
+            fmt = await asyncio.wait_for(self._handshake(reader, writer),
+                                         self.timeout_ms / 1000)
+            if fmt is None:
+                return
+            c = _Client(reader, writer, fmt, self.queue_depth, self.max_frame)
+            self._clients.append(c)
+            self.accepted += 1
+            tasks = (asyncio.create_task(self._receive(c)), asyncio.create_task(self._send(c)))
+            await c.done.wait()
+            for task in tasks:
+                task.cancel()
+        except (OSError, EOFError, ValueError, asyncio.TimeoutError):
+            # Requête incomplète ou client parti pendant la mise à niveau
+            pass
+        finally:
+            if c is not None:
+                self._clients.remove(c)
+                self._sent += c.queue.sent
+                self._dropped += c.queue.dropped
+            writer.close()
+            try:
+                await asyncio.wait_for(writer.wait_closed(), 1)
+            except Exception:
+                pass
+
+    async def _handshake(self, reader, writer):
+        """
+        Requête HTTP de mise à niveau
+
+        Returns:
+            int: format du client, None si refusé (réponse d'erreur envoyée)
+        """
+        request = (await reader.readline()).split()
+        key = None
+        while True:
+            line = await reader.readline()
+            if not line or line == b"\r\n":
+                break
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"sec-websocket-key":
+                key = value.strip()
+
+        status = None
+        fmt = self.default_format
+        if len(request) < 2 or request[0] != b"GET" or key is None:
+            status = b"400 Bad Request"
+        else:
+            path, _, query = request[1].partition(b"?")
+            for arg in query.split(b"&"):
+                name, _, value = arg.partition(b"=")
+                if name == b"format" and value in FORMATS:
+                    fmt = FORMATS[value]
+            if path != self.path:
+                status = b"404 Not Found"
+            elif len(self._clients) >= self.max_clients:
+                status = b"503 Service Unavailable"
+        if status is not None:
+            self.rejected += 1
+            writer.write(b"HTTP/1.1 " + status + b"\r\nContent-Length: 0\r\n"
+                         b"Connection: close\r\n\r\n")
+            await writer.drain()
+            return None
+
+        writer.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                     b"Connection: Upgrade\r\nSec-WebSocket-Accept: " + accept_key(key) +
+                     b"\r\n\r\n")
+        await writer.drain()
+        return fmt
+
+    async def _receive(self, c):
+        """Messages du client: ping, pong, fermeture, choix du format"""
+        reader = c.reader
+        try:
+            while True:
+                head = await reader.readexactly(2)
+                opcode = head[0] & 0x0F
+                n = head[1] & 0x7F
+                if n > _MAX_RX:
+                    self._close(c, "message trop grand", CLOSE_TOO_BIG)
+                    return
+                mask = await reader.readexactly(4) if head[1] & 0x80 else None
+                payload = bytearray(await reader.readexactly(n)) if n else bytearray()
+                if mask is not None:
+                    for i in range(n):
+                        payload[i] ^= mask[i & 3]
+                c.rx_ms = time.ticks_ms()
+
+                if opcode == OP_PING:
+                    # Pong dans la file: ne coupe pas une trame en cours
+                    self._queue(c, bytes((0x80 | OP_PONG, n)) + payload)
+                elif opcode == OP_CLOSE:
+                    self._close(c, "fermée par le client", CLOSE_NORMAL)
+                    return
+                elif (opcode == OP_BINARY and n == 2 and payload[0] == telemetry.CMD_SET_FORMAT
+                      and payload[1] in (telemetry.FORMAT_JSON, telemetry.FORMAT_BINARY)):
+                    c.format = payload[1]
+        except (OSError, EOFError):
+            self._close(c, "déconnecté")
+
+    async def _send(self, c):
+        """Vide la file du client sur la socket (drain: au rythme du client)"""
+        q = c.queue
+        writer = c.writer
+        try:
+            while True:
+                await c.ready.wait()
+                c.ready.clear()
+                while len(q):
+                    chunk = q.peek(q.max_size)
+                    writer.write(chunk)
+                    q.advance(len(chunk))
+                    await writer.drain()
+                c.lag = 0
+        except OSError:
+            self._close(c, "erreur d'envoi")
+
+    async def _ping_loop(self):
+        """Ping toutes les ping_ms, déconnexion des clients muets"""
+        while True:
+            await asyncio.sleep(self.ping_ms / 1000)
+            now = time.ticks_ms()
+            for c in self._clients:
+                if c.done.is_set():
+                    continue
+                if time.ticks_diff(now, c.rx_ms) > self.timeout_ms:
+                    self._evict(c, "muet")
+                else:
+                    self._queue(c, _PING)